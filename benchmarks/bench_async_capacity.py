@@ -0,0 +1,126 @@
+"""
+Compare how many concurrent Socket.IO connections one server process holds in each ASYNC_MODE.
+
+For every mode, `benchmarks.serve` starts the server in a subprocess on the in-memory Mongo stand-in
+(`pip install mongomock`), or on a local mongod with `--mongo-uri`. Websocket clients are then connected in steps.
+At every step the benchmark reports the sockets the server counts as connected (from /metrics), its OS threads and
+resident memory, and the latency of HTTP requests served while all those sockets are open.
+
+Needs the packages of the compared modes, e.g. `pip install eventlet gevent gevent-websocket`.
+
+Usage:
+    python -m benchmarks.bench_async_capacity --modes threading eventlet --sockets 100 500 1000
+"""
+from concurrent.futures import ThreadPoolExecutor
+from statistics import median
+from time import perf_counter, sleep
+from typing import Dict, List, Optional
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+import requests
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _process_status(pid: int) -> Dict[str, float]:
+    with open(f"/proc/{pid}/status") as file:
+        status = file.read()
+    return {"threads": int(re.search(r"Threads:\s+(\d+)", status).group(1)),
+            "rss_mb": int(re.search(r"VmRSS:\s+(\d+)", status).group(1)) / 1024}
+
+
+def _connected_sockets(url: str) -> int:
+    metrics = requests.get(f"{url}/metrics", timeout=30).text
+    return int(float(re.search(r"^rps_connected_sockets (\S+)$", metrics, re.MULTILINE).group(1)))
+
+
+def _http_latency(url: str, requests_count: int) -> Dict[str, float]:
+    latencies = []
+    with requests.Session() as session:
+        for _ in range(requests_count):
+            start = perf_counter()
+            session.get(f"{url}/about/", timeout=30).raise_for_status()
+            latencies.append(perf_counter() - start)
+    latencies.sort()
+    return {"http_p50_ms": median(latencies) * 1e3,
+            "http_p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3}
+
+
+def _connect(url: str) -> Optional[socketio.Client]:
+    client = socketio.Client(reconnection=False)
+    try:
+        client.connect(url, transports=["websocket"], wait_timeout=30)
+    except socketio.exceptions.ConnectionError:
+        return None
+    return client
+
+
+def run(mode: str, steps: List[int], port: int, mongo_uri: Optional[str]) -> List[Dict[str, float]]:
+    """
+    Start a server in `mode` and measure it with every number of connected sockets of `steps`.
+    """
+    env = dict(os.environ, ASYNC_MODE=mode, PORT=str(port), DEBUG="0", SECRET_KEY="bench", PASSWORD="bench")
+    if mongo_uri:
+        env["MONGO_URI"] = mongo_uri
+    server = subprocess.Popen([sys.executable, "-m", "benchmarks.serve"], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    url = f"http://127.0.0.1:{port}"
+    clients: List[socketio.Client] = []
+    results = []
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f"{url}/about/", timeout=1)
+                break
+            except requests.ConnectionError:
+                sleep(0.2)
+
+        for target in steps:
+            start = perf_counter()
+            while len(clients) < target:
+                client = _connect(url)
+                if client is None:
+                    break
+                clients.append(client)
+            connect_seconds = perf_counter() - start
+
+            results.append(dict({"mode": mode,
+                                 "target": target,
+                                 "connected": _connected_sockets(url),
+                                 "connect_s": connect_seconds},
+                                **_process_status(server.pid), **_http_latency(url, 200)))
+    finally:
+        # Stopping the server first spares every client the wait for a graceful close
+        server.terminate()
+        server.wait()
+        with ThreadPoolExecutor(max_workers=64) as executor:
+            executor.map(lambda client: client.disconnect(), clients)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["threading", "eventlet"])
+    parser.add_argument("--sockets", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--mongo-uri", help="local mongod to use instead of the in-memory stand-in")
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} {'sockets':>8} {'connected':>10} {'connect s':>10} {'threads':>8} {'rss MB':>8} "
+          f"{'http p50 ms':>12} {'http p99 ms':>12}")
+    for mode in args.modes:
+        for result in run(mode, sorted(args.sockets), args.port, args.mongo_uri):
+            print(f"{result['mode']:>10} {result['target']:>8} {result['connected']:>10} "
+                  f"{result['connect_s']:>10.2f} {result['threads']:>8} {result['rss_mb']:>8.1f} "
+                  f"{result['http_p50_ms']:>12.2f} {result['http_p99_ms']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Load test for bot games: schedule the bot's delayed move for N simultaneous games and measure throughput.
+
+With the scheduler every bot move waits on one background task, so finishing N games takes about one thinking
+delay regardless of N and throughput grows with the number of games instead of collapsing.
+
+Usage:
+    python -m benchmarks.bench_bot_games --games 100 1000 10000 --delay 0.5
+"""
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import Dict
+import argparse
+
+from src.game_state import RoomState
+from src.maria_brain import generate_maria_choice
+from src.scheduler import DelayedCallScheduler
+
+
+def _start_background_task(target, *args) -> Thread:
+    """
+    Same contract as `socketio.start_background_task` in threading mode.
+    """
+    thread = Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def run(n_games: int, delay: float) -> Dict[str, float]:
+    """
+    Start `n_games` bot games, play the human move in each and wait until every bot move resolved its round.
+
+    Returns:
+        Dict[str, float]: Elapsed seconds, games per second and the worst lateness of a bot move in seconds.
+    """
+    scheduler = DelayedCallScheduler(_start_background_task)
+    rooms = [RoomState() for _ in range(n_games)]
+    lock = Lock()
+    done = Event()
+    state = {"resolved": 0, "lateness": 0.0}
+
+    def play_bot_move(room: RoomState, due: float) -> None:
+        resolved = room.register_choice("player2", generate_maria_choice())
+        with lock:
+            state["lateness"] = max(state["lateness"], perf_counter() - due)
+            if resolved:
+                state["resolved"] += 1
+            if state["resolved"] == n_games:
+                done.set()
+
+    start = perf_counter()
+    for room in rooms:
+        room.register_choice("player1", "rock")
+        scheduler.call_later(delay, play_bot_move, room, perf_counter() + delay)
+
+    if not done.wait(timeout=delay + 60):
+        raise AssertionError(f"only {state['resolved']} of {n_games} bot games resolved")
+    elapsed = perf_counter() - start
+
+    return {"seconds": elapsed, "games_per_second": n_games / elapsed, "max_lateness": state["lateness"]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    for n_games in args.games:
+        result = run(n_games, args.delay)
+        print(f"games={n_games:>7} {result['seconds']:>6.2f} s {result['games_per_second']:>10,.0f} games/s "
+              f"max lateness {result['max_lateness'] * 1000:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compare the cost of the game page event fan-out with N open rooms.
+
+"broadcast" is the previous behaviour: every page view sent the whole room registry to every connected socket.
+"room" is the current one: a join only sends the changed seat to the sockets of that room. Sockets are attached
+to a python-socketio server whose packet transport is replaced by a counter, so only the server side cost of
+building and routing the event is measured.
+
+Usage:
+    python -m benchmarks.bench_fanout --rooms 100 1000 10000
+"""
+from time import perf_counter
+from typing import Dict
+import argparse
+
+import socketio
+
+NAMESPACE = "/"
+
+
+def _build_server(n_rooms: int) -> socketio.Server:
+    """
+    Build a server with two connected sockets in each of `n_rooms` rooms, counting packets instead of sending them.
+    """
+    server = socketio.Server(async_mode="threading")
+    server.sent_packets = 0
+
+    def count_packet(eio_sid, eio_packet) -> None:
+        server.sent_packets += 1
+
+    server._send_eio_packet = count_packet  # pylint: disable=protected-access
+
+    for index in range(n_rooms):
+        for seat in ("player1", "player2"):
+            eio_sid = f"{index}-{seat}"
+            sid = server.manager.connect(eio_sid, NAMESPACE)
+            server.manager.enter_room(sid, NAMESPACE, f"R{index:06d}", eio_sid)
+
+    return server
+
+
+def run(n_rooms: int, n_events: int) -> Dict[str, float]:
+    """
+    Emit `n_events` page view events both ways.
+
+    Returns:
+        Dict[str, float]: Microseconds and packets per event for the broadcast and the room-scoped delivery.
+    """
+    server = _build_server(n_rooms)
+    players = {f"R{index:06d}": {"player1": f"user{index}a", "player2": f"user{index}b"} for index in range(n_rooms)}
+
+    result = {}
+    for mode in ("broadcast", "room"):
+        server.sent_packets = 0
+        start = perf_counter()
+        for event in range(n_events):
+            code = f"R{event % n_rooms:06d}"
+            if mode == "broadcast":
+                server.emit("alert", {"message": f"{players}"}, namespace=NAMESPACE)
+            else:
+                server.emit("player_joined", {"player_room_id": code, "seat": "player2",
+                                              "player": players[code]["player2"]},
+                            room=code, namespace=NAMESPACE)
+        result[f"{mode}_us"] = (perf_counter() - start) / n_events * 1e6
+        result[f"{mode}_packets"] = server.sent_packets / n_events
+
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--events", type=int, default=200)
+    args = parser.parse_args()
+
+    for n_rooms in args.rooms:
+        result = run(n_rooms, args.events)
+        print(f"rooms={n_rooms:>6}  broadcast {result['broadcast_us']:>10.1f} us "
+              f"({result['broadcast_packets']:>6.0f} packets)  room {result['room_us']:>6.1f} us "
+              f"({result['room_packets']:.0f} packets)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Measure the user lookup of `login()` as the users collection grows, against a local mongod.
+
+The collection is filled in steps up to the largest size and the projected `find_one` on the unique email index
+is timed at each step. Latency should stay flat. `--legacy-max` also times the old full-collection scan up to
+that size.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 python -m benchmarks.bench_login --users 10 1000 100000 1000000
+"""
+from random import Random
+from statistics import median
+from time import perf_counter
+from typing import Dict
+import argparse
+import os
+
+from pymongo import MongoClient
+from pymongo.collection import Collection
+
+from src.database import create_user_indexes
+
+# Same query and projection as login()
+LOGIN_PROJECTION = {"username": 1, "password": 1}
+
+
+def _fill(collection: Collection, start: int, stop: int) -> None:
+    """
+    Insert users `start` to `stop - 1` in batches.
+    """
+    for batch_start in range(start, stop, 10000):
+        collection.insert_many([{"_id": f"{index:032x}",
+                                 "username": f"user{index}",
+                                 "email": f"user{index}@example.com",
+                                 "password": b"password",
+                                 "wins": index % 50,
+                                 "played": index % 100}
+                                for index in range(batch_start, min(batch_start + 10000, stop))])
+
+
+def _time_lookups(collection: Collection, n_users: int, n_queries: int, legacy: bool) -> Dict[str, float]:
+    rng = Random(n_users)
+    lookups = []
+    for _ in range(n_queries):
+        email = f"user{rng.randrange(n_users)}@example.com"
+        start = perf_counter()
+        if legacy:
+            len(list(collection.find({})))
+        user = collection.find_one({"email": email}, LOGIN_PROJECTION)
+        lookups.append(perf_counter() - start)
+        if user is None:
+            raise AssertionError(f"{email} not found")
+
+    return {"p50_ms": median(lookups) * 1e3, "max_ms": max(lookups) * 1e3}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 1000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--legacy-max", type=int, default=0,
+                        help="also time the old full scan for collections up to this size")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    client.drop_database("rps_benchmark")
+    collection = client["rps_benchmark"]["users"]
+    create_user_indexes(collection)
+
+    filled = 0
+    try:
+        for n_users in sorted(args.users):
+            _fill(collection, filled, n_users)
+            filled = n_users
+
+            result = _time_lookups(collection, n_users, args.queries, legacy=False)
+            line = f"users={n_users:>8} login lookup p50 {result['p50_ms']:>7.3f} ms max {result['max_ms']:>7.3f} ms"
+
+            if n_users <= args.legacy_max:
+                legacy = _time_lookups(collection, n_users, min(args.queries, 20), legacy=True)
+                line += f"  legacy p50 {legacy['p50_ms']:>9.3f} ms"
+
+            print(line)
+    finally:
+        client.drop_database("rps_benchmark")
+
+
+if __name__ == "__main__":
+    main()
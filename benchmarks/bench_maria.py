@@ -0,0 +1,26 @@
+"""
+Evaluate Maria against every scripted opponent with the vectorized batch mode, reporting win rates and rounds/sec.
+
+Usage:
+    python -m benchmarks.bench_maria --games 10000 --rounds 100
+"""
+import argparse
+
+from src.maria_brain import SCRIPTED_OPPONENTS, evaluate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=100)
+    parser.add_argument("--opponents", nargs="+", default=list(SCRIPTED_OPPONENTS), choices=list(SCRIPTED_OPPONENTS))
+    args = parser.parse_args()
+
+    for opponent in args.opponents:
+        result = evaluate(opponent, games=args.games, rounds=args.rounds)
+        print(f"{opponent:>12}: win {result['win_rate']:6.1%} loss {result['loss_rate']:6.1%} "
+              f"tie {result['tie_rate']:6.1%}  {result['rounds']:,} rounds at {result['rounds_per_second']:,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
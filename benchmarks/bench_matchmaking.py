@@ -0,0 +1,57 @@
+"""
+Measure matchmaking queue throughput: enqueue players with random ratings and report enqueues per second,
+matches and the queue depth left.
+
+Usage:
+    python -m benchmarks.bench_matchmaking --players 10000 100000 --band-width 100
+"""
+from random import Random
+from time import perf_counter
+from typing import Dict
+import argparse
+
+from src.matchmaking import MatchmakingQueue
+
+
+def run(n_players: int, band_width: float, seed: int = 0) -> Dict[str, float]:
+    """
+    Enqueue `n_players` players, cancel one in ten of the waiting ones, then expire the rest.
+
+    Returns:
+        Dict[str, float]: Enqueues per second, matches, and the queue depth before expiring.
+    """
+    rng = Random(seed)
+    ratings = [rng.gauss(1500, 200) for _ in range(n_players)]
+    queue = MatchmakingQueue(band_width=band_width, timeout=0)
+
+    start = perf_counter()
+    for index, rating in enumerate(ratings):
+        queue.enqueue(f"sid{index}", f"user{index}", rating, now=index * 0.001)
+    elapsed = perf_counter() - start
+
+    depth = queue.depth
+    for index in range(0, n_players, 10):
+        queue.cancel(f"sid{index}")
+    queue.expire(now=n_players * 0.001)
+
+    stats = queue.stats()
+    if stats["depth"] != 0 or stats["matched_total"] * 2 + depth != n_players:
+        raise AssertionError(f"inconsistent queue: {stats}")
+
+    return {"enqueues_per_second": n_players / elapsed, "matches": stats["matched_total"], "depth": depth}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--band-width", type=float, default=100)
+    args = parser.parse_args()
+
+    for n_players in args.players:
+        result = run(n_players, args.band_width)
+        print(f"players={n_players:>8} {result['enqueues_per_second']:>12,.0f} enqueues/s "
+              f"matches={result['matches']:>7} left waiting={result['depth']}")
+
+
+if __name__ == "__main__":
+    main()
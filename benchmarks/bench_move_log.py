@@ -0,0 +1,110 @@
+"""
+Measure the move log: rounds appended per second by the server path, and rounds scanned per second by the
+memory-mapped analytics.
+
+`append` is timed on the rounds of `--append` games through `MoveLog.append`, as the server logs them. The scan
+log gets `--rounds` synthetic rounds between P players, written in bulk, then the whole log is summarized, one
+player's tendencies are computed and one room is replayed. The first scan reads the segments from disk, or from
+the page cache when they were just written.
+
+Usage:
+    python -m benchmarks.bench_move_log --rounds 10000000 100000000 --players 10000
+"""
+from tempfile import TemporaryDirectory
+from time import perf_counter, time
+from typing import Dict
+import argparse
+import os
+
+import numpy as np
+
+from src.game_state import MOVES
+from src.move_log import MOVE_RECORD, MoveLog, MoveLogReader, player_key
+
+PLAYERS = {"player1": "alice", "player2": "bob"}
+# Synthetic rounds are written in chunks, so the benchmark never holds the whole log in memory
+CHUNK_RECORDS = 1_000_000
+
+
+def measure_append(n_rounds: int) -> float:
+    """
+    Append `n_rounds` rounds as the server does, and return the rounds appended per second, writes included.
+    """
+    moves = np.random.default_rng(0).integers(0, len(MOVES), (n_rounds, 2)).tolist()
+
+    with TemporaryDirectory() as directory:
+        log = MoveLog(directory)
+        start = perf_counter()
+        for index, (move1, move2) in enumerate(moves):
+            log.append("ABCD", PLAYERS, {"player1": MOVES[move1], "player2": MOVES[move2]}, index % 3 + 1)
+        log.close()
+        return n_rounds / (perf_counter() - start)
+
+
+def _synthetic_records(rng: np.random.Generator, count: int, keys: np.ndarray, start: float) -> np.ndarray:
+    records = np.zeros(count, MOVE_RECORD)
+    records["time"] = start + np.arange(count) * 0.001
+    records["room"] = rng.integers(0, 10 ** 6, count).astype("S8")
+    records["player1"] = keys[rng.integers(0, len(keys), count)]
+    records["player2"] = keys[rng.integers(0, len(keys), count)]
+    records["round"] = rng.integers(1, 8, count)
+    records["move1"] = rng.integers(0, len(MOVES), count)
+    records["move2"] = rng.integers(0, len(MOVES), count)
+    records["outcome"] = (records["move1"].astype(np.int64) - records["move2"]) % 3
+    return records
+
+
+def measure_scan(n_rounds: int, n_players: int, directory: str) -> Dict[str, float]:
+    """
+    Write `n_rounds` synthetic rounds to a log in `directory`, then time the analytics over the whole log.
+    """
+    rng = np.random.default_rng(0)
+    keys = np.array([player_key(f"player{index}") for index in range(n_players)], dtype=np.uint64)
+
+    log = MoveLog(directory)
+    write_seconds = 0.0
+    for first in range(0, n_rounds, CHUNK_RECORDS):
+        records = _synthetic_records(rng, min(CHUNK_RECORDS, n_rounds - first), keys, time() + first)
+        start = perf_counter()
+        log.extend(records)
+        write_seconds += perf_counter() - start
+    start = perf_counter()
+    log.close()
+    write_seconds += perf_counter() - start
+
+    reader = MoveLogReader(directory)
+    results = {"write_rounds_per_second": n_rounds / write_seconds,
+               "bytes": sum(os.path.getsize(path) for path in reader.segment_paths())}
+
+    for name, analysis in (("summary", reader.summary),
+                           ("player", lambda: reader.player_tendencies("player0")),
+                           ("replay", lambda: reader.replay("0"))):
+        start = perf_counter()
+        analysis()
+        results[f"{name}_rounds_per_second"] = n_rounds / (perf_counter() - start)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[1000000, 10000000])
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--append", type=int, default=200000, help="rounds appended through the server path")
+    parser.add_argument("--dir", help="folder of the scanned logs, a temporary folder by default")
+    args = parser.parse_args()
+
+    print(f"append {measure_append(args.append):>14,.0f} rounds/s")
+
+    for n_rounds in args.rounds:
+        with TemporaryDirectory(dir=args.dir) as directory:
+            result = measure_scan(n_rounds, args.players, directory)
+        print(f"rounds={n_rounds:>11} {result['bytes'] / 2 ** 20:>8,.0f} MiB  "
+              f"write {result['write_rounds_per_second']:>13,.0f}/s  "
+              f"summary {result['summary_rounds_per_second']:>13,.0f}/s  "
+              f"player {result['player_rounds_per_second']:>13,.0f}/s  "
+              f"replay {result['replay_rounds_per_second']:>13,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare the wire cost of a round in the previous move protocol with the compact one.
+
+"previous": each player sends its names, room and seat with the move as a `register_player_choice` dict, and the
+room gets a `wait`, an `update_opponent_choice` and a `result` dict. "compact": each player sends the index of its
+move as a `move` event, and the room gets the waiting seat and one `round` event, [outcome, move1, move2].
+
+Every packet of a round is encoded once by its sender and decoded once by each of its receivers, with the JSON
+packets of the default serializer and with the msgpack ones of SOCKETIO_SERIALIZER=msgpack (`pip install msgpack`).
+The benchmark reports the packets and bytes on the wire per round and the rounds per second one core can encode
+and decode.
+
+Usage:
+    python -m benchmarks.bench_move_protocol --rounds 100000
+"""
+from time import perf_counter
+from typing import Dict, List, Tuple, Type
+import argparse
+
+from socketio import packet
+
+from src.game_state import MOVES, OUTCOMES
+
+ROOM = "ABCD"
+PLAYERS = {"player1": "alice", "player2": "bob"}
+# Both players of the room receive every event emitted to it
+ROOM_SIZE = 2
+
+# (event arguments, receivers) of every packet of a round
+Round = List[Tuple[list, int]]
+
+
+def previous_round() -> Round:
+    choices = {"player1": "rock", "player2": "scissor"}
+    moves = [(["register_player_choice", dict(PLAYERS, player_room_id=ROOM, player_number=seat, choice=choice)], 1)
+             for seat, choice in choices.items()]
+    return moves + [(["wait", {"person_waiting": "player1"}], ROOM_SIZE),
+                    (["update_opponent_choice", {"choices": choices}], ROOM_SIZE),
+                    (["result", {"result": "player1", "coices": choices}], ROOM_SIZE)]
+
+
+def compact_round() -> Round:
+    moves = [(["move", MOVES.index(choice)], 1) for choice in ("rock", "scissor")]
+    return moves + [(["wait", "player1"], ROOM_SIZE),
+                    (["round", [OUTCOMES.index("player1"), MOVES.index("rock"), MOVES.index("scissor")]], ROOM_SIZE)]
+
+
+def measure(round_packets: Round, packet_class: Type[packet.Packet], rounds: int) -> Dict[str, float]:
+    """
+    Encode every packet of a round once and decode it once per receiver, `rounds` times.
+    """
+    packets = sum(receivers for _, receivers in round_packets)
+    wire_bytes = sum(len(packet_class(packet.EVENT, data=data).encode()) * receivers
+                     for data, receivers in round_packets)
+
+    start = perf_counter()
+    for _ in range(rounds):
+        for data, receivers in round_packets:
+            encoded = packet_class(packet.EVENT, data=data).encode()
+            for _ in range(receivers):
+                packet_class(encoded_packet=encoded)
+    seconds = perf_counter() - start
+
+    return {"packets": packets,
+            "bytes": wire_bytes,
+            "rounds_per_second": rounds / seconds,
+            "packets_per_second": rounds * packets / seconds}
+
+
+def _packet_classes() -> Dict[str, Type[packet.Packet]]:
+    classes = {"json": packet.Packet}
+    try:
+        from socketio.msgpack_packet import MsgPackPacket
+        import msgpack  # noqa: F401 pylint: disable=unused-import
+    except ImportError:
+        print("msgpack is not installed, only the JSON serializer is measured")
+    else:
+        classes["msgpack"] = MsgPackPacket
+    return classes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'serializer':>10} {'protocol':>9} {'packets':>8} {'bytes':>6} {'rounds/s':>10} {'packets/s':>11}")
+    for serializer, packet_class in _packet_classes().items():
+        for protocol, round_packets in (("previous", previous_round()), ("compact", compact_round())):
+            result = measure(round_packets, packet_class, args.rounds)
+            print(f"{serializer:>10} {protocol:>9} {result['packets']:>8} {result['bytes']:>6} "
+                  f"{result['rounds_per_second']:>10.0f} {result['packets_per_second']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare rank lookups through `RankIndex` with the old sort-the-whole-collection approach of `profile_page`.
+
+Usage:
+    python -m benchmarks.bench_rank --users 100000 1000000 --queries 10000
+"""
+from collections import Counter
+from random import Random
+from time import perf_counter
+from typing import Dict, List
+import argparse
+
+from src.ranking import RankIndex
+
+
+def _naive_rank(board: List[Dict[str, int]], user: Dict[str, int]) -> int:
+    """
+    The previous approach: sort every user by wins and find the user's position.
+    """
+    return sorted(board, key=lambda entry: entry["wins"], reverse=True).index(user) + 1
+
+
+def run(n_users: int, n_queries: int, seed: int = 0) -> Dict[str, float]:
+    """
+    Build an index over `n_users` users, answer `n_queries` rank queries and record `n_queries` wins.
+
+    Returns:
+        Dict[str, float]: Build time, microseconds per query and per win, and milliseconds per naive lookup.
+    """
+    rng = Random(seed)
+    wins = [int(rng.expovariate(1 / 20)) for _ in range(n_users)]
+
+    start = perf_counter()
+    index = RankIndex.from_counts(Counter(wins))
+    build = perf_counter() - start
+
+    sample = [rng.randrange(n_users) for _ in range(n_queries)]
+    start = perf_counter()
+    ranks = [index.rank(wins[position]) for position in sample]
+    query = (perf_counter() - start) / n_queries
+
+    # Competition ranking: one plus the number of users with strictly more wins
+    sorted_wins = sorted(wins, reverse=True)
+    for position, rank in zip(sample[:100], ranks[:100]):
+        expected = sorted_wins.index(wins[position]) + 1
+        if rank != expected:
+            raise AssertionError(f"rank {rank} != {expected} for {wins[position]} wins")
+
+    start = perf_counter()
+    for position in sample:
+        index.record_win(wins[position])
+        wins[position] += 1
+    update = (perf_counter() - start) / n_queries
+
+    board = [{"_id": position, "wins": value} for position, value in enumerate(wins)]
+    start = perf_counter()
+    _naive_rank(board, board[sample[0]])
+    naive = perf_counter() - start
+
+    return {"build_s": build, "query_us": query * 1e6, "win_us": update * 1e6, "naive_ms": naive * 1e3}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--queries", type=int, default=10000)
+    args = parser.parse_args()
+
+    for n_users in args.users:
+        result = run(n_users, args.queries)
+        print(f"users={n_users:>8} build {result['build_s'] * 1000:>7.1f} ms  rank {result['query_us']:>6.2f} us  "
+              f"win {result['win_us']:>6.2f} us  naive sort+index {result['naive_ms']:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measure the offline rating recomputation on a synthetic match history.
+
+N matches between P players, spread over D days, are rated with `recompute_ratings` in daily rating periods, and
+a sample of them game by game in plain Python, as the server rates them, for comparison.
+
+Usage:
+    python -m benchmarks.bench_ratings --matches 1000000 --players 10000 --days 365
+"""
+from time import perf_counter
+from typing import Dict
+import argparse
+
+import numpy as np
+
+from src.rating import RATING_INITIAL, rating_change, recompute_ratings
+
+SAMPLE_MATCHES = 100000
+
+
+def _sequential(player1: np.ndarray, player2: np.ndarray, scores1: np.ndarray, n_players: int) -> float:
+    """
+    Rate the matches one by one in plain Python and return the seconds taken.
+    """
+    ratings = [RATING_INITIAL] * n_players
+    first, second, scores = player1.tolist(), player2.tolist(), scores1.tolist()
+
+    start = perf_counter()
+    for index, opponent, score in zip(first, second, scores):
+        change = rating_change(ratings[index], ratings[opponent], score)
+        ratings[index] += change
+        ratings[opponent] -= change
+    return perf_counter() - start
+
+
+def run(n_matches: int, n_players: int, days: int, seed: int = 0) -> Dict[str, float]:
+    """
+    Rate `n_matches` random matches between `n_players` players, a stronger player winning more often.
+    """
+    rng = np.random.default_rng(seed)
+    strength = rng.normal(0, 1, n_players)
+    player1 = rng.integers(0, n_players, n_matches)
+    player2 = (player1 + rng.integers(1, n_players, n_matches)) % n_players
+    win_probability = 1 / (1 + np.exp(strength[player2] - strength[player1]))
+    scores1 = (rng.random(n_matches) < win_probability).astype(float)
+    periods = np.sort(rng.integers(0, days, n_matches))
+
+    start = perf_counter()
+    ratings = recompute_ratings(player1, player2, scores1, periods, n_players)
+    batch_seconds = perf_counter() - start
+
+    sample = min(n_matches, SAMPLE_MATCHES)
+    sequential_seconds = _sequential(player1[:sample], player2[:sample], scores1[:sample], n_players)
+
+    return {"batch_matches_per_second": n_matches / batch_seconds,
+            "sequential_matches_per_second": sample / sequential_seconds,
+            "batch_seconds": batch_seconds,
+            # A sound rating orders the players like their hidden strength
+            "strength_correlation": float(np.corrcoef(strength, ratings)[0, 1])}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--matches", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365, help="daily rating periods of the history")
+    args = parser.parse_args()
+
+    for n_matches in args.matches:
+        result = run(n_matches, args.players, args.days)
+        print(f"matches={n_matches:>9} batch {result['batch_matches_per_second']:>12,.0f}/s "
+              f"({result['batch_seconds']:.2f}s)  sequential {result['sequential_matches_per_second']:>10,.0f}/s  "
+              f"rating/strength correlation {result['strength_correlation']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
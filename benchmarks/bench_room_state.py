@@ -0,0 +1,89 @@
+"""
+Drive many rooms in parallel through `RoomState` and check that no round leaks into another room.
+
+Usage:
+    python -m benchmarks.bench_room_state --rooms 1000 10000 50000 --rounds 5 --threads 8
+"""
+from concurrent.futures import ThreadPoolExecutor
+from random import Random
+from time import perf_counter, sleep
+from typing import Dict, List, Tuple
+import argparse
+
+from src.game_state import MOVES, RoomState
+
+
+def _expected_move(room_index: int, seat: str, round_number: int) -> str:
+    """
+    Deterministic move of a seat in a given room and round, so resolved rounds can be checked.
+    """
+    offset = 0 if seat == "player1" else 1
+    return MOVES[(room_index + round_number + offset) % len(MOVES)]
+
+
+def run(n_rooms: int, n_rounds: int, n_threads: int, seed: int = 0) -> Dict[str, float]:
+    """
+    Play `n_rounds` rounds in each of `n_rooms` rooms with moves interleaved across rooms and threads.
+
+    Returns:
+        Dict[str, float]: Number of moves, elapsed seconds, moves per second and per-move cost in microseconds.
+    """
+    codes = [f"R{index:06d}" for index in range(n_rooms)]
+    rooms = {code: RoomState() for code in codes}
+
+    moves: List[Tuple[int, str, int]] = []
+    for round_number in range(1, n_rounds + 1):
+        round_moves = [(index, seat, round_number) for index in range(n_rooms) for seat in ("player1", "player2")]
+        Random(seed + round_number).shuffle(round_moves)
+        moves.extend(round_moves)
+
+    chunks = [moves[start::n_threads] for start in range(n_threads)]
+    errors: List[str] = []
+
+    def play(chunk: List[Tuple[int, str, int]]) -> None:
+        for index, seat, round_number in chunk:
+            room = rooms[codes[index]]
+            # A seat may only play once the room reached its round; spin until the other seat caught up.
+            while room.round < round_number:
+                sleep(0)
+            resolved = room.register_choice(seat, _expected_move(index, seat, round_number))
+            if resolved is None:
+                continue
+            resolved_round, choices, _ = resolved
+            expected = {s: _expected_move(index, s, resolved_round) for s in ("player1", "player2")}
+            if choices != expected:
+                errors.append(f"{codes[index]} round {resolved_round}: {choices} != {expected}")
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        list(executor.map(play, chunks))
+    elapsed = perf_counter() - start
+
+    if errors:
+        raise AssertionError(f"{len(errors)} cross-room errors, first: {errors[0]}")
+
+    unfinished = [code for code, room in rooms.items() if room.round != n_rounds + 1]
+    if unfinished:
+        raise AssertionError(f"{len(unfinished)} rooms did not finish all rounds, first: {unfinished[0]}")
+
+    return {"moves": len(moves),
+            "seconds": elapsed,
+            "moves_per_second": len(moves) / elapsed,
+            "us_per_move": elapsed / len(moves) * 1e6}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    for n_rooms in args.rooms:
+        result = run(n_rooms, args.rounds, args.threads)
+        print(f"rooms={n_rooms:>7} moves={result['moves']:>8} "
+              f"{result['moves_per_second']:>12,.0f} moves/s {result['us_per_move']:>7.2f} us/move")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Measure the cost of a move's result delivery as the number of spectators of the room grows.
+
+"direct" emits the result to the spectator channel from the move handler, so the handler pays for every
+spectator. "feed" publishes it to `SpectatorFeed`, and a flush later sends every event of the interval as one batch.
+Sockets are attached to a python-socketio server whose packet transport is replaced by a counter, so only the
+server side cost of building and routing the events is measured.
+
+Usage:
+    python -m benchmarks.bench_spectators --spectators 0 100 1000 10000 --moves 200
+"""
+from time import perf_counter
+from typing import Dict
+import argparse
+
+import socketio
+
+from src.spectators import SpectatorFeed, spectator_channel
+
+NAMESPACE = "/"
+ROOM = "ABCD"
+
+
+def _build_server(n_spectators: int) -> socketio.Server:
+    """
+    Build a server with two players in the room and `n_spectators` sockets in its spectator channel.
+    """
+    server = socketio.Server(async_mode="threading")
+    server.sent_packets = 0
+
+    def count_packet(eio_sid, eio_packet) -> None:
+        server.sent_packets += 1
+
+    server._send_eio_packet = count_packet  # pylint: disable=protected-access
+
+    for seat in ("player1", "player2"):
+        sid = server.manager.connect(seat, NAMESPACE)
+        server.manager.enter_room(sid, NAMESPACE, ROOM, seat)
+
+    for index in range(n_spectators):
+        eio_sid = f"spectator{index}"
+        sid = server.manager.connect(eio_sid, NAMESPACE)
+        server.manager.enter_room(sid, NAMESPACE, spectator_channel(ROOM), eio_sid)
+
+    return server
+
+
+def run(n_spectators: int, n_moves: int, moves_per_flush: int) -> Dict[str, float]:
+    """
+    Deliver the results of `n_moves` moves both ways.
+
+    Returns:
+        Dict[str, float]: Microseconds per move in the handler for both ways, and the feed's flush cost per move and
+        packets per move.
+    """
+    server = _build_server(n_spectators)
+    result_data = {"result": "player1", "choices": {"player1": "rock", "player2": "scissor"}}
+    result = {}
+
+    server.sent_packets = 0
+    start = perf_counter()
+    for _ in range(n_moves):
+        server.emit("result", result_data, room=ROOM, namespace=NAMESPACE)
+        server.emit("spectator_events", {"player_room_id": ROOM, "events": [{"event": "result", "data": result_data}]},
+                    room=spectator_channel(ROOM), namespace=NAMESPACE)
+    result["direct_us"] = (perf_counter() - start) / n_moves * 1e6
+    result["direct_packets"] = server.sent_packets / n_moves
+
+    feed = SpectatorFeed(lambda event, data, room: server.emit(event, data, room=room, namespace=NAMESPACE))
+    feed.watch("spectator", ROOM)
+    server.sent_packets = 0
+    handler, flushing = 0.0, 0.0
+    for move in range(n_moves):
+        start = perf_counter()
+        server.emit("result", result_data, room=ROOM, namespace=NAMESPACE)
+        feed.publish(ROOM, "result", result_data)
+        handler += perf_counter() - start
+
+        if (move + 1) % moves_per_flush == 0:
+            start = perf_counter()
+            feed.flush()
+            flushing += perf_counter() - start
+    start = perf_counter()
+    feed.flush()
+    flushing += perf_counter() - start
+
+    result["feed_us"] = handler / n_moves * 1e6
+    result["flush_us"] = flushing / n_moves * 1e6
+    result["feed_packets"] = server.sent_packets / n_moves
+
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spectators", type=int, nargs="+", default=[0, 100, 1000, 10000])
+    parser.add_argument("--moves", type=int, default=200)
+    parser.add_argument("--moves-per-flush", type=int, default=10,
+                        help="moves resolved in the room during one flush interval")
+    args = parser.parse_args()
+
+    for n_spectators in args.spectators:
+        result = run(n_spectators, args.moves, args.moves_per_flush)
+        print(f"spectators={n_spectators:>6}  direct {result['direct_us']:>9.1f} us/move "
+              f"({result['direct_packets']:>6.0f} packets)  feed {result['feed_us']:>6.1f} us/move in the handler "
+              f"+ {result['flush_us']:>8.1f} us/move in the flush ({result['feed_packets']:>6.0f} packets)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Load test of the HTTP routes and Socket.IO events of a game, with the Flask and Flask-SocketIO test clients.
+
+N concurrent players sign up and log in, then pair up: one creates a room playing best-of-B series, the other
+joins it, both start the game and play R rounds. Every request and event is timed, and the p50/p95/p99 latency and
+throughput of each route and event are printed and written as JSON to benchmarks/results/, so runs can be compared
+across releases.
+
+The suite runs fully offline: by default the app uses an in-memory Mongo stand-in (`pip install mongomock`),
+`--mongo-uri` points it at a local mongod instead.
+
+Usage:
+    python -m benchmarks.load_test --players 100 --rounds 10 --best-of 3 [--mongo-uri mongodb://localhost:27017]
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, TypeVar
+import argparse
+import json
+import os
+import platform
+import subprocess
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+MOVES = ("rock", "paper", "scissor")
+
+T = TypeVar("T")
+
+
+class LatencyRecorder:
+    """
+    Thread-safe latencies of every timed route and event.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._samples: Dict[str, List[float]] = defaultdict(list)
+
+    def time(self, name: str, call: Callable[[], T]) -> T:
+        start = perf_counter()
+        result = call()
+        elapsed = perf_counter() - start
+
+        with self._lock:
+            self._samples[name].append(elapsed)
+
+        return result
+
+    def summary(self, seconds: float) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize the latencies of every route and event, in milliseconds, with their throughput over `seconds`.
+        """
+        return {name: {"count": len(samples),
+                       "p50_ms": _percentile(samples, 50) * 1e3,
+                       "p95_ms": _percentile(samples, 95) * 1e3,
+                       "p99_ms": _percentile(samples, 99) * 1e3,
+                       "max_ms": max(samples) * 1e3,
+                       "per_second": len(samples) / seconds}
+                for name, samples in sorted(self._samples.items())}
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def _check(response, name: str, status: int = 302):
+    if response.status_code != status:
+        raise AssertionError(f"{name} returned {response.status_code}, expected {status}")
+    return response
+
+
+def _play_pair(server, recorder: LatencyRecorder, pair: int, rounds: int, best_of: int) -> None:
+    """
+    Sign up, log in and play `rounds` rounds between the two players of a pair.
+    """
+    app, socketio = server.app, server.socketio
+    names = [f"load{pair}a", f"load{pair}b"]
+    clients = [app.test_client(), app.test_client()]
+
+    for name, client in zip(names, clients):
+        recorder.time("GET /", lambda: _check(client.get("/"), "GET /", 200))
+        recorder.time("POST /signup/", lambda: _check(client.post("/signup/", data={
+            "username": name, "email": f"{name}@example.com", "password": "password",
+            "confirm_password": "password"}), "POST /signup/"))
+        recorder.time("POST /", lambda: _check(client.post("/", data={
+            "email": f"{name}@example.com", "password": "password"}), "POST /"))
+
+    host, guest = clients
+    response = recorder.time("POST /create-game/", lambda: _check(host.post("/create-game/", data={"best_of": best_of}),
+                                                                  "POST /create-game/"))
+    room = response.headers["Location"].split("room=")[1]
+    recorder.time("POST /join-game/", lambda: _check(guest.post("/join-game/", data={"player_room_id": room}),
+                                                     "POST /join-game/"))
+
+    sockets = [socketio.test_client(app, flask_test_client=client) for client in clients]
+    for socket in sockets:
+        recorder.time("start_game", lambda: socket.emit("start_game"))
+
+    for round_number in range(rounds):
+        for seat, socket in enumerate(sockets):
+            code = (round_number + pair + seat) % len(MOVES)
+            recorder.time("move", lambda: socket.emit("move", code))
+
+        # The test clients queue every event they receive
+        for socket in sockets:
+            socket.get_received()
+
+    for name, client in zip(names, clients):
+        recorder.time("GET /profile/<username>", lambda: _check(client.get(f"/profile/{name}"),
+                                                                "GET /profile/<username>", 200))
+        recorder.time("GET /leaderboard/", lambda: _check(client.get("/leaderboard/"), "GET /leaderboard/", 200))
+
+    for socket in sockets:
+        socket.disconnect()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(players: int, rounds: int, concurrency: int, best_of: int = 1) -> Dict:
+    """
+    Play `players` / 2 games of `rounds` rounds in best-of-`best_of` series with `concurrency` games at a time.
+
+    Returns:
+        Dict: The run parameters, the total duration, the number of matches written and the latency summary of
+        every route and event.
+    """
+    # Imported here so that the database and bcrypt settings are in place first
+    import server
+
+    server.app.config["WTF_CSRF_ENABLED"] = False
+    server.create_indexes()
+
+    recorder = LatencyRecorder()
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(_play_pair, server, recorder, pair, rounds, best_of)
+                       for pair in range(players // 2)]:
+            future.result()
+    seconds = perf_counter() - start
+
+    # Results are persisted once per finished series, each write being one match and both players' results
+    matches_written = server.matches.count_documents({})
+
+    return {"date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "players": players,
+            "rounds": rounds,
+            "concurrency": concurrency,
+            "best_of": best_of,
+            "seconds": seconds,
+            "matches_written": matches_written,
+            "latency": recorder.summary(seconds)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=10, help="rounds played by every pair of players")
+    parser.add_argument("--concurrency", type=int, default=16, help="games played at the same time")
+    parser.add_argument("--best-of", type=int, default=1, choices=(1, 3, 5, 7), help="rounds of a series")
+    parser.add_argument("--mongo-uri", help="local mongod to use instead of the in-memory stand-in")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/<date>.json)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "load-test")
+    os.environ.setdefault("PASSWORD", "load-test")
+    # Hashing cost is benchmarked separately by bench_login, a cheap one keeps the web paths in focus
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("RESULT_WRITE_BEHIND", "0")
+
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+    else:
+        import mongomock
+        import pymongo
+
+        pymongo.MongoClient = mongomock.MongoClient
+
+    result = run(args.players, args.rounds, args.concurrency, args.best_of)
+    result["database"] = args.mongo_uri or "mongomock"
+
+    print(f"{'route / event':<26} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'per s':>9}")
+    for name, stats in result["latency"].items():
+        print(f"{name:<26} {stats['count']:>7} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+              f"{stats['p99_ms']:>8.2f} {stats['per_second']:>9.1f}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(result, file, indent=2)
+    print(f"{args.players // 2} games in {result['seconds']:.2f}s, {result['matches_written']} series written to the "
+          f"database, results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
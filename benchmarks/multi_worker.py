@@ -0,0 +1,148 @@
+"""
+Multi-process harness: start two `server.py` workers sharing rooms and check that a room created on worker A can
+be joined and played from worker B.
+
+Needs a local mongod and a Socket.IO message queue (e.g. redis-server), and the client extras
+`pip install "python-socketio[client]" requests`.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 \
+        python -m benchmarks.multi_worker --ports 8081 8082
+"""
+from threading import Event
+from time import monotonic, sleep
+from typing import List
+import argparse
+import os
+import re
+import subprocess
+import sys
+import uuid
+
+import requests
+import socketio
+
+from src.game_state import MOVES, OUTCOMES
+
+CSRF_TOKEN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def start_worker(port: int) -> subprocess.Popen:
+    """
+    Start one server worker on `port` with the shared room registry.
+    """
+    env = dict(os.environ,
+               PORT=str(port),
+               DEBUG="0",
+               ROOM_REGISTRY="mongo",
+               BCRYPT_ROUNDS=os.environ.get("BCRYPT_ROUNDS", "4"),
+               SECRET_KEY=os.environ.get("SECRET_KEY", "multi-worker-harness"))
+    return subprocess.Popen([sys.executable, "server.py"], env=env)
+
+
+def wait_until_up(base_url: str, timeout: float = 30) -> None:
+    deadline = monotonic() + timeout
+    while monotonic() < deadline:
+        try:
+            requests.get(base_url, timeout=1)
+            return
+        except requests.ConnectionError:
+            sleep(0.2)
+    raise RuntimeError(f"{base_url} did not start within {timeout} s")
+
+
+def _csrf_token(http: requests.Session, url: str) -> str:
+    return CSRF_TOKEN.search(http.get(url).text).group(1)
+
+
+def sign_up_and_log_in(base_url: str, username: str) -> requests.Session:
+    """
+    Create a user through the signup form and log it in, returning the logged in HTTP session.
+    """
+    http = requests.Session()
+    email = f"{username}@example.com"
+
+    http.post(f"{base_url}/signup/", data={"csrf_token": _csrf_token(http, f"{base_url}/signup/"),
+                                           "username": username, "email": email,
+                                           "password": "password", "confirm_password": "password"})
+    response = http.post(f"{base_url}/", data={"csrf_token": _csrf_token(http, f"{base_url}/"),
+                                               "email": email, "password": "password"})
+    if not response.url.endswith("/lobby/"):
+        raise AssertionError(f"{username} could not log in on {base_url}")
+
+    return http
+
+
+def connect(base_url: str, http: requests.Session, received: List[List[int]], results: Event) -> socketio.Client:
+    """
+    Open a Socket.IO connection carrying the HTTP session cookie and record every round event.
+    """
+    client = socketio.Client()
+
+    @client.on("round")
+    def on_round(data: List[int]) -> None:
+        received.append(data)
+        results.set()
+
+    cookie = "; ".join(f"{name}={value}" for name, value in http.cookies.items())
+    client.connect(base_url, headers={"Cookie": cookie}, transports=["websocket"])
+    return client
+
+
+def run(port_a: int, port_b: int) -> None:
+    url_a, url_b = f"http://127.0.0.1:{port_a}", f"http://127.0.0.1:{port_b}"
+    suffix = uuid.uuid4().hex[:6]
+
+    alice = sign_up_and_log_in(url_a, f"alice{suffix}")
+    bob = sign_up_and_log_in(url_b, f"bob{suffix}")
+
+    # Alice creates the room on worker A, Bob joins it through worker B
+    room_code = alice.post(f"{url_a}/create-game/").url.split("room=")[1]
+    joined = bob.post(f"{url_b}/join-game/", data={"player_room_id": room_code})
+    if "room=" not in joined.url:
+        raise AssertionError(f"room {room_code} created on worker A could not be joined on worker B")
+    print(f"room {room_code} created on {url_a} and joined on {url_b}")
+
+    received_a: List[List[int]] = []
+    received_b: List[List[int]] = []
+    result_a, result_b = Event(), Event()
+    client_a = connect(url_a, alice, received_a, result_a)
+    client_b = connect(url_b, bob, received_b, result_b)
+
+    try:
+        client_a.emit("start_game")
+        client_b.emit("start_game")
+        sleep(0.5)
+
+        client_a.emit("move", MOVES.index("rock"))
+        client_b.emit("move", MOVES.index("scissor"))
+
+        if not (result_a.wait(10) and result_b.wait(10)):
+            raise AssertionError(f"result not delivered to both workers: A={received_a} B={received_b}")
+        if OUTCOMES[received_a[0][0]] != "player1" or OUTCOMES[received_b[0][0]] != "player1":
+            raise AssertionError(f"unexpected results A={received_a} B={received_b}")
+
+        print(f"round played across workers, both sides received {received_a[0]}")
+    finally:
+        client_a.disconnect()
+        client_b.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ports", type=int, nargs=2, default=[8081, 8082])
+    args = parser.parse_args()
+
+    workers = [start_worker(port) for port in args.ports]
+    try:
+        for port in args.ports:
+            wait_until_up(f"http://127.0.0.1:{port}")
+        run(*args.ports)
+    finally:
+        for worker in workers:
+            worker.terminate()
+            worker.wait()
+
+
+if __name__ == "__main__":
+    main()
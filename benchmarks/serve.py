@@ -0,0 +1,30 @@
+"""
+Run the server like `python server.py`, on the in-memory Mongo stand-in (`pip install mongomock`) unless MONGO_URI
+is set. Used by the benchmarks that need a real server process, in any ASYNC_MODE.
+
+Usage:
+    ASYNC_MODE=eventlet PORT=8080 DEBUG=0 python -m benchmarks.serve
+"""
+# Nothing but the standard library may be imported before the async mode patches it
+from src.async_mode import monkey_patch
+
+monkey_patch()
+
+import os
+import runpy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main() -> None:
+    if not os.environ.get("MONGO_URI"):
+        import mongomock
+        import pymongo
+
+        pymongo.MongoClient = mongomock.MongoClient
+
+    runpy.run_path(os.path.join(ROOT, "server.py"), run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
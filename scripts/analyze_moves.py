@@ -0,0 +1,48 @@
+"""
+Analyze the move log without touching the database: move and outcome distributions of every round, the
+tendencies of a player, or the replay of a room.
+
+The segments are memory-mapped and scanned one at a time, so the log may hold hundreds of millions of rounds. Run
+it on a copy of the segments, or next to a running server: the rounds still buffered by the server are left out.
+
+Usage:
+    python -m scripts.analyze_moves [--dir move_log] [--player USERNAME] [--room CODE]
+"""
+from datetime import datetime
+from time import perf_counter
+import argparse
+import json
+
+from src.game_state import MOVES, OUTCOMES
+from src.move_log import MOVE_LOG_DIR, MoveLogReader
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=MOVE_LOG_DIR or "move_log", help="folder of the move log segments")
+    parser.add_argument("--player", help="show the moves, results and move transitions of a player")
+    parser.add_argument("--room", help="replay every round of a room")
+    args = parser.parse_args()
+
+    reader = MoveLogReader(args.dir)
+    start = perf_counter()
+
+    if args.room:
+        rounds = reader.replay(args.room)
+        for record in rounds:
+            print(f"{datetime.fromtimestamp(record['time']):%Y-%m-%d %H:%M:%S} round {record['round']}: "
+                  f"{MOVES[record['move1']]} - {MOVES[record['move2']]}, {OUTCOMES[record['outcome']]}")
+        print(f"{len(rounds)} rounds of room {args.room} in {perf_counter() - start:.2f}s")
+        return
+
+    if args.player:
+        result = reader.player_tendencies(args.player)
+    else:
+        result = reader.summary()
+
+    print(json.dumps(result, indent=2))
+    print(f"{len(reader.segment_paths())} segments scanned in {perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Build the static assets: self-host the client libraries, fingerprint every file and precompress the text ones.
+
+1. The client libraries of `VENDOR_ASSETS` are downloaded to static/vendor/ and checked against their integrity
+   hash, so the app needs no CDN at runtime. Libraries already downloaded are kept, and with `--offline` the
+   missing ones keep being loaded from their CDN.
+2. Every file of the static folder is copied to ASSETS_DIR (default static/dist/) under a content-hashed name,
+   and CSS, JavaScript and SVG files get gzip and, with the `brotli` package, brotli variants.
+3. `--images webp` re-encodes the PNG images to WebP when that is smaller (`pip install Pillow`).
+
+The server picks the manifest up at startup and serves the files under /assets/ with immutable caching.
+
+Usage:
+    python -m scripts.build_assets [--images webp] [--offline]
+"""
+from base64 import b64encode
+from typing import Dict, List, Optional
+from urllib.request import urlopen
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from src.assets import ASSETS_DIR, ASSETS_MANIFEST, ENCODINGS, STATIC_DIR, VENDOR_ASSETS, fingerprint
+
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt")
+
+
+def _integrity(content: bytes, algorithm: str) -> str:
+    return f"{algorithm}-{b64encode(hashlib.new(algorithm, content).digest()).decode()}"
+
+
+def vendor_libraries(offline: bool) -> None:
+    """
+    Download the missing client libraries to the static folder.
+
+    Raises:
+        RuntimeError: If a library doesn't match its integrity hash.
+    """
+    for path, (url, integrity) in VENDOR_ASSETS.items():
+        target = os.path.join(STATIC_DIR, path)
+        algorithm = integrity.split("-", 1)[0]
+
+        if os.path.exists(target):
+            with open(target, "rb") as file:
+                content = file.read()
+        elif offline:
+            print(f"{path} is missing and stays on {url}")
+            continue
+        else:
+            with urlopen(url, timeout=30) as response:
+                content = response.read()
+
+        if _integrity(content, algorithm) != integrity:
+            raise RuntimeError(f"{path} doesn't match its integrity hash {integrity}")
+
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as file:
+                file.write(content)
+
+
+def _to_webp(content: bytes) -> bytes:
+    from PIL import Image
+
+    output = io.BytesIO()
+    with Image.open(io.BytesIO(content)) as image:
+        image.save(output, format="WEBP", quality=85, method=6)
+    return output.getvalue()
+
+
+def _compress(content: bytes, encoding: str) -> Optional[bytes]:
+    if encoding == "gzip":
+        # No timestamp in the header, so a build of the same files gives the same bytes
+        return gzip.compress(content, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(content, quality=11)
+    return None
+
+
+def build(output: str = ASSETS_DIR, images: str = "png") -> Dict[str, int]:
+    """
+    Fingerprint and precompress every file of the static folder into `output`, and write its manifest.
+
+    Args:
+        output (str): The build folder, emptied first.
+        images (str): "png" keeps the images, "webp" re-encodes the PNG ones when that is smaller.
+
+    Returns:
+        Dict[str, int]: The number of files, their total size and the total size of each encoding.
+    """
+    shutil.rmtree(output, ignore_errors=True)
+
+    assets: Dict[str, str] = {}
+    encodings: Dict[str, List[str]] = {}
+    sizes = {"files": 0, "bytes": 0, "gzip": 0, "br": 0}
+
+    for directory, subdirectories, filenames in os.walk(STATIC_DIR):
+        # Never fingerprint a previous build
+        subdirectories[:] = [name for name in subdirectories
+                             if os.path.abspath(os.path.join(directory, name)) != os.path.abspath(output)]
+
+        for filename in sorted(filenames):
+            source = os.path.join(directory, filename)
+            path = os.path.relpath(source, STATIC_DIR).replace(os.sep, "/")
+            with open(source, "rb") as file:
+                content = file.read()
+
+            served_path = path
+            if images == "webp" and path.endswith(".png"):
+                webp = _to_webp(content)
+                if len(webp) < len(content):
+                    content, served_path = webp, path[:-len(".png")] + ".webp"
+
+            hashed = fingerprint(served_path, content)
+            target = os.path.join(output, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as file:
+                file.write(content)
+
+            assets[path] = hashed
+            sizes["files"] += 1
+            sizes["bytes"] += len(content)
+
+            if not served_path.endswith(COMPRESSIBLE):
+                continue
+
+            for encoding, extension in ENCODINGS:
+                compressed = _compress(content, encoding)
+                if compressed is None or len(compressed) >= len(content):
+                    continue
+
+                with open(target + extension, "wb") as file:
+                    file.write(compressed)
+                encodings.setdefault(hashed, []).append(encoding)
+                sizes[encoding] += len(compressed)
+
+    with open(os.path.join(output, ASSETS_MANIFEST), "w") as file:
+        json.dump({"assets": assets, "encodings": encodings}, file, indent=2, sort_keys=True)
+
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=ASSETS_DIR)
+    parser.add_argument("--images", choices=("png", "webp"), default="png")
+    parser.add_argument("--offline", action="store_true", help="don't download the missing client libraries")
+    args = parser.parse_args()
+
+    vendor_libraries(args.offline)
+    sizes = build(args.output, args.images)
+
+    print(f"{sizes['files']} assets, {sizes['bytes'] / 1024:.0f} KiB, text assets precompressed to "
+          f"{sizes['gzip'] / 1024:.0f} KiB gzip and {sizes['br'] / 1024:.0f} KiB brotli, written to {args.output}")
+    if brotli is None:
+        print("brotli is not installed, only gzip variants were written (pip install brotli)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Move the game history embedded in user documents ("games": {"datetime": [], "rps": [], "result": []}) to the
+matches collection and remove it from the users.
+
+The embedded history only holds the user's own move and result, so migrated matches have no opponent: "players"
+and "moves" hold None for the opponent seat. Each user is migrated with one insert and one `$unset`, and matches
+get ids derived from the user and game position, so the script can be stopped and run again safely.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 python -m scripts.migrate_embedded_games [--batch-size 1000]
+"""
+from typing import Dict, List
+import argparse
+
+from pymongo.errors import BulkWriteError
+
+from src.database import matches, users, create_indexes
+
+
+def build_migrated_matches(user: Dict) -> List[Dict]:
+    """
+    Build the match documents of the games embedded in a user document.
+
+    Args:
+        user (Dict): The user document with its "games" arrays.
+
+    Returns:
+        List[Dict]: One match per embedded game, with the user in the first seat.
+    """
+    games = user.get("games") or {}
+    migrated = []
+
+    for position, (played_at, move, result) in enumerate(zip(games.get("datetime", []),
+                                                             games.get("rps", []),
+                                                             games.get("result", []))):
+        if result == "tie":
+            winner = None
+        else:
+            winner = 0 if result == "win" else 1
+
+        migrated.append({"_id": f"migrated-{user['_id']}-{position}",
+                         "room": None,
+                         "players": [user["username"], None],
+                         "moves": [move, None],
+                         "winner": winner,
+                         "played_at": played_at})
+
+    return migrated
+
+
+def migrate(batch_size: int) -> Dict[str, int]:
+    """
+    Migrate every user that still has an embedded history.
+
+    Returns:
+        Dict[str, int]: The number of migrated users and inserted matches.
+    """
+    migrated_users, inserted_matches = 0, 0
+
+    for user in users.find({"games": {"$exists": True}}, {"username": 1, "games": 1}, batch_size=batch_size):
+        migrated = build_migrated_matches(user)
+
+        if migrated:
+            try:
+                inserted_matches += len(matches.insert_many(migrated, ordered=False).inserted_ids)
+            except BulkWriteError as error:
+                # Matches inserted by an interrupted earlier run are duplicates, anything else is a real failure
+                if any(write_error["code"] != 11000 for write_error in error.details["writeErrors"]):
+                    raise
+                inserted_matches += error.details["nInserted"]
+
+        users.update_one({"_id": user["_id"]}, {"$unset": {"games": ""}})
+        migrated_users += 1
+
+    return {"users": migrated_users, "matches": inserted_matches}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    create_indexes()
+    result = migrate(args.batch_size)
+    print(f"migrated {result['users']} users, inserted {result['matches']} matches")
+
+
+if __name__ == "__main__":
+    main()
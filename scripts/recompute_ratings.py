@@ -0,0 +1,102 @@
+"""
+Recompute the rating of every user from the whole match history, and write it to the users collection.
+
+Matches are read once, without any sort on the database side, ordered by date in NumPy, and rated one rating period
+at a time with `recompute_ratings`. Users without any rated match, e.g. created before ratings existed and never
+played since, get RATING_INITIAL. Migrated matches without an opponent are skipped.
+
+Run it once after upgrading to ratings, then whenever the rating settings change. Series finishing while it runs
+may be overwritten, so run it when the servers are stopped or quiet.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 python -m scripts.recompute_ratings [--period-hours 24] [--batch-size 1000]
+"""
+from datetime import timezone
+from time import perf_counter
+from typing import Dict, List, Tuple
+import argparse
+
+import numpy as np
+from pymongo import UpdateOne
+
+from src.database import matches, users, create_indexes
+from src.rating import RATING_K, backfill_ratings, recompute_ratings
+
+# Score of the first player for every "winner" of a match: None is a tie
+WINNER_SCORES = {0: 1.0, 1: 0.0, None: 0.5}
+
+
+def load_history() -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Read the players, winner and date of every match with two players.
+
+    Returns:
+        Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The usernames, and the index of both
+        players, the score of the first player and the timestamp of every match, in chronological order.
+    """
+    indexes: Dict[str, int] = {}
+    player1, player2, scores1, played_at = [], [], [], []
+
+    for match in matches.find({}, {"_id": 0, "players": 1, "winner": 1, "played_at": 1}, batch_size=10000):
+        first, second = match["players"]
+        if first is None or second is None:
+            continue
+
+        player1.append(indexes.setdefault(first, len(indexes)))
+        player2.append(indexes.setdefault(second, len(indexes)))
+        scores1.append(WINNER_SCORES[match["winner"]])
+        # Dates are stored as naive UTC
+        played_at.append(match["played_at"].replace(tzinfo=timezone.utc).timestamp())
+
+    order = np.argsort(np.array(played_at), kind="stable")
+    return (list(indexes), np.array(player1, dtype=np.int64)[order], np.array(player2, dtype=np.int64)[order],
+            np.array(scores1)[order], np.array(played_at)[order])
+
+
+def write_ratings(usernames: List[str], ratings: np.ndarray, batch_size: int) -> int:
+    """
+    Write the rating of every rated user, and RATING_INITIAL to the users without a rating.
+
+    Returns:
+        int: The number of users updated.
+    """
+    updated = 0
+    for start in range(0, len(usernames), batch_size):
+        operations = [UpdateOne({"username": username}, {"$set": {"rating": float(rating)}})
+                      for username, rating in zip(usernames[start:start + batch_size],
+                                                  ratings[start:start + batch_size])]
+        updated += users.bulk_write(operations, ordered=False).modified_count
+
+    return updated + backfill_ratings()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--period-hours", type=float, default=24,
+                        help="length of a rating period, 0 rates every match on its own like the server does")
+    parser.add_argument("--k", type=float, default=RATING_K, help="maximum rating change of a match")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    create_indexes()
+
+    start = perf_counter()
+    usernames, player1, player2, scores1, played_at = load_history()
+    loaded = perf_counter()
+
+    if args.period_hours > 0:
+        periods = (played_at // (args.period_hours * 3600)).astype(np.int64)
+    else:
+        periods = np.arange(len(played_at))
+
+    ratings = recompute_ratings(player1, player2, scores1, periods, len(usernames), args.k)
+    computed = perf_counter()
+
+    updated = write_ratings(usernames, ratings, args.batch_size)
+
+    print(f"{len(played_at)} matches of {len(usernames)} players loaded in {loaded - start:.2f}s, "
+          f"rated in {computed - loaded:.2f}s, {updated} users updated in {perf_counter() - computed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
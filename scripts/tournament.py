@@ -0,0 +1,36 @@
+"""
+Run a headless tournament between bot strategies with the vectorized simulator and print the standings.
+
+Fixed strategies are resolved as whole blocks of rounds, so tournaments between them run tens of millions of
+rounds per second. Adaptive strategies (beat_last, repeat_last, copy_last, maria) play round by round, vectorized
+across the games of a match.
+
+Usage:
+    python -m scripts.tournament [--format swiss --tournament-rounds 5] [--games 1000] [--rounds 100]
+        [--strategies random rock cycle maria]
+"""
+import argparse
+
+from src.simulation import STRATEGIES, format_standings, round_robin, swiss
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=("round_robin", "swiss"), default="round_robin")
+    parser.add_argument("--tournament-rounds", type=int, default=5, help="rounds of a Swiss tournament")
+    parser.add_argument("--games", type=int, default=1000, help="games of every match")
+    parser.add_argument("--rounds", type=int, default=100, help="rounds of every game")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.format == "swiss":
+        result = swiss(args.strategies, args.tournament_rounds, args.games, args.rounds, args.seed)
+    else:
+        result = round_robin(args.strategies, args.games, args.rounds, args.seed)
+
+    print(format_standings(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,49 @@
-from flask import Flask, render_template, url_for, session, redirect, jsonify, request, flash
+from dotenv import load_dotenv
+
+# Load environment variables from .env file, before the modules reading their settings at import are imported
+load_dotenv()
+
+# With eventlet or gevent, the standard library is patched right after the .env file, which may set ASYNC_MODE, is
+# loaded. python-dotenv already imported a few standard modules, threading among them through logging: they are
+# patched in place, only the locks they created at import stay native.
+from src.async_mode import ASYNC_MODE, monkey_patch
+monkey_patch()
+
+from flask import Flask, render_template, url_for, session, redirect, jsonify, request, flash, g
 from flask_socketio import SocketIO, join_room, leave_room
 from typing import Union, Tuple, Dict, Optional
-from string import ascii_uppercase
-from dotenv import load_dotenv
+from datetime import datetime
+from time import perf_counter
+from threading import Lock
 from werkzeug import Response
-from random import choices
-import bcrypt
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+import atexit
 import uuid
 import html
 import os
 
 from src.forms import RegistrationForm, LoginForm, JoinRoom, EditUserForm
-from src.maria_brain import generate_maria_choice
-from src.database import users
-
+from src.game_state import MOVES, OUTCOMES, SEATS, SERIES_BEST_OF, SERIES_LENGTHS, SeriesScore, resolve_round
+from src.maria_brain import generate_maria_choice, record_maria_round, MARIA_THINKING_DELAY
+from src.scheduler import DelayedCallScheduler
+from src.room_registry import create_room_registry
+from src.room_manager import RoomManager
+from src.matchmaking import MatchmakingQueue
+from src.spectators import SpectatorFeed, spectator_channel
+from src.seats import SeatIndex
+from src.ranking import get_user_rank, record_new_user, record_win
+from src.rating import backfill_ratings, get_rating_page, get_ratings, rating_change, RATING_INITIAL, SCORES
+from src.leaderboard import get_leaderboard_page, leaderboard_cache, LEADERBOARD_PAGE_SIZE
+from src.result_writer import ResultWriter, build_result_update, RESULT_WRITE_BEHIND
+from src.move_log import MoveLog, MOVE_LOG_DIR
+from src.passwords import password_pool, PasswordPoolSaturated
+from src.matches import build_match, describe_match, recent_matches, rename_player
+from src.database import users, matches, create_indexes, check_health
+from src.user_cache import user_cache
+from src.metrics import registry, http_request_seconds, connected_sockets, timed, timer, socket_event
+from src.assets import AssetManifest, asset_integrity
 
-# Load environment variables from .env file
-load_dotenv()
 
 intern_players_password = os.environ.get("PASSWORD")
 
@@ -25,14 +52,55 @@ app = Flask(__name__)
 # Access environment variables using os.environ
 app.secret_key = os.environ.get("SECRET_KEY")
 
-# Start SocketIo
-socketio = SocketIO(app, cors_allowed_origins='*')
+# Fingerprinted and precompressed static files of `python -m scripts.build_assets`, if it ran
+asset_manifest = AssetManifest.load()
+app.jinja_env.globals.update(asset_url=asset_manifest.url, asset_integrity=asset_integrity)
+
+# Start SocketIo, with a message queue (e.g. redis://redis:6379/0) when several workers serve the same rooms
+# SOCKETIO_SERIALIZER=msgpack encodes packets in binary for clients using a msgpack parser (pip install msgpack)
+socketio = SocketIO(app, cors_allowed_origins='*', async_mode=ASYNC_MODE,
+                    message_queue=os.environ.get("SOCKETIO_MESSAGE_QUEUE"),
+                    serializer=os.environ.get("SOCKETIO_SERIALIZER", "default"))
+
+LOGIN_PROJECTION = {"username": 1, "password": 1}
 
 # Socket global variables
-players = {}
+room_registry = create_room_registry()
 
-choice = {'player1': None,
-          'player2': None}
+BOT_PLAYERS = ("random_player", "maria")
+
+# Delayed bot moves, run from a single background task
+bot_scheduler = DelayedCallScheduler(socketio.start_background_task)
+# Rooms with a bot move scheduled and not played yet, so a player sending its move twice gets a single bot move.
+# The player's and the bot's moves of a room are registered under the same lock, striped so rooms rarely share one.
+pending_bot_moves = set()
+bot_move_locks = [Lock() for _ in range(64)]
+
+# Room code allocation and idle room eviction
+room_manager = RoomManager(room_registry)
+
+# Players waiting for a random human opponent
+matchmaking_queue = MatchmakingQueue()
+
+# Room and seat of every player socket, so moves don't have to tell them
+seat_index = SeatIndex()
+
+# Spectators get the events of the rooms they watch in batches, sent by a background task. With a message queue,
+# the spectators of a room may be connected to another process
+spectator_feed = SpectatorFeed(socketio.emit, shared=bool(os.environ.get("SOCKETIO_MESSAGE_QUEUE")))
+
+registry.gauge("rps_active_rooms", "Game rooms open in the room registry.", lambda: len(room_registry))
+registry.gauge("rps_matchmaking_waiting", "Players waiting in the matchmaking queue.",
+               lambda: matchmaking_queue.stats()["depth"])
+registry.gauge("rps_spectators", "Sockets watching a game room.", lambda: spectator_feed.stats()["spectators"])
+registry.gauge("rps_user_cache_hit_ratio", "Username, email and profile lookups answered without the database.",
+               lambda: user_cache.stats()["hit_ratio"])
+
+# Game results buffered and written in batches when RESULT_WRITE_BEHIND is enabled
+result_writer = ResultWriter(users, matches)
+# Every resolved round, appended to the binary move log of MOVE_LOG_DIR when it is set
+move_log = MoveLog()
+intern_players_created = set()
 
 
 # Player functions
@@ -61,7 +129,7 @@ def is_available_username(username: str) -> bool:
     Returns:
         bool: True if the username is available, False otherwise.
     """
-    return users.find_one({"username": username}) is None
+    return not user_cache.exists("username", username)
 
 
 def _search_db_available(db_search_type: str, user_search_type: str) -> bool:
@@ -77,7 +145,7 @@ def _search_db_available(db_search_type: str, user_search_type: str) -> bool:
         False otherwise.
     """
 
-    return users.find_one({db_search_type: user_search_type}) is None
+    return not user_cache.exists(db_search_type, user_search_type)
 
 
 def create_player(username: str, email: str, password: str) -> dict:
@@ -92,18 +160,17 @@ def create_player(username: str, email: str, password: str) -> dict:
     Returns:
         A dictionary containing the user's information.
     """
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode(), salt)
+    with timer("bcrypt_hash"):
+        hashed_password = password_pool.hash_password(password)
 
     user = {
         "_id": uuid.uuid4().hex,
         "username": username,
         "email": email,
-        "salt": salt,
         "password": hashed_password,
         "wins": 0,
         "played": 0,
-        "games": {"datetime": [], "rps": [], "result": []} 
+        "rating": RATING_INITIAL
     }
 
     return user
@@ -165,17 +232,61 @@ def _start_session(user: Dict[str, str]) -> redirect:
     return redirect('/lobby/')
 
 
-def _generate_room_code(string_length: int) -> str:
+def _close_expired_room(room_id: str, room_players: Dict[str, Optional[str]], series: SeriesScore) -> None:
+    """
+    Tell the clients of a room evicted for being idle that it is closed, and save its series in progress.
+
+    Args:
+        room_id: The room id of the evicted game.
+        room_players: A dictionary with the usernames of "player1" and "player2".
+        series: The series the room was playing.
+
+    Returns:
+        None
+    """
+    socketio.emit('room_expired', {'player_room_id': room_id}, room=room_id)
+    socketio.close_room(room_id)
+    spectator_feed.publish(room_id, 'room_expired', {})
+
+    _save_series_in_progress(room_id, room_players, series)
+
+
+def _notify_match(sid: str, player_room_id: str) -> None:
     """
-    Generate a random string of uppercase letters with the given length.
+    Tell a player waiting in the matchmaking queue which room to join.
 
     Args:
-        string_length (int): The length of the random string to generate.
+        sid: The socket id of the player.
+        player_room_id: The room id of the game.
+
+    Returns:
+        None
+    """
+    socketio.emit('match_found', {'player_room_id': player_room_id}, to=sid)
+
+
+def _expire_matchmaking() -> None:
+    """
+    Match every player that waited too long for a human opponent with the random bot.
+
+    Returns:
+        None
+    """
+    for ticket in matchmaking_queue.expire():
+        player_room_id = room_manager.open_room(ticket.username, "random_player")
+        _notify_match(ticket.sid, player_room_id)
+
+
+def _run_matchmaking_timeouts() -> None:
+    """
+    Expire waiting players forever. Meant to be started as a background task.
 
     Returns:
-        str: A random string of uppercase letters.
+        None
     """
-    return ''.join(choices(ascii_uppercase, k=string_length))
+    while True:
+        socketio.sleep(1)
+        _expire_matchmaking()
 
 
 def _check_valid_username(username: str) -> Union[None, redirect]:
@@ -216,13 +327,12 @@ def signup() -> Union[redirect, None]:
     """
 
     username = request.form.get('username')
+    email = request.form.get('email')
     _check_valid_username(username)
 
-    user = create_player(username=username,
-                         email=request.form.get('email'),
-                         password=request.form.get('password'))
-
-    available_email, available_name = check_email_and_username_availability(user=user)
+    # Taken names are rejected before paying for the password hash
+    available_email, available_name = check_email_and_username_availability(user={"username": username,
+                                                                                   "email": email})
 
     if not available_name or not available_email:
         flash("Username or email not avaliable")
@@ -230,7 +340,18 @@ def signup() -> Union[redirect, None]:
 
     _check_password()
 
-    users.insert_one(user)
+    user = create_player(username=username, email=email, password=request.form.get('password'))
+
+    # The unique indexes still catch a signup racing another one with the same username or email
+    try:
+        users.insert_one(user)
+    except DuplicateKeyError:
+        flash("Username or email not avaliable")
+        return redirect(url_for('signup_page'))
+
+    record_new_user()
+    leaderboard_cache.add_user(username)
+    user_cache.add_user(username, email)
 
     flash(f"User {username} sucefully created!")
 
@@ -258,12 +379,14 @@ def login() -> Optional[redirect]:
         otherwise a redirect to the home page.
     """
 
-    if len(list(users.find({}))) > 0:
-        user_found: dict = users.find_one({"email": request.form.get('email')})
+    # A single lookup on the unique email index, fetching only what the session and the password check need
+    user_found: dict = users.find_one({"email": request.form.get('email')}, LOGIN_PROJECTION)
 
-        if user_found and bcrypt.hashpw(request.form.get('password').encode(),
-                                        user_found['salt']) == user_found['password']:
+    if user_found:
+        with timer("bcrypt_check"):
+            password_matches = password_pool.check_password(request.form.get('password'), user_found['password'])
 
+        if password_matches:
             return _start_session(user_found)
 
     flash("Can't login due to wrong password or invalid email.")
@@ -280,97 +403,294 @@ def _get_winner(choice1: Union[str, None], choice2: Union[str, None]) -> str:
         choice2: A string representing the choice made by player 2.
 
     Returns:
-        A string indicating the result of the game. Can be "player1_win", "player2_win", or "TIE".
+        A string indicating the result of the game. Can be "player1", "player2", or "TIE".
     """
-    if choice1 == choice2:
-        return "TIE"
+    return resolve_round(choice1, choice2)
 
-    winning_combinations = {
-        'rock': 'scissor',
-        'scissor': 'paper',
-        'paper': 'rock'
-    }
 
-    if winning_combinations[choice1] == choice2:
-        return 'player1'
+def _record_win(player_name: str, old_wins: int) -> None:
+    """
+    Update the in-memory rank index and leaderboard cache after a win.
+
+    Args:
+        player_name: A string representing the username of win player.
+        old_wins: The number of wins of the player before this win.
 
-    return 'player2'
+    Returns:
+        None
+    """
+    record_win(old_wins)
+    leaderboard_cache.record_win(player_name, old_wins + 1)
 
 
-def _update_winner(player_name: str) -> None:
+def _results_written(results: Dict[str, Dict[str, float]]) -> None:
     """
-    Update the number of wins for the winner of the game in the database.
+    Update the cached profiles, the in-memory rank index and the leaderboard cache once buffered results are in
+    the database.
 
     Args:
-        player_name: A string representing the username of win player.
+        results: The "wins", "played" and "rating" added to every username by the flush.
 
     Returns:
         None
     """
-    try:
-        user_wins = users.find_one({"username": player_name})['wins']
-        users.find_one_and_update({"username": player_name}, {"$set": {'wins': user_wins + 1}})
+    # Profiles read before the flush hold the old results
+    for username in results:
+        user_cache.invalidate_profile(username)
+
+    winners = {username: int(result["wins"]) for username, result in results.items() if result["wins"]}
+    if not winners:
+        return
+
+    # One read of the new win counts, a user who won several games since the last flush moves up one win at a time
+    for user in users.find({"username": {"$in": list(winners)}}, {"_id": 0, "username": 1, "wins": 1}):
+        old_wins = user["wins"] - winners[user["username"]]
+        for wins in range(old_wins, user["wins"]):
+            _record_win(user["username"], wins)
+
+
+result_writer.on_flush = _results_written
+
+
+def _create_intern_player(player_name: str) -> None:
+    """
+    Create the user of a bot player ("random_player" or "maria") if it doesn't exist yet.
+
+    Args:
+        player_name: The username of the bot.
+
+    Returns:
+        None
+    """
+    if player_name in intern_players_created:
+        return
+
+    if users.find_one({"username": player_name}, {"_id": 1}) is None:
+        user = create_player(username=player_name,
+                             email=f"{player_name}@{player_name}.com",
+                             password=intern_players_password)
+
+        users.insert_one(user)
+        record_new_user()
+        leaderboard_cache.add_user(player_name)
+        user_cache.add_user(player_name, user["email"])
+
+    intern_players_created.add(player_name)
+
+
+def _update_player_result(player_name: str, result: str, rating: float = 0.0) -> None:
+    """
+    Add a game result to a player in the database with a single atomic update, or buffer it when write-behind is
+    enabled.
+
+    Args:
+        player_name: A string representing the username of the player.
+        result: The result of the game for this player, "win", "loss" or "tie".
+        rating: The rating points the player gains, negative if it loses points.
+
+    Returns:
+        None
+    """
+    wins = int(result == "win")
+
+    if player_name in BOT_PLAYERS:
+        _create_intern_player(player_name)
+
+    if RESULT_WRITE_BEHIND:
+        # Cached profiles, the rank index and the leaderboard cache are updated by `_results_written` after the flush
+        result_writer.add(player_name, wins=wins, played=1, rating=rating)
+        return
 
-    except (TypeError) as error:
+    user = users.find_one_and_update({"username": player_name},
+                                     build_result_update(wins=wins, played=1, rating=rating),
+                                     projection={"wins": 1},
+                                     return_document=ReturnDocument.AFTER)
 
-        if player_name in ('random_player', "maria"):
+    # Only after the write, a profile read in between would cache the old result again
+    user_cache.invalidate_profile(player_name)
 
-            user = create_player(username=player_name,
-                                email=f"{player_name}@{player_name}.com",
-                                password=intern_players_password)
+    if user is None:
+        print(f"{player_name}. Player name not found in database")
+        raise TypeError(f"Player {player_name} not found in database")
 
+    if wins:
+        _record_win(player_name, user["wins"] - 1)
+
+
+@timed("update_results")
+def _update_results(room_id: str, room_players: Dict[str, str], series: SeriesScore,
+                    forfeit: Optional[str] = None) -> None:
+    """
+    Update the wins, played games and ratings of both players of a finished series and append it to the match
+    history. This is the only database write of a series, whatever its number of rounds.
+
+    Args:
+        room_id: The room id of the game.
+        room_players: A dictionary with the usernames of "player1" and "player2".
+        series: The finished series, or the series in progress of a closed room.
+        forfeit: The seat that left the series before it was decided, the other seat wins it.
 
-            users.insert_one(user)
+    Returns:
+        None
+    """
+    winner = SEATS[1 - SEATS.index(forfeit)] if forfeit else series.winner
 
-            user_wins = users.find_one({"username": player_name})['wins']
-            users.find_one_and_update({"username": player_name}, {"$set": {'wins': user_wins + 1}})
+    # The ratings move by opposite amounts, applied as increments so that concurrent series of a player all count
+    ratings = get_ratings(room_players.values())
+    change = rating_change(ratings[room_players["player1"]], ratings[room_players["player2"]], SCORES[winner])
 
+    for seat, seat_change in (("player1", change), ("player2", -change)):
+        if winner == "TIE":
+            result = "tie"
         else:
-            print(f"{error}. Player name not found in database")
-            raise TypeError from error
+            result = "win" if seat == winner else "loss"
+
+        _update_player_result(room_players[seat], result, seat_change)
+
+    match = build_match(room_id, room_players, series, datetime.utcnow(), forfeit)
+
+    if RESULT_WRITE_BEHIND:
+        result_writer.add_match(match)
+    else:
+        matches.insert_one(match)
 
 
-def handle_player_choice(data: Dict[str, str]) -> None:
+def _save_series_in_progress(room_id: str, room_players: Dict[str, Optional[str]], series: SeriesScore,
+                             forfeit: Optional[str] = None) -> None:
     """
-    Handle a player's choice of rock, paper, or scissors, and update the game state and send results to the clients.
+    Save the rounds of a series whose room closed before it was decided. A player leaving forfeits the series to
+    the other one, so leaving can't avoid a loss. A series of an expired room is won by the seat leading it.
+
+    Args:
+        room_id: The room id of the game.
+        room_players: A dictionary with the usernames of "player1" and "player2".
+        series: The series in progress of the room, empty when its last series was decided.
+        forfeit: The seat of the player who left, None if the room expired.
+
+    Returns:
+        None
+    """
+    if not series.rounds or room_players["player2"] is None:
+        return
+
+    _update_results(room_id, room_players, series, forfeit)
+
+
+def _finish_round(room_id: str, room_players: Dict[str, str], round_choices: Dict[str, str],
+                  series: SeriesScore) -> None:
+    """
+    Send the results of a resolved round to the clients, and persist its series once it is decided.
 
     Args:
-        data: A dictionary containing information about the game state.
-              Requires the keys "player1", "player2", and "room_id" to be present.
+        room_id: The room id of the game.
+        room_players: A dictionary with the usernames of "player1" and "player2".
+        round_choices: A dictionary with the choices of "player1" and "player2".
+        series: The series of the room, including this round.
 
     Returns:
         None
+    """
+    winner = _get_winner(round_choices['player1'], round_choices['player2'])
+
+    if room_players["player2"] == "maria":
+        record_maria_round(room_players["player1"], round_choices["player1"], round_choices["player2"])
 
+    # One compact event per round: [outcome, move of player 1, move of player 2, score of player 1, score of
+    # player 2], outcome and moves as indexes in OUTCOMES and MOVES
+    socketio.emit('round', [OUTCOMES.index(winner), MOVES.index(round_choices['player1']),
+                            MOVES.index(round_choices['player2'])] + series.score, room=room_id)
+
+    spectator_feed.publish(room_id, 'result', {'result': winner, 'choices': round_choices, 'score': series.score})
+
+    if series.finished:
+        _update_results(room_id, room_players, series)
+
+        # [winner of the series, score of player 1, score of player 2], a new series starts with the next round
+        socketio.emit('series', [OUTCOMES.index(series.winner)] + series.score, room=room_id)
+        spectator_feed.publish(room_id, 'series', {'result': series.winner, 'score': series.score})
+
+    # Last, the move log must never delay or prevent the results
+    if MOVE_LOG_DIR:
+        move_log.append(room_id, room_players, round_choices, len(series.rounds))
+
+
+def _bot_move_lock(room_id: str) -> Lock:
+    """
+    Get the lock the player's and the bot's moves of a room are registered under.
     """
-    player_number = data["player_number"]
+    return bot_move_locks[hash(room_id) % len(bot_move_locks)]
 
-    room_id = data['player_room_id']
 
-    choice[player_number] = data['choice']
+def _play_bot_move(room_id: str, room_players: Dict[str, str]) -> None:
+    """
+    Register the bot's move once its thinking delay is over. Runs on the bot scheduler, never in a socket handler.
 
-    # If the other player is Maria, generate a choice for them
-    if data["player2"] in ("random_player", "maria"):
-        socketio.emit('wait', {'person_waiting': player_number}, room=room_id)
-        choice["player2"] = generate_maria_choice()
+    Args:
+        room_id: The room id of the game.
+        room_players: A dictionary with the usernames of "player1" and "player2".
 
-    # If both players have made a choice, determine the winner and update the game state
-    if choice['player1'] and choice['player2']:
+    Returns:
+        None
+    """
+    # Maria plays from her model of the player, the random player plays randomly
+    if room_players["player2"] == "maria":
+        bot_choice = generate_maria_choice(room_players["player1"])
+    else:
+        bot_choice = generate_maria_choice()
+
+    # Nothing is resolved if the player left while the bot was thinking
+    with _bot_move_lock(room_id):
+        pending_bot_moves.discard(room_id)
+        resolved = room_registry.register_choice(room_id, "player2", bot_choice)
+
+    if resolved:
+        _, round_choices, series = resolved
+        _finish_round(room_id, room_players, round_choices, series)
+
+
+@timed("handle_player_choice")
+def handle_player_choice(room_id: str, seat: str, choice: str) -> None:
+    """
+    Handle a player's choice of rock, paper, or scissors, and update the game state and send results to the clients.
 
-        winner = _get_winner(choice['player1'], choice['player2'])
+    The players come from the room registry, never from the client.
 
-        if winner != "TIE":
-            _update_winner(data[winner])
+    Args:
+        room_id: The room id of the game.
+        seat: The seat of the player, "player1" or "player2".
+        choice: The move of the player, one of MOVES.
+
+    Returns:
+        None
+
+    """
+    room_players = room_registry.get(room_id)
 
-        notify_opponent_choice(players_choices=choice, room=room_id)
+    if room_players is None or choice not in MOVES:
+        return
 
-        socketio.emit('result', {'result': winner, 'coices': choice}, room=room_id)
+    # If the other player is a bot, schedule its move instead of blocking this handler while it "thinks"
+    if room_players["player2"] in BOT_PLAYERS:
+        with _bot_move_lock(room_id):
+            resolved = room_registry.register_choice(room_id, seat, choice)
+            schedule = resolved is None and room_id not in pending_bot_moves
+            if schedule:
+                pending_bot_moves.add(room_id)
 
-        choice['player1'] = None
-        choice['player2'] = None
+        if schedule:
+            bot_scheduler.call_later(MARIA_THINKING_DELAY, _play_bot_move, room_id,
+                                     {"player1": room_players["player1"], "player2": room_players["player2"]})
+    else:
+        resolved = room_registry.register_choice(room_id, seat, choice)
+
+    # If both players have made a choice, determine the winner and update the game state
+    if resolved:
+        _, round_choices, series = resolved
+        _finish_round(room_id, room_players, round_choices, series)
 
     else:
         # If the other player hasn't made a choice yet, wait for them to do so
-        socketio.emit('wait', {'person_waiting': player_number}, room=room_id)
+        socketio.emit('wait', seat, room=room_id)
 
 
 def _get_game_message(player1, player2, session_user):
@@ -392,28 +712,100 @@ def _get_game_message(player1, player2, session_user):
         else:
             message = "Game Started! {player1} VS {player2}"
 
-    # if the user is not in the game
+    # if the user is not in the game, it can watch it
     else:
         if player2:
-            message = "Sorry, this room is full. Please try another room."
+            message = f"You are watching {player1} VS {player2}"
         else:
             message = "Please click 'Join Game' to join this room"
 
     return message
 
 
-def notify_opponent_choice(players_choices, room):
+def _requested_series_length() -> int:
     """
-    Notify the opponent of the player's choice.
+    Get the series length picked in the create game form, SERIES_BEST_OF if it is missing or not allowed.
     """
-    socketio.emit('update_opponent_choice',
-                  {'choices': players_choices},
-                  room=room)
+    best_of = request.form.get('best_of', type=int)
+    return best_of if best_of in SERIES_LENGTHS else SERIES_BEST_OF
 
 
 # ROUTES
 
 
+@app.errorhandler(PasswordPoolSaturated)
+def password_pool_saturated(error: PasswordPoolSaturated) -> Tuple[Response, int]:
+    """
+    Reject the request right away when every password worker is busy, instead of queueing it.
+
+    Returns:
+        Tuple[Response, int]: A JSON error message with a 503 status code.
+    """
+    response = jsonify({"failed": "The server is busy, please try again in a moment."})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+@app.before_request
+def start_request_timer() -> None:
+    """
+    Remember when the request started, for the request duration histogram.
+    """
+    g.request_start = perf_counter()
+
+
+@app.after_request
+def observe_request_duration(response: Response) -> Response:
+    """
+    Observe the duration of the request, labelled by route rather than path so that the label values stay bounded.
+
+    Returns:
+        Response: The response, unchanged.
+    """
+    start = g.get("request_start")
+    if start is not None:
+        http_request_seconds.observe(perf_counter() - start, request.endpoint or "unmatched", request.method,
+                                     str(response.status_code))
+    return response
+
+
+@app.route('/healthz')
+def health_check() -> Tuple[Response, int]:
+    """
+    Report whether this process can reach the database, for load balancers and container health checks.
+
+    Returns:
+        Tuple[Response, int]: The database status with a 200 status code, or a 503 status code when it is unreachable.
+    """
+    health = check_health()
+    return jsonify({"database": health}), 200 if health["ok"] else 503
+
+
+@app.route('/metrics')
+def metrics_page() -> Response:
+    """
+    Expose the metrics of this process in the Prometheus text format.
+
+    Returns:
+        Response: The metrics, as text/plain.
+    """
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/assets/<path:filename>')
+def asset_file(filename: str) -> Response:
+    """
+    Serve a fingerprinted static file, precompressed when the client accepts it and cacheable forever.
+
+    Args:
+        filename (str): The fingerprinted path of the file, as in the asset manifest.
+
+    Returns:
+        Response: The file, or a 404 status code for files outside of the manifest.
+    """
+    return asset_manifest.send(filename, request.accept_encodings)
+
+
 @app.route('/', methods=["POST", "GET"])
 def login_page() -> Union[redirect, str]:
     """
@@ -469,7 +861,8 @@ def lobby_page() -> Union[str, redirect]:
         join_room_form = JoinRoom()
         username = html.escape(session["username"])
 
-        return render_template('lobby.html', form=join_room_form, username=username)
+        return render_template('lobby.html', form=join_room_form, username=username,
+                               series_lengths=SERIES_LENGTHS, best_of=SERIES_BEST_OF)
 
     return redirect(url_for("login_page"))
 
@@ -512,6 +905,7 @@ def profile_check() -> Union[jsonify, redirect]:
 
 
 @app.route('/profile/<string:username>', methods=['GET'])
+@timed("profile_page")
 def profile_page(username: str) -> Union[str, Tuple[Response, int]]:
     """
        Get the profile page for a given user.
@@ -524,16 +918,24 @@ def profile_page(username: str) -> Union[str, Tuple[Response, int]]:
            If user is not found, return a JSON error message and 401 status code.
        """
 
-    user = users.find_one({"username": username})
+    user = user_cache.profile(username)
     if not user:
         return jsonify({"failed": "User can not be found"}), 401
 
-    user_board = list(users.find().sort("wins", -1))
-    user_rank = user_board.index(user) + 1
+    # Users with the same number of wins share the same rank
+    user_rank = get_user_rank(user["wins"])
+    user.setdefault("rating", RATING_INITIAL)
+
+    # Only one page of the match history is read
+    try:
+        user_matches, next_cursor = recent_matches(username, request.args.get('before'))
+    except ValueError:
+        return jsonify({"failed": "Invalid page"}), 400
 
     edit_username_form = EditUserForm()
     return render_template('profile.html', form=edit_username_form, user=user, username=session.get('username', ''),
-                           rank=user_rank)
+                           rank=user_rank, matches=[describe_match(match, username) for match in user_matches],
+                           next_cursor=next_cursor)
 
 
 @app.route('/edit-username/<string:username>', methods=['POST'])
@@ -560,9 +962,22 @@ def edit_username(username: str) -> Union[Tuple[jsonify, int], redirect]:
         flash("Invalid username")
         return redirect(f'/profile/{session.get("username")}')
 
-    # Update the user's username in the database and in the session
-    users.update_one({"username": username}, {"$set": {'username': new_username}})
+    # Update the user's username in the database and in the session, the unique index rejects a name taken meanwhile
+    try:
+        users.update_one({"username": username}, {"$set": {'username': new_username}})
+    except DuplicateKeyError:
+        flash("Invalid username")
+        return redirect(f'/profile/{session.get("username")}')
+
     session["username"] = new_username
+    user_cache.rename(username, new_username)
+    leaderboard_cache.rename(username, new_username)
+
+    # The account is already renamed, a failure here only leaves the old name in part of the match history
+    try:
+        rename_player(username, new_username)
+    except PyMongoError as error:
+        print(f"{error}. Could not rename {username} to {new_username} in the match history")
 
     # Redirect to the new user profile page
     return redirect(f'/profile/{new_username}')
@@ -571,14 +986,88 @@ def edit_username(username: str) -> Union[Tuple[jsonify, int], redirect]:
 @app.route('/leaderboard/')
 def leaderboard_page():
     """
-    Render the leaderboard page with user statistics sorted by wins in descending order.
+    Render one page of the leaderboard with user statistics sorted by wins, or by rating with `?order=rating`, in
+    descending order.
 
     Returns:
         str: A HTML page with the leaderboard table and title.
     """
-    user_board = users.find({}).sort("wins", -1)
+    page = max(request.args.get('page', 1, type=int), 1)
+    order = "rating" if request.args.get('order') == "rating" else "wins"
+
+    if order == "rating":
+        user_board = get_rating_page(page, LEADERBOARD_PAGE_SIZE)
+    else:
+        user_board = get_leaderboard_page(page)
+
+    return render_template('leaderboard.html', boards=user_board, title="Leaderboard", page=page, order=order,
+                           has_next=len(user_board) == LEADERBOARD_PAGE_SIZE)
+
+
+@app.route('/leaderboard/stats')
+def leaderboard_stats() -> jsonify:
+    """
+    Get the hit and miss counters of the leaderboard cache.
+
+    Returns:
+        flask.jsonify: The leaderboard cache counters.
+    """
+    return jsonify(leaderboard_cache.stats())
+
+
+@app.route('/users/cache/stats')
+def user_cache_stats() -> jsonify:
+    """
+    Get the hit and miss counters of the username, email and profile cache.
+
+    Returns:
+        flask.jsonify: The cache counters.
+    """
+    return jsonify(user_cache.stats())
+
+
+@app.route('/rooms/stats')
+def rooms_stats() -> jsonify:
+    """
+    Get the number of live rooms and the room allocation and eviction counters.
+
+    Returns:
+        flask.jsonify: The room counters.
+    """
+    return jsonify(room_manager.stats())
+
+
+@app.route('/matchmaking/stats')
+def matchmaking_stats() -> jsonify:
+    """
+    Get the matchmaking queue depth, counters and wait time histogram.
+
+    Returns:
+        flask.jsonify: The matchmaking counters.
+    """
+    return jsonify(matchmaking_queue.stats())
 
-    return render_template('leaderboard.html', boards=user_board, title="Leaderboard")
+
+@app.route('/spectators/stats')
+def spectators_stats() -> jsonify:
+    """
+    Get the spectator counters and the most watched rooms.
+
+    Returns:
+        flask.jsonify: The spectator counters.
+    """
+    return jsonify(dict(spectator_feed.stats(), most_watched=spectator_feed.most_watched()))
+
+
+@app.route('/moves/stats')
+def move_log_stats() -> jsonify:
+    """
+    Get the rounds and segments written to the move log by this server process.
+
+    Returns:
+        flask.jsonify: The move log counters.
+    """
+    return jsonify(move_log.stats())
 
 
 @app.route('/create-game/', methods=['POST', 'GET'])
@@ -592,11 +1081,9 @@ def create_game_page() -> Union[str, redirect]:
     Returns:
         Union[str, redirect]: The rendered game page with the room id, or a redirect to the lobby page.
     """
-    player_room_id = _generate_room_code(4)
+    player_room_id = room_manager.open_room(session.get('username', ''), None, _requested_series_length())
     session['player_room_id'] = player_room_id
 
-    players[player_room_id] = {"player1": session.get('username', ''), "player2": None}
-
     return redirect(url_for('enter_game_page', room=player_room_id))
 
 
@@ -611,11 +1098,9 @@ def create_random_game_page() -> Union[str, redirect]:
     Returns:
         Union[str, redirect]: The rendered game page with the room id, or a redirect to the lobby page.
     """
-    player_room_id = _generate_room_code(4)
+    player_room_id = room_manager.open_room(session.get('username', ''), "random_player", _requested_series_length())
     session['player_room_id'] = player_room_id
 
-    players[player_room_id] = {"player1": session.get('username', ''), "player2": "random_player"}
-
     return redirect(url_for('enter_game_page', room=player_room_id))
 
 
@@ -630,11 +1115,9 @@ def create_maria_game_page() -> Union[str, redirect]:
     Returns:
         Union[str, redirect]: The rendered game page with the room id, or a redirect to the lobby page.
     """
-    player_room_id = _generate_room_code(4)
+    player_room_id = room_manager.open_room(session.get('username', ''), "maria", _requested_series_length())
     session['player_room_id'] = player_room_id
 
-    players[player_room_id] = {"player1": session.get('username', ''), "player2": "maria"}
-
     return redirect(url_for('enter_game_page', room=player_room_id))
 
 
@@ -651,13 +1134,17 @@ def join_game_page() -> Union[str, redirect]:
     """
     player_room_id = request.form.get('player_room_id')
 
-    if player_room_id in players:
+    if player_room_id in room_registry:
 
-        if players[player_room_id]["player2"] is None:
+        if room_registry.join(player_room_id, session.get('username', '')):
 
-            players[player_room_id]["player2"] = session.get('username', '')
             session['player_room_id'] = player_room_id
 
+            # Only the clients of this room hear about the new player, and only the seat that changed
+            joined = {'player_room_id': player_room_id, 'seat': 'player2', 'player': session.get('username', '')}
+            socketio.emit('player_joined', joined, room=player_room_id)
+            spectator_feed.publish(player_room_id, 'player_joined', joined)
+
             return redirect(url_for('enter_game_page', room=player_room_id))
 
         flash("Sorry, this room is full. Please try another room.")
@@ -667,6 +1154,30 @@ def join_game_page() -> Union[str, redirect]:
     return redirect(url_for('lobby_page'))
 
 
+@app.route('/matched-game/', methods=['GET'])
+def enter_matched_game_page() -> redirect:
+    """
+    Enter a room the matchmaking queue seated the user in.
+
+    Args:
+        room (str): The room id of the game.
+
+    Returns:
+        redirect: A redirect to the game page, or to the lobby page if the user has no seat in the room.
+    """
+    player_room_id = request.args.get('room')
+    room_players = room_registry.get(player_room_id)
+    session_user = session.get('username', '')
+
+    if room_players is None or session_user not in (room_players["player1"], room_players["player2"]):
+        flash("Sorry, this room does not exist. Please try another room.")
+        return redirect(url_for('lobby_page'))
+
+    session['player_room_id'] = player_room_id
+
+    return redirect(url_for('enter_game_page', room=player_room_id))
+
+
 @app.route('/game', methods=['POST', 'GET'])
 def enter_game_page() -> Union[str, redirect]:
     """
@@ -680,13 +1191,13 @@ def enter_game_page() -> Union[str, redirect]:
     """
     player_room_id = request.args.get('room')
 
-    if player_room_id in players:
+    room_players = room_registry.get(player_room_id)
 
-        socketio.emit('alert', {'message': f'{players}'})
+    if room_players is not None:
 
         session_user = session.get('username', '')
-        player1 = players[player_room_id]["player1"]
-        player2 = players[player_room_id]["player2"]
+        player1 = room_players["player1"]
+        player2 = room_players["player2"]
 
         message = _get_game_message(player1, player2, session_user)
 
@@ -695,9 +1206,10 @@ def enter_game_page() -> Union[str, redirect]:
                                player1=player1,
                                player2=player2,
                                username=session_user,
-                               game_room_id=player_room_id)
-    
-    socketio.emit('alert', {'message': 'Sorry, this room does not exist. Please try another room.'})
+                               game_room_id=player_room_id,
+                               spectator=session_user not in (player1, player2))
+
+    flash("Sorry, this room does not exist. Please try another room.")
 
     return redirect(url_for("lobby_page"))
 
@@ -706,30 +1218,168 @@ def enter_game_page() -> Union[str, redirect]:
 
 
 @socketio.on('start_game')
+@socket_event('start_game')
 def start_game() -> None:
     """
-    Emit a "load_event" event to the client.
+    Join the room of the session, send its players to the requesting client and start the game once both seats
+    are taken.
 
     Returns:
         None
     """
     player_room_id = session.get('player_room_id', '')
 
-    if player_room_id in players:
-        player1 = players[player_room_id]["player1"]
-        player2 = players[player_room_id]["player2"]
+    room_players = room_registry.get(player_room_id)
+
+    if room_players is not None:
+        player1 = room_players["player1"]
+        player2 = room_players["player2"]
         join_room(player_room_id)
+        room_manager.touch(player_room_id)
 
+        # Moves of this socket are played in the seat of the session user
+        username = session.get('username')
+        if username == player1:
+            seat_index.sit(request.sid, player_room_id, "player1")
+        elif username == player2:
+            seat_index.sit(request.sid, player_room_id, "player2")
+
+        # The other clients of the room already know its players
         socketio.emit("send_info_player_event", {"player_room_id": player_room_id,
                                                  "player1": player1,
                                                  "player2": player2},
-                      room=player_room_id)
+                      to=request.sid)
 
         if player1 and player2:
             socketio.emit('show_game_event', {}, room=player_room_id)
+            spectator_feed.publish(player_room_id, 'show_game', {'player1': player1, 'player2': player2})
+
+
+@socketio.on('enter_matchmaking')
+@socket_event('enter_matchmaking')
+def enter_matchmaking() -> None:
+    """
+    Queue the session user for a random human opponent, or pair it right away with a waiting one.
+
+    Returns:
+        None
+    """
+    username = session.get('username')
+    if not username:
+        return
+
+    # Opponents are picked by rating
+    rating = get_ratings([username])[username]
+    match = matchmaking_queue.enqueue(request.sid, username, rating)
+
+    if match is None:
+        socketio.emit('matchmaking_waiting', {'depth': matchmaking_queue.depth}, to=request.sid)
+        return
+
+    waiting, arriving = match
+    player_room_id = room_manager.open_room(waiting.username, arriving.username)
+
+    _notify_match(waiting.sid, player_room_id)
+    _notify_match(arriving.sid, player_room_id)
+
+
+@socketio.on('leave_matchmaking')
+@socket_event('leave_matchmaking')
+def leave_matchmaking() -> None:
+    """
+    Remove the requesting socket from the matchmaking queue.
+
+    Returns:
+        None
+    """
+    matchmaking_queue.cancel(request.sid)
+
+
+@socketio.on('connect')
+@socket_event('connect')
+def connect(auth: Optional[Dict] = None) -> None:
+    """
+    Count the connected socket.
+
+    Args:
+        auth: The authentication payload of the client, unused.
+
+    Returns:
+        None
+    """
+    connected_sockets.inc()
+
+
+@socketio.on('disconnect')
+@socket_event('disconnect')
+def disconnect() -> None:
+    """
+    Remove a disconnected socket from the matchmaking queue, its seat and the spectators.
+
+    Returns:
+        None
+    """
+    connected_sockets.dec()
+    matchmaking_queue.cancel(request.sid)
+    seat_index.leave(request.sid)
+    spectator_feed.unwatch(request.sid)
+
+
+@socketio.on('watch_game')
+@socket_event('watch_game')
+def watch_game(data: Dict[str, str]) -> None:
+    """
+    Join the spectator channel of a room and send its players and spectator count to the requesting client.
+
+    Args:
+        data: A dictionary with the "player_room_id" to watch.
+
+    Returns:
+        None
+    """
+    player_room_id = data.get('player_room_id', '')
+    if room_registry.get(player_room_id) is None:
+        return
+
+    previous_room_id = spectator_feed.unwatch(request.sid)
+    if previous_room_id is not None:
+        leave_room(spectator_channel(previous_room_id))
+
+    # The channel is joined first so that no later event is missed, and the players are read after watching so
+    # that the snapshot includes every event up to `seq`, which the client drops
+    join_room(spectator_channel(player_room_id))
+    viewers, seq = spectator_feed.watch(request.sid, player_room_id)
+    room_players = room_registry.get(player_room_id)
+    if room_players is None:
+        spectator_feed.unwatch(request.sid)
+        leave_room(spectator_channel(player_room_id))
+        return
+
+    socketio.emit('spectator_events', {'player_room_id': player_room_id,
+                                       'events': [{'event': 'watching', 'seq': seq,
+                                                   'data': {'player1': room_players['player1'],
+                                                            'player2': room_players['player2'],
+                                                            'spectators': viewers}}]},
+                  to=request.sid)
+
+
+@socketio.on('stop_watching')
+@socket_event('stop_watching')
+def stop_watching() -> None:
+    """
+    Leave the spectator channel the requesting client is watching.
+
+    Returns:
+        None
+    """
+    player_room_id = spectator_feed.unwatch(request.sid)
+
+    if player_room_id is not None:
+        leave_room(spectator_channel(player_room_id))
 
 
 @socketio.on('leave_game_page')
+@socket_event('leave_game_page')
 def leave_game_page(data: Dict[str, str]) -> None:
     """
     Remove the player from the room and emit a "player_left" event to the other player(s).
@@ -745,26 +1395,84 @@ def leave_game_page(data: Dict[str, str]) -> None:
         session['player_room_id'] = None
 
         socketio.emit('clear_game_event', {'player': player, 'player_room_id': player_room_id}, room=player_room_id)
+        spectator_feed.publish(player_room_id, 'clear_game', {'player': player})
 
         leave_room(player_room_id)
+        seat_index.leave(request.sid)
 
-        players.pop(player_room_id)
+        closed_room = room_registry.remove(player_room_id)
+
+        if closed_room is not None:
+            room_players, series = closed_room
+            # The seat comes from the session, not from the client
+            username = session.get('username')
+            leaving_seat = next((seat for seat in SEATS if room_players[seat] == username), None)
+            _save_series_in_progress(player_room_id, room_players, series, leaving_seat)
+
+
+def _play_seated_move(choice: str) -> None:
+    """
+    Play a move in the room and seat of the requesting socket, if it took one.
+    """
+    seated = seat_index.get(request.sid)
+
+    if seated is not None:
+        room_id, seat = seated
+        handle_player_choice(room_id, seat, choice)
+
+
+@socketio.on('move')
+@socket_event('move')
+def move(code: int) -> None:
+    """
+    Play a move in the room and seat the requesting socket took when the game started.
+
+    Args:
+        code: The index of the move in MOVES: 0 for rock, 1 for paper and 2 for scissor.
+
+    Returns:
+        None
+    """
+    if isinstance(code, int) and 0 <= code < len(MOVES):
+        _play_seated_move(MOVES[code])
 
 
 @socketio.on('register_player_choice')
+@socket_event('register_player_choice')
 def register_player_choice(data: Dict[str, str]) -> None:
     """
-    Handle player choice of rock, paper, or scissors.
+    Handle player choice of rock, paper, or scissors. Kept for older clients, the 'move' event replaces it.
+
+    Only the "choice" of the data is used, the room and seat are those the socket took when the game started.
 
     Args:
-        data: A dictionary containing information about the game state.
-              Requires the keys "player1", "player2", "choice", and "room_id" to be present.
+        data: A dictionary with the "choice" of the player.
 
     Returns:
         None
     """
-    handle_player_choice(data)
+    choice = data.get('choice') if isinstance(data, dict) else None
+
+    if choice in MOVES:
+        _play_seated_move(choice)
 
 
 if __name__ == "__main__":
-    socketio.run(app, host="0.0.0.0", port=8080, debug=True, allow_unsafe_werkzeug=True)
+    create_indexes()
+    backfill_ratings()
+    user_cache.load()
+
+    socketio.start_background_task(room_manager.run, socketio.sleep, _close_expired_room)
+    socketio.start_background_task(_run_matchmaking_timeouts)
+    socketio.start_background_task(spectator_feed.run, socketio.sleep)
+
+    if RESULT_WRITE_BEHIND:
+        socketio.start_background_task(result_writer.run, socketio.sleep)
+        atexit.register(result_writer.flush)
+
+    if MOVE_LOG_DIR:
+        socketio.start_background_task(move_log.run, socketio.sleep)
+        atexit.register(move_log.close)
+
+    socketio.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8080)),
+                 debug=os.environ.get("DEBUG", "1") == "1", allow_unsafe_werkzeug=True)
@@ -0,0 +1,142 @@
+from hashlib import sha256
+from typing import Dict, List, Optional, Tuple
+import json
+import mimetypes
+import os
+
+from flask import Response, abort, send_file, url_for
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+# Output of `python -m scripts.build_assets`, served under /assets/
+ASSETS_DIR = os.environ.get("ASSETS_DIR", os.path.join(STATIC_DIR, "dist"))
+ASSETS_MANIFEST = "manifest.json"
+# Fingerprinted files never change, browsers may keep them for a year without asking again
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+# Client libraries self-hosted by the build, with the CDN they are loaded from until then. The integrity hashes
+# check both the download of the build and the file the browser gets.
+VENDOR_ASSETS: Dict[str, Tuple[str, str]] = {
+    "vendor/bootstrap.min.css": (
+        "https://maxcdn.bootstrapcdn.com/bootstrap/4.0.0/css/bootstrap.min.css",
+        "sha384-Gn5384xqQ1aoWXA+058RXPxPg6fy4IWvTNh0E263XmFcJlSAwiGgFAW/dAiS6JXm"),
+    "vendor/socket.io.js": (
+        "https://cdnjs.cloudflare.com/ajax/libs/socket.io/4.0.1/socket.io.js",
+        "sha512-q/dWJ3kcmjBLU4Qc47E4A9kTB4m3wuTY7vkFJDTZKjTs8jhyGQnaUrxa0Ytd0ssMZhbNua9hE+E7Qv1j+DyZwA=="),
+    "vendor/jquery.slim.min.js": (
+        "https://code.jquery.com/jquery-3.2.1.slim.min.js",
+        "sha384-KJ3o2DKtIkvYIK3UENzmM7KCkRr/rE9/Qpg6aAZGJwFDMVNA/GpGFF93hXpG5KkN"),
+    "vendor/popper.min.js": (
+        "https://cdnjs.cloudflare.com/ajax/libs/popper.js/1.12.9/umd/popper.min.js",
+        "sha384-ApNbgh9B+Y1QKtv3Rn7W3mgPxhU9K/ScQsAP7hUibX39j7fakFPskvXusvfa0b4Q"),
+    "vendor/bootstrap.min.js": (
+        "https://maxcdn.bootstrapcdn.com/bootstrap/4.0.0/js/bootstrap.min.js",
+        "sha384-JZR6Spejh4U02d8jOt6vLEHfe/JQGiRRSQQxSfFWpi1MquVdAyjUar5+76PVCmYl"),
+}
+
+# Content-Encoding of every precompressed variant, preferred first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def fingerprint(path: str, content: bytes) -> str:
+    """
+    Get the content-hashed name of an asset, e.g. "css/style.3f2a9c1b04d2.css" for "css/style.css".
+
+    Args:
+        path (str): The path of the asset, relative to the static folder.
+        content (bytes): The content of the asset.
+
+    Returns:
+        str: The path with a hash of the content before its extension.
+    """
+    root, extension = os.path.splitext(path)
+    return f"{root}.{sha256(content).hexdigest()[:12]}{extension}"
+
+
+class AssetManifest:
+    """
+    Fingerprinted assets written by the build, and where templates find them.
+
+    The manifest maps every asset of the static folder to its fingerprinted file, and lists the precompressed
+    variants of every file. An asset the build didn't produce is served from the static folder, and a client
+    library from its CDN, so the app also runs without a build.
+    """
+
+    def __init__(self, directory: str = ASSETS_DIR, assets: Optional[Dict[str, str]] = None,
+                 encodings: Optional[Dict[str, List[str]]] = None) -> None:
+        self.directory = directory
+        self.assets = assets or {}
+        self.encodings = encodings or {}
+        self._files = set(self.assets.values())
+
+    @classmethod
+    def load(cls, directory: str = ASSETS_DIR) -> "AssetManifest":
+        """
+        Load the manifest of a build, an empty manifest if there was no build.
+        """
+        try:
+            with open(os.path.join(directory, ASSETS_MANIFEST)) as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return cls(directory)
+
+        return cls(directory, manifest["assets"], manifest["encodings"])
+
+    def url(self, path: str) -> str:
+        """
+        Get the URL of an asset, e.g. `asset_url('css/style.css')` in a template.
+
+        Args:
+            path (str): The path of the asset, relative to the static folder.
+
+        Returns:
+            str: The URL of its fingerprinted file, or else of the CDN or static file.
+        """
+        if path in self.assets:
+            return url_for("asset_file", filename=self.assets[path])
+
+        if path in VENDOR_ASSETS:
+            return VENDOR_ASSETS[path][0]
+
+        return url_for("static", filename=path)
+
+    def send(self, filename: str, accepted_encodings) -> Response:
+        """
+        Send a fingerprinted file, precompressed with the best encoding the client accepts, cacheable forever.
+
+        Args:
+            filename (str): The fingerprinted path of the file.
+            accepted_encodings: The encodings of the request's Accept-Encoding header.
+
+        Returns:
+            Response: The file, 304 if the client has it already.
+        """
+        if filename not in self._files:
+            abort(404)
+
+        path = os.path.join(self.directory, filename)
+        content_encoding = None
+        for encoding, extension in ENCODINGS:
+            if encoding in self.encodings.get(filename, ()) and encoding in accepted_encodings:
+                path, content_encoding = path + extension, encoding
+                break
+
+        # The hash of the name identifies the content, and every encoding of it gets its own ETag
+        etag = filename.rsplit(".", 2)[-2] + (f"-{content_encoding}" if content_encoding else "")
+        response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], etag=etag, max_age=ASSETS_MAX_AGE)
+
+        # send_file names the variant, e.g. style.<hash>.css.gz, which is no business of the browser
+        response.headers.pop("Content-Disposition", None)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        response.vary.add("Accept-Encoding")
+        if content_encoding:
+            response.headers["Content-Encoding"] = content_encoding
+
+        return response
+
+
+def asset_integrity(path: str) -> str:
+    """
+    Get the Subresource Integrity hash of a client library, for the `integrity` attribute of its tag.
+    """
+    return VENDOR_ASSETS[path][1]
@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+import os
+
+# "threading" serves every connection from an OS thread, "eventlet" and "gevent" from green threads on an event loop,
+# with the standard library patched so that pymongo sockets, locks and sleeps yield to the loop instead of blocking
+ASYNC_MODE = os.environ.get("ASYNC_MODE", "threading")
+ASYNC_MODES = ("threading", "eventlet", "gevent")
+
+if ASYNC_MODE not in ASYNC_MODES:
+    raise ValueError(f"Invalid ASYNC_MODE {ASYNC_MODE!r}, expected one of {ASYNC_MODES}")
+
+
+def monkey_patch() -> None:
+    """
+    Patch the standard library for the green thread modes. Must run before the app imports socket, ssl, threading
+    or time, which is why server.py runs it right after loading the .env file.
+
+    Returns:
+        None
+    """
+    if ASYNC_MODE == "eventlet":
+        import eventlet
+
+        eventlet.monkey_patch()
+    elif ASYNC_MODE == "gevent":
+        from gevent import monkey
+
+        monkey.patch_all()
+
+
+class _TpoolFuture:
+    def __init__(self, green_thread: Any) -> None:
+        self._green_thread = green_thread
+
+    def result(self) -> Any:
+        return self._green_thread.wait()
+
+
+class _TpoolExecutor:
+    """
+    `submit` on eventlet's pool of OS threads, sized by the EVENTLET_THREADPOOL_SIZE environment variable.
+    """
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> _TpoolFuture:
+        from eventlet import spawn, tpool
+
+        return _TpoolFuture(spawn(tpool.execute, func, *args))
+
+
+def native_executor(max_workers: int, thread_name_prefix: str = ""):
+    """
+    Create an executor running its calls on OS threads in every mode.
+
+    Once the standard library is patched, a `concurrent.futures.ThreadPoolExecutor` runs its calls on green threads
+    of the event loop, so a CPU-bound C call like bcrypt would stall every connection until it returns. The pools
+    of eventlet and gevent run them on real threads and only suspend the calling green thread.
+
+    Args:
+        max_workers (int): Number of threads, eventlet's pool is sized by EVENTLET_THREADPOOL_SIZE instead.
+        thread_name_prefix (str): Name prefix of the threads in threading mode.
+
+    Returns:
+        An executor whose `submit(func, *args)` returns a future with a blocking `result()`.
+    """
+    if ASYNC_MODE == "eventlet":
+        return _TpoolExecutor()
+
+    if ASYNC_MODE == "gevent":
+        from gevent.threadpool import ThreadPoolExecutor as GeventThreadPoolExecutor
+
+        return GeventThreadPoolExecutor(max_workers=max_workers)
+
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
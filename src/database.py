@@ -1,6 +1,167 @@
-from pymongo import MongoClient
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, Optional
+import os
 
-client = MongoClient('mongo')
-db = client["userInfo"]
-users = db["users"]
-rank = db["rank"]  # rank in {"username", rank#} format
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import PyMongoError
+
+from src.metrics import CommandMetrics
+
+# Connection settings, read once when the client is created
+MONGO_URI = os.environ.get("MONGO_URI", "mongo")
+MONGO_DATABASE = os.environ.get("MONGO_DATABASE", "userInfo")
+# Connections per server process, size it to the requests and green threads a worker serves at once
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+# 0 waits for replies without a timeout
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get("MONGO_SOCKET_TIMEOUT_MS", 0))
+# "primary", "primaryPreferred", "secondary", "secondaryPreferred" or "nearest"
+MONGO_READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+# Write concern "w": a number of nodes or "majority"
+MONGO_WRITE_CONCERN = os.environ.get("MONGO_WRITE_CONCERN", "1")
+
+_client: Optional[MongoClient] = None
+_client_pid: Optional[int] = None
+_client_lock = Lock()
+_indexes_created = False
+
+
+def _client_options() -> Dict[str, Any]:
+    write_concern = MONGO_WRITE_CONCERN
+    options = {"maxPoolSize": MONGO_MAX_POOL_SIZE,
+               "minPoolSize": MONGO_MIN_POOL_SIZE,
+               "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+               "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+               "readPreference": MONGO_READ_PREFERENCE,
+               "w": int(write_concern) if write_concern.isdigit() else write_concern,
+               # No background connection before the first operation, so the module imports without a database
+               "connect": False,
+               # Every command is counted and timed for the /metrics endpoint
+               "event_listeners": [CommandMetrics()]}
+    if MONGO_SOCKET_TIMEOUT_MS:
+        options["socketTimeoutMS"] = MONGO_SOCKET_TIMEOUT_MS
+    return options
+
+
+def get_client() -> MongoClient:
+    """
+    Get the Mongo client of this process, created on first use.
+
+    A `MongoClient` must not be shared across `fork()`: its pool and monitor threads belong to the parent. A
+    forked worker gets its own client the first time it calls this.
+
+    Returns:
+        MongoClient: The client of the current process.
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = MongoClient(MONGO_URI, **_client_options())
+                _client_pid = pid
+
+    return _client
+
+
+def get_database() -> Database:
+    """
+    Get the database of the app.
+
+    Returns:
+        Database: The MONGO_DATABASE database of the current process's client.
+    """
+    return get_client()[MONGO_DATABASE]
+
+
+class LazyCollection:
+    """
+    A collection resolved on every use through `get_database`, so modules can hold collections at import time
+    without connecting, and keep working in forked workers.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def collection(self) -> Collection:
+        return get_database()[self.name]
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self.collection(), attribute)
+
+    def __repr__(self) -> str:
+        return f"LazyCollection({self.name!r})"
+
+
+users = LazyCollection("users")
+rank = LazyCollection("rank")  # rank in {"username", rank#} format
+rooms = LazyCollection("rooms")  # shared game rooms, only used with ROOM_REGISTRY=mongo
+matches = LazyCollection("matches")  # append-only history of resolved rounds
+
+
+def create_user_indexes(collection: Collection) -> None:
+    """
+    Create the indexes of a users collection. Creating an existing index is a no-op.
+
+    Args:
+        collection (Collection): The users collection.
+
+    Returns:
+        None
+    """
+    # Login and signup look users up by email and username, which must both be unique
+    collection.create_index([("email", ASCENDING)], name="email", unique=True)
+    collection.create_index([("username", ASCENDING)], name="username", unique=True)
+
+    # Leaderboard order: most wins first, ties ordered by username
+    collection.create_index([("wins", DESCENDING), ("username", ASCENDING)], name="leaderboard")
+
+    # Rating leaderboard and rating range queries
+    collection.create_index([("rating", DESCENDING), ("username", ASCENDING)], name="rating")
+
+
+def create_indexes() -> None:
+    """
+    Create the indexes the queries of the app rely on, once per process.
+    """
+    global _indexes_created
+
+    if _indexes_created:
+        return
+
+    create_user_indexes(users)
+
+    # A player's history, newest first, and the rounds of a room in order
+    matches.create_index([("players", ASCENDING), ("played_at", DESCENDING), ("_id", DESCENDING)],
+                         name="player_history")
+    matches.create_index([("room", ASCENDING), ("played_at", ASCENDING)], name="room_history")
+
+    # Idle room eviction of the shared room registry
+    rooms.create_index([("updated_at", ASCENDING)], name="updated_at")
+
+    _indexes_created = True
+
+
+def check_health() -> Dict[str, Any]:
+    """
+    Ping the database.
+
+    Returns:
+        Dict[str, Any]: "ok", False when the database can't be reached within MONGO_SERVER_SELECTION_TIMEOUT_MS, and
+        the ping latency in milliseconds. The error is only logged, it describes the hosts of the deployment.
+    """
+    start = perf_counter()
+    try:
+        get_client().admin.command("ping")
+        ok = True
+    except PyMongoError as error:
+        print(f"{error}. Database health check failed")
+        ok = False
+
+    return {"ok": ok, "latency_ms": (perf_counter() - start) * 1e3}
@@ -0,0 +1,156 @@
+from threading import Lock
+from time import time
+from typing import Dict, List, Optional, Tuple
+import os
+
+MOVES = ("rock", "paper", "scissor")
+SEATS = ("player1", "player2")
+
+# Moves are encoded by their index in MOVES, move (m + 1) % 3 beats move m. The outcome of a round is then
+# (move1 - move2) % 3, an index in OUTCOMES, which works on single moves and on whole NumPy arrays of moves alike.
+OUTCOMES = ("TIE", "player1", "player2")
+
+# Rooms play series of at most N rounds, and the results of a series are persisted once, when it is decided
+SERIES_LENGTHS = (1, 3, 5, 7)
+SERIES_BEST_OF = int(os.environ.get("SERIES_BEST_OF", 1))
+
+if SERIES_BEST_OF not in SERIES_LENGTHS:
+    raise ValueError(f"Invalid SERIES_BEST_OF {SERIES_BEST_OF!r}, expected one of {SERIES_LENGTHS}")
+
+
+def resolve_round(move1: str, move2: str) -> str:
+    """
+    Resolve a round from both players' moves.
+
+    Args:
+        move1 (str): The move of player 1.
+        move2 (str): The move of player 2.
+
+    Returns:
+        str: "player1" or "player2" for the winning seat, "TIE" otherwise.
+    """
+    return OUTCOMES[(MOVES.index(move1) - MOVES.index(move2)) % 3]
+
+
+class SeriesScore:
+    """
+    Score of a best-of-N series of a room.
+
+    A series is decided once a seat has won a majority of the N rounds, or after N rounds, ties included, by the
+    seat with the most wins. A best-of-1 series is then a single round, ties included.
+    """
+    __slots__ = ("best_of", "score", "rounds")
+
+    def __init__(self, best_of: int = 1, score: Optional[List[int]] = None,
+                 rounds: Optional[List[List[str]]] = None) -> None:
+        if best_of not in SERIES_LENGTHS:
+            raise ValueError(f"Invalid series length {best_of!r}, expected one of {SERIES_LENGTHS}")
+
+        self.best_of = best_of
+        self.score: List[int] = list(score) if score is not None else [0, 0]
+        self.rounds: List[List[str]] = [list(moves) for moves in rounds] if rounds is not None else []
+
+    def record(self, choices: Dict[str, str]) -> str:
+        """
+        Add a resolved round to the series.
+
+        Args:
+            choices (Dict[str, str]): The choices of "player1" and "player2".
+
+        Returns:
+            str: The outcome of the round, "player1", "player2" or "TIE".
+        """
+        outcome = resolve_round(choices["player1"], choices["player2"])
+        if outcome != "TIE":
+            self.score[SEATS.index(outcome)] += 1
+        self.rounds.append([choices["player1"], choices["player2"]])
+        return outcome
+
+    @property
+    def finished(self) -> bool:
+        return max(self.score) > self.best_of // 2 or len(self.rounds) >= self.best_of
+
+    @property
+    def winner(self) -> str:
+        """
+        The seat with the most won rounds, "TIE" if both won as many.
+        """
+        if self.score[0] == self.score[1]:
+            return "TIE"
+        return "player1" if self.score[0] > self.score[1] else "player2"
+
+    def copy(self) -> "SeriesScore":
+        return SeriesScore(self.best_of, self.score, self.rounds)
+
+
+class RoomState:
+    """
+    Round state of a single game room.
+
+    Holds both players' pending choices, the current round number, the score of the current series and the room
+    timestamps. A choice is registered with `register_choice`, which resolves and resets the round atomically
+    once both seats have played, so every move costs O(1) regardless of how many rooms are live.
+    """
+    __slots__ = ("player1", "player2", "round", "series", "created_at", "updated_at", "_lock")
+
+    def __init__(self, best_of: int = 1) -> None:
+        now = time()
+        self.player1: Optional[str] = None
+        self.player2: Optional[str] = None
+        self.round: int = 1
+        self.series = SeriesScore(best_of)
+        self.created_at: float = now
+        self.updated_at: float = now
+        self._lock = Lock()
+
+    def register_choice(self, seat: str, move: str) -> Optional[Tuple[int, Dict[str, str], SeriesScore]]:
+        """
+        Register a player's move and resolve the round if both seats have played.
+
+        Args:
+            seat (str): Either "player1" or "player2".
+            move (str): One of "rock", "paper" or "scissor".
+
+        Returns:
+            Optional[Tuple[int, Dict[str, str], SeriesScore]]: The resolved round number, both choices and the
+            series including this round if this move completed the round, None if the other seat still has to
+            play. A new series starts after a finished one.
+        """
+        if seat not in SEATS:
+            raise ValueError(f"Invalid seat {seat!r}")
+        if move not in MOVES:
+            raise ValueError(f"Invalid move {move!r}")
+
+        with self._lock:
+            setattr(self, seat, move)
+            self.updated_at = time()
+
+            if self.player1 is None or self.player2 is None:
+                return None
+
+            choices = {"player1": self.player1, "player2": self.player2}
+            self.series.record(choices)
+            resolved = (self.round, choices, self.series.copy())
+
+            if self.series.finished:
+                self.series = SeriesScore(self.series.best_of)
+            self.player1 = None
+            self.player2 = None
+            self.round += 1
+
+            return resolved
+
+    def touch(self) -> None:
+        """
+        Mark the room as active now.
+        """
+        self.updated_at = time()
+
+    def choices(self) -> Dict[str, Optional[str]]:
+        """
+        Get a snapshot of the pending choices of the current round.
+
+        Returns:
+            Dict[str, Optional[str]]: The pending choice of each seat, None for seats that have not played.
+        """
+        return {"player1": self.player1, "player2": self.player2}
@@ -0,0 +1,215 @@
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+import os
+
+from src.database import users
+from src.ranking import get_user_rank
+
+LEADERBOARD_PAGE_SIZE = int(os.environ.get("LEADERBOARD_PAGE_SIZE", 25))
+LEADERBOARD_CACHE_SIZE = int(os.environ.get("LEADERBOARD_CACHE_SIZE", 100))
+LEADERBOARD_CACHE_TTL = float(os.environ.get("LEADERBOARD_CACHE_TTL", 60))
+
+# Only the public fields leave the database, in the order of the (wins, username) index
+LEADERBOARD_PROJECTION = {"_id": 0, "username": 1, "wins": 1}
+LEADERBOARD_SORT = [("wins", -1), ("username", 1)]
+
+
+def _sort_key(entry: Dict) -> Tuple[int, str]:
+    """
+    Leaderboard order: most wins first, ties ordered by username.
+    """
+    return -entry["wins"], entry["username"]
+
+
+def query_leaderboard(offset: int, limit: int) -> List[Dict]:
+    """
+    Read one slice of the leaderboard from the database.
+
+    Args:
+        offset (int): Number of entries to skip.
+        limit (int): Maximum number of entries to return.
+
+    Returns:
+        List[Dict]: The entries with their "username" and "wins".
+    """
+    return list(users.find({}, LEADERBOARD_PROJECTION).sort(LEADERBOARD_SORT).skip(offset).limit(limit))
+
+
+class LeaderboardCache:
+    """
+    In-process cache of the top `size` leaderboard entries.
+
+    Pages inside the cached range are served from memory. Wins, new users and renames update the cached entries
+    in place, and the whole range is only reloaded once it is older than `ttl` seconds, which also picks up writes
+    made by other workers.
+    """
+
+    def __init__(self, size: int = LEADERBOARD_CACHE_SIZE, ttl: float = LEADERBOARD_CACHE_TTL) -> None:
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._entries: Optional[List[Dict]] = None
+        self._keys: List[Tuple[int, str]] = []
+        self._loaded_at = 0.0
+
+    def _load(self) -> None:
+        """
+        Reload the cached range from the database.
+        """
+        # A zero limit means no limit to the database
+        self._entries = query_leaderboard(0, self.size) if self.size else []
+        self._keys = [_sort_key(entry) for entry in self._entries]
+        self._loaded_at = monotonic()
+
+    def _is_fresh(self) -> bool:
+        return self._entries is not None and monotonic() - self._loaded_at <= self.ttl
+
+    def _is_complete(self) -> bool:
+        """
+        True when every user fits in the cache, so users outside of it may be added.
+        """
+        return self._entries is not None and len(self._entries) < self.size
+
+    def _remove(self, username: str) -> Optional[Dict]:
+        for position, entry in enumerate(self._entries):
+            if entry["username"] == username:
+                del self._keys[position]
+                return self._entries.pop(position)
+        return None
+
+    def _insert(self, entry: Dict) -> None:
+        key = _sort_key(entry)
+        position = bisect_left(self._keys, key)
+        self._keys.insert(position, key)
+        self._entries.insert(position, entry)
+
+        if len(self._entries) > self.size:
+            self._keys.pop()
+            self._entries.pop()
+
+    def get_page(self, page: int, page_size: int = LEADERBOARD_PAGE_SIZE) -> List[Dict]:
+        """
+        Get one page of the leaderboard.
+
+        Args:
+            page (int): The page number, starting at 1.
+            page_size (int): Number of entries per page.
+
+        Returns:
+            List[Dict]: The entries of the page with their "username" and "wins".
+        """
+        offset = (max(page, 1) - 1) * page_size
+
+        with self._lock:
+            if offset + page_size <= self.size:
+                if self._is_fresh():
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    self._load()
+
+                return [dict(entry) for entry in self._entries[offset:offset + page_size]]
+
+            self.misses += 1
+
+        return query_leaderboard(offset, page_size)
+
+    def record_win(self, username: str, wins: Optional[int] = None) -> None:
+        """
+        Move a user to its new position after a win.
+
+        Args:
+            username (str): The username of the winner.
+            wins (Optional[int]): The number of wins of the user after the win. When unknown, e.g. because the
+                result is still buffered, a cached user is moved up by one win and other users are left alone.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._entries is None:
+                return
+
+            entry = self._remove(username)
+
+            if wins is None:
+                if entry is None:
+                    return
+                wins = entry["wins"] + 1
+
+            # A user outside of a full cache only enters it when it overtakes the last cached entry
+            if entry is not None or self._is_complete() or (self._keys and (-wins, username) < self._keys[-1]):
+                self._insert({"username": username, "wins": wins})
+
+    def add_user(self, username: str) -> None:
+        """
+        Add a newly created user, with no wins yet, when the whole leaderboard fits in the cache.
+
+        Args:
+            username (str): The username of the new user.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._is_complete():
+                self._insert({"username": username, "wins": 0})
+
+    def rename(self, username: str, new_username: str) -> None:
+        """
+        Rename a cached user.
+
+        Args:
+            username (str): The current username.
+            new_username (str): The new username.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._entries is None:
+                return
+
+            entry = self._remove(username)
+            if entry is not None:
+                self._insert({"username": new_username, "wins": entry["wins"]})
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the cache counters.
+
+        Returns:
+            Dict[str, float]: Hits, misses, hit ratio and the number of cached entries.
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "hit_ratio": self.hits / requests if requests else 0.0,
+                    "cached_entries": len(self._entries or [])}
+
+
+leaderboard_cache = LeaderboardCache()
+
+
+def get_leaderboard_page(page: int, page_size: int = LEADERBOARD_PAGE_SIZE) -> List[Dict]:
+    """
+    Get one page of the leaderboard with the rank of every entry. Users with the same number of wins share a rank.
+
+    Args:
+        page (int): The page number, starting at 1.
+        page_size (int): Number of entries per page.
+
+    Returns:
+        List[Dict]: The entries of the page with their "rank", "username" and "wins".
+    """
+    entries = leaderboard_cache.get_page(page, page_size)
+
+    for entry in entries:
+        entry["rank"] = get_user_rank(entry["wins"])
+
+    return entries
@@ -1,11 +1,252 @@
+from collections import OrderedDict
 from random import choice
-from time import sleep
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, Optional
+import os
 
+import numpy as np
 
-def generate_maria_choice():
+from src.game_state import MOVES
+
+# Seconds Maria "thinks" before her move is revealed. Callers schedule the delay, generating a choice never blocks.
+MARIA_THINKING_DELAY = float(os.environ.get("MARIA_THINKING_DELAY", 3))
+
+# Number of opponents Maria keeps a model of, the least recently seen ones are forgotten first
+MARIA_MAX_MODELS = int(os.environ.get("MARIA_MAX_MODELS", 10000))
+
+# Weight kept by the move counts and the predictor scores at every round, so Maria adapts when opponents change
+COUNT_DECAY = 0.95
+SCORE_DECAY = 0.9
+
+# Base predictors of the opponent's next move: overall frequency, after its last move, after its last two moves and
+# after the last pair of moves. Every prediction is played three ways: beating it, and beating what beats it twice,
+# in case the opponent is second-guessing Maria.
+N_PREDICTORS = 4
+N_ROTATIONS = 3
+N_STRATEGIES = N_PREDICTORS * N_ROTATIONS
+
+# Moves are encoded as 0 (rock), 1 (paper) and 2 (scissor): move (m + 1) % 3 beats move m
+SCORE_BY_OUTCOME = np.array([0.0, 1.0, -1.0])
+
+
+class OpponentModels:
+    """
+    Move statistics and predictor scores of a batch of opponents, stored as NumPy arrays with one row per opponent.
+
+    A single opponent is a batch of one, and the batch evaluation plays many games at once with the same code, so
+    every update is a fixed number of array operations whatever the history length.
+    """
+    __slots__ = ("frequency", "after_last", "after_two", "after_pair", "last", "previous", "last_maria", "scores",
+                 "suggestions")
+
+    def __init__(self, size: int) -> None:
+        self.frequency = np.zeros((size, 3))
+        self.after_last = np.zeros((size, 3, 3))
+        self.after_two = np.zeros((size, 3, 3, 3))
+        self.after_pair = np.zeros((size, 3, 3, 3))
+        # -1 until the opponent played that many rounds
+        self.last = np.full(size, -1)
+        self.previous = np.full(size, -1)
+        self.last_maria = np.full(size, -1)
+        self.scores = np.zeros((size, N_STRATEGIES))
+        self.suggestions = np.zeros((size, N_STRATEGIES), dtype=np.int64)
+
+    def choose(self, rng: np.random.Generator) -> np.ndarray:
+        """
+        Choose Maria's next move against every opponent of the batch.
+
+        Args:
+            rng (np.random.Generator): Source of the tie-breaking noise and of the random fallback moves.
+
+        Returns:
+            np.ndarray: One move per opponent.
+        """
+        size = len(self.last)
+        rows = np.arange(size)
+        last = np.maximum(self.last, 0)
+        previous = np.maximum(self.previous, 0)
+        last_maria = np.maximum(self.last_maria, 0)
+
+        counts = np.stack([self.frequency,
+                           self.after_last[rows, last],
+                           self.after_two[rows, previous, last],
+                           self.after_pair[rows, last, last_maria]], axis=1)
+        predictions = np.argmax(counts + rng.random(counts.shape) * 1e-6, axis=2)
+
+        # Strategy k * N_ROTATIONS + r plays the move beating prediction k, rotated r more times
+        self.suggestions = ((predictions[:, :, None] + 1 + np.arange(N_ROTATIONS)) % 3).reshape(size, N_STRATEGIES)
+
+        best = np.argmax(self.scores + rng.random(self.scores.shape) * 1e-6, axis=1)
+        moves = self.suggestions[rows, best]
+
+        # Without any strategy ahead, a random move can't be exploited
+        no_edge = self.scores[rows, best] <= 0
+        moves[no_edge] = rng.integers(0, 3, size=int(no_edge.sum()))
+
+        return moves
+
+    def observe(self, opponent_moves: np.ndarray, maria_moves: np.ndarray) -> None:
+        """
+        Update the statistics and scores with the moves of a round. `choose` must have been called for this round.
+
+        Args:
+            opponent_moves (np.ndarray): One move per opponent.
+            maria_moves (np.ndarray): Maria's move against every opponent.
+
+        Returns:
+            None
+        """
+        rows = np.arange(len(opponent_moves))
+
+        self.scores *= SCORE_DECAY
+        self.scores += SCORE_BY_OUTCOME[(self.suggestions - opponent_moves[:, None]) % 3]
+
+        for counts in (self.frequency, self.after_last, self.after_two, self.after_pair):
+            counts *= COUNT_DECAY
+
+        has_last = self.last >= 0
+        has_previous = self.previous >= 0
+        last = np.maximum(self.last, 0)
+        previous = np.maximum(self.previous, 0)
+        last_maria = np.maximum(self.last_maria, 0)
+
+        self.frequency[rows, opponent_moves] += 1
+        self.after_last[rows, last, opponent_moves] += has_last
+        self.after_two[rows, previous, last, opponent_moves] += has_previous
+        self.after_pair[rows, last, last_maria, opponent_moves] += has_last
+
+        self.previous = self.last
+        self.last = opponent_moves.copy()
+        self.last_maria = maria_moves.copy()
+
+
+class MariaBrain:
+    """
+    Maria's strategy engine: one `OpponentModels` row per opponent, kept in a bounded LRU of `max_models` players.
+    """
+
+    def __init__(self, max_models: int = MARIA_MAX_MODELS, seed: Optional[int] = None) -> None:
+        self.max_models = max_models
+        self._rng = np.random.default_rng(seed)
+        self._lock = Lock()
+        self._models: "OrderedDict[str, OpponentModels]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def _model(self, player: str) -> OpponentModels:
+        model = self._models.get(player)
+
+        if model is None:
+            model = self._models[player] = OpponentModels(1)
+            if len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        else:
+            self._models.move_to_end(player)
+
+        return model
+
+    def choose(self, player: str) -> str:
+        """
+        Choose Maria's move against a player, from that player's past moves only.
+
+        Args:
+            player (str): The username of the opponent.
+
+        Returns:
+            str: One of "rock", "paper" or "scissor".
+        """
+        with self._lock:
+            return MOVES[int(self._model(player).choose(self._rng)[0])]
+
+    def observe(self, player: str, player_move: str, maria_move: str) -> None:
+        """
+        Learn from a resolved round against a player.
+
+        Args:
+            player (str): The username of the opponent.
+            player_move (str): The move of the opponent.
+            maria_move (str): Maria's move.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._model(player).observe(np.array([MOVES.index(player_move)]), np.array([MOVES.index(maria_move)]))
+
+
+maria_brain = MariaBrain()
+
+
+def generate_maria_choice(player: Optional[str] = None):
+    """
+    Generate a choice for Maria against the given player, or a random choice without a player
+    """
+    if player is None:
+        choices = ["rock", "paper", "scissor"]
+        return choice(choices)
+
+    return maria_brain.choose(player)
+
+
+def record_maria_round(player: str, player_move: str, maria_move: str) -> None:
+    """
+    Let Maria learn from a round she played against a player.
+
+    Args:
+        player (str): The username of the opponent.
+        player_move (str): The move of the opponent.
+        maria_move (str): Maria's move.
+
+    Returns:
+        None
+    """
+    maria_brain.observe(player, player_move, maria_move)
+
+
+# Scripted opponents of the batch evaluation: (round, own last moves, Maria's last moves, rng) -> moves
+ScriptedOpponent = Callable[[int, np.ndarray, np.ndarray, np.random.Generator], np.ndarray]
+
+SCRIPTED_OPPONENTS: Dict[str, ScriptedOpponent] = {
+    "random": lambda t, own, maria, rng: rng.integers(0, 3, size=len(own)),
+    "constant": lambda t, own, maria, rng: np.zeros(len(own), dtype=np.int64),
+    "cycle": lambda t, own, maria, rng: np.full(len(own), t % 3),
+    "biased": lambda t, own, maria, rng: rng.choice(3, size=len(own), p=[0.5, 0.3, 0.2]),
+    "beat_last": lambda t, own, maria, rng: np.where(maria >= 0, (maria + 1) % 3, rng.integers(0, 3, size=len(own))),
+    "repeat_last": lambda t, own, maria, rng: np.where(own >= 0, own, rng.integers(0, 3, size=len(own))),
+}
+
+
+def evaluate(opponent: str, games: int = 10000, rounds: int = 100, seed: int = 0) -> Dict[str, float]:
     """
-    Generate a random choice for Maria
+    Play `games` games of `rounds` rounds at once between Maria and a scripted opponent, vectorized across games.
+
+    Args:
+        opponent (str): The name of a scripted opponent of `SCRIPTED_OPPONENTS`.
+        games (int): Number of games played in parallel, each against a fresh opponent model.
+        rounds (int): Number of rounds of every game.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        Dict[str, float]: Maria's win, loss and tie rates, the number of rounds played and the rounds per second.
     """
-    sleep(3)
-    choices = ["rock", "paper", "scissor"]
-    return choice(choices)
+    play = SCRIPTED_OPPONENTS[opponent]
+    rng = np.random.default_rng(seed)
+    models = OpponentModels(games)
+    outcomes = np.zeros(3, dtype=np.int64)
+
+    start = perf_counter()
+    for round_number in range(rounds):
+        maria_moves = models.choose(rng)
+        opponent_moves = play(round_number, models.last, models.last_maria, rng)
+        outcomes += np.bincount((maria_moves - opponent_moves) % 3, minlength=3)
+        models.observe(opponent_moves, maria_moves)
+    elapsed = perf_counter() - start
+
+    total = games * rounds
+    return {"win_rate": float(outcomes[1] / total),
+            "loss_rate": float(outcomes[2] / total),
+            "tie_rate": float(outcomes[0] / total),
+            "rounds": total,
+            "rounds_per_second": total / elapsed}
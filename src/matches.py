@@ -0,0 +1,157 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import uuid
+
+from src.database import matches
+from src.game_state import SEATS, SeriesScore
+
+MATCHES_PAGE_SIZE = int(os.environ.get("MATCHES_PAGE_SIZE", 10))
+
+CURSOR_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+
+def build_match(room_id: str, room_players: Dict[str, str], series: SeriesScore, played_at: datetime,
+                forfeit: Optional[str] = None) -> Dict:
+    """
+    Build the document of a series for the append-only matches collection.
+
+    Args:
+        room_id (str): The room id of the game.
+        room_players (Dict[str, str]): The usernames of "player1" and "player2".
+        series (SeriesScore): The series, finished or ended early when its room closed.
+        played_at (datetime): When the series was decided.
+        forfeit (Optional[str]): The seat that left the series before it was decided, and so lost it.
+
+    Returns:
+        Dict: The match document. "players", "score" and the moves of every round in "rounds" are ordered by seat,
+        and "winner" is the index of the winning seat, None for a tie. A series ended early is "unfinished", and
+        "forfeit" is the index of the seat that left it, if any.
+    """
+    winner = SEATS[1 - SEATS.index(forfeit)] if forfeit else series.winner
+
+    match = {"_id": uuid.uuid4().hex,
+             "room": room_id,
+             "players": [room_players["player1"], room_players["player2"]],
+             "best_of": series.best_of,
+             "rounds": series.rounds,
+             "score": series.score,
+             "winner": None if winner == "TIE" else SEATS.index(winner),
+             # Mongo keeps milliseconds, so does the cursor
+             "played_at": played_at.replace(microsecond=played_at.microsecond // 1000 * 1000)}
+
+    if not series.finished:
+        match["unfinished"] = True
+    if forfeit:
+        match["forfeit"] = SEATS.index(forfeit)
+
+    return match
+
+
+def encode_cursor(match: Dict) -> str:
+    """
+    Encode the position of a match in a player's history as an opaque pagination cursor.
+    """
+    return f"{match['played_at'].strftime(CURSOR_TIME_FORMAT)}_{match['_id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decode a cursor built by `encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    played_at, match_id = cursor.split("_", 1)
+    return datetime.strptime(played_at, CURSOR_TIME_FORMAT), match_id
+
+
+def recent_matches(username: str, cursor: Optional[str] = None,
+                   limit: int = MATCHES_PAGE_SIZE) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Read one page of a player's matches, newest first, from the (players, played_at, _id) index.
+
+    Args:
+        username (str): The username of the player.
+        cursor (Optional[str]): The cursor returned with the previous page, None for the first page.
+        limit (int): Maximum number of matches to return.
+
+    Returns:
+        Tuple[List[Dict], Optional[str]]: The matches and the cursor of the next page, None if this is the last one.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    query = {"players": username}
+
+    if cursor:
+        played_at, match_id = decode_cursor(cursor)
+        query["$or"] = [{"played_at": {"$lt": played_at}},
+                        {"played_at": played_at, "_id": {"$lt": match_id}}]
+
+    page = list(matches.find(query).sort([("played_at", -1), ("_id", -1)]).limit(limit + 1))
+
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+
+    return page[:limit], next_cursor
+
+
+def _join_moves(moves: Iterable[Optional[str]]) -> Optional[str]:
+    # Migrated games only know the player's own move
+    known = [move for move in moves if move]
+    return ", ".join(known) if known else None
+
+
+def describe_match(match: Dict, username: str) -> Dict:
+    """
+    Describe a match from the point of view of one of its players.
+
+    Args:
+        match (Dict): The match document.
+        username (str): The username of the player.
+
+    Returns:
+        Dict: "played_at", "opponent", "move", "opponent_move", "score" and "result" ("win", "loss" or "tie").
+        The moves of a series are listed in round order, and the score of a series ended early says how it ended.
+    """
+    seat = match["players"].index(username)
+    opponent_seat = 1 - seat
+    # Matches written before series were single rounds with their "moves"
+    rounds = match.get("rounds") or [match["moves"]]
+    score = match.get("score")
+
+    if match["winner"] is None:
+        result = "tie"
+    else:
+        result = "win" if match["winner"] == seat else "loss"
+
+    score = f"{score[seat]}-{score[opponent_seat]}" if score else None
+    if "forfeit" in match:
+        score = f"{score}, {'forfeited' if match['forfeit'] == seat else 'opponent left'}"
+    elif match.get("unfinished"):
+        score = f"{score}, unfinished"
+
+    return {"played_at": match["played_at"],
+            "opponent": match["players"][opponent_seat],
+            "move": _join_moves(moves[seat] for moves in rounds),
+            "opponent_move": _join_moves(moves[opponent_seat] for moves in rounds),
+            "score": score,
+            "result": result}
+
+
+def rename_player(username: str, new_username: str) -> None:
+    """
+    Rename a player in its match history.
+
+    Args:
+        username (str): The current username.
+        new_username (str): The new username.
+
+    Returns:
+        None
+    """
+    # One update per seat, "players.$" would only rename the first matching element. Matching on "players" too keeps
+    # both updates on the (players, played_at, _id) index
+    for seat in range(len(SEATS)):
+        matches.update_many({"players": username, f"players.{seat}": username},
+                            {"$set": {f"players.{seat}": new_username}})
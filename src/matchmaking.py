@@ -0,0 +1,189 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+import os
+
+# Seconds a player waits for a human opponent before being matched with a bot
+MATCHMAKING_TIMEOUT = float(os.environ.get("MATCHMAKING_TIMEOUT", 30))
+# Players are only matched with players whose rating falls in the same or a neighbouring band, 0 matches anyone
+MATCHMAKING_BAND_WIDTH = float(os.environ.get("MATCHMAKING_BAND_WIDTH", 100))
+
+# Upper bounds in seconds of the wait time histogram buckets
+WAIT_TIME_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60)
+
+
+class Ticket:
+    """
+    A player waiting in the matchmaking queue.
+    """
+    __slots__ = ("sid", "username", "band", "enqueued_at")
+
+    def __init__(self, sid: str, username: str, band: int, enqueued_at: float) -> None:
+        self.sid = sid
+        self.username = username
+        self.band = band
+        self.enqueued_at = enqueued_at
+
+
+class MatchmakingQueue:
+    """
+    Queue pairing players looking for a random human opponent.
+
+    Waiting tickets are kept per rating band in insertion-ordered dicts, so enqueueing, pairing with the longest
+    waiting player of a band and cancelling all cost O(1). A new player is paired with the longest waiting player
+    of its own band, then of the bands just below and above.
+    """
+
+    def __init__(self, band_width: float = MATCHMAKING_BAND_WIDTH, timeout: float = MATCHMAKING_TIMEOUT) -> None:
+        self.band_width = band_width
+        self.timeout = timeout
+        self._lock = Lock()
+        self._bands: Dict[int, "OrderedDict[str, Ticket]"] = {}
+        self._tickets: Dict[str, Ticket] = {}
+        self._wait_counts = [0] * (len(WAIT_TIME_BUCKETS) + 1)
+        self._wait_sum = 0.0
+        self.matched_total = 0
+        self.expired_total = 0
+        self.cancelled_total = 0
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._tickets
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of players waiting for an opponent.
+        """
+        return len(self._tickets)
+
+    def _band(self, rating: float) -> int:
+        return int(rating // self.band_width) if self.band_width > 0 else 0
+
+    def _observe_wait(self, ticket: Ticket, now: float) -> None:
+        wait = now - ticket.enqueued_at
+        self._wait_counts[bisect_left(WAIT_TIME_BUCKETS, wait)] += 1
+        self._wait_sum += wait
+
+    def _pop(self, ticket: Ticket) -> None:
+        band = self._bands[ticket.band]
+        del band[ticket.sid]
+        if not band:
+            del self._bands[ticket.band]
+        del self._tickets[ticket.sid]
+
+    def _find_opponent(self, band: int, username: str) -> Optional[Ticket]:
+        for candidate_band in (band, band - 1, band + 1):
+            for ticket in self._bands.get(candidate_band, {}).values():
+                # The same user may search from two tabs, never pair it with itself
+                if ticket.username != username:
+                    return ticket
+        return None
+
+    def enqueue(self, sid: str, username: str, rating: float = 0,
+                now: Optional[float] = None) -> Optional[Tuple[Ticket, Ticket]]:
+        """
+        Pair a player with a waiting opponent, or queue it until one arrives.
+
+        Args:
+            sid (str): The socket id of the player.
+            username (str): The username of the player.
+            rating (float): The rating of the player, used to pick an opponent of a similar level.
+            now (Optional[float]): The current monotonic time, defaults to `time.monotonic()`.
+
+        Returns:
+            Optional[Tuple[Ticket, Ticket]]: The waiting opponent's ticket and the new player's ticket if a match
+            was found, None if the player was queued or already is.
+        """
+        now = monotonic() if now is None else now
+        band = self._band(rating)
+        ticket = Ticket(sid, username, band, now)
+
+        with self._lock:
+            if sid in self._tickets:
+                return None
+
+            opponent = self._find_opponent(band, username)
+
+            if opponent is None:
+                self._bands.setdefault(band, OrderedDict())[sid] = ticket
+                self._tickets[sid] = ticket
+                return None
+
+            self._pop(opponent)
+            self._observe_wait(opponent, now)
+            self._observe_wait(ticket, now)
+            self.matched_total += 1
+
+            return opponent, ticket
+
+    def cancel(self, sid: str) -> bool:
+        """
+        Remove a player from the queue.
+
+        Args:
+            sid (str): The socket id of the player.
+
+        Returns:
+            bool: True if the player was waiting.
+        """
+        with self._lock:
+            ticket = self._tickets.get(sid)
+            if ticket is None:
+                return False
+
+            self._pop(ticket)
+            self.cancelled_total += 1
+            return True
+
+    def expire(self, now: Optional[float] = None) -> List[Ticket]:
+        """
+        Remove every player that waited longer than the timeout.
+
+        Args:
+            now (Optional[float]): The current monotonic time, defaults to `time.monotonic()`.
+
+        Returns:
+            List[Ticket]: The tickets of the removed players, oldest first within each band.
+        """
+        now = monotonic() if now is None else now
+        cutoff = now - self.timeout
+        expired = []
+
+        with self._lock:
+            for band in list(self._bands.values()):
+                # Bands are ordered by arrival, so only their heads can be expired
+                while band:
+                    ticket = next(iter(band.values()))
+                    if ticket.enqueued_at > cutoff:
+                        break
+                    self._pop(ticket)
+                    self._observe_wait(ticket, now)
+                    expired.append(ticket)
+
+            self.expired_total += len(expired)
+
+        return expired
+
+    def stats(self) -> Dict:
+        """
+        Get the queue depth, counters and wait time histogram.
+
+        Returns:
+            Dict: Queue depth, matched, expired and cancelled totals, and the cumulative wait time histogram keyed by
+            bucket upper bound, like a Prometheus histogram.
+        """
+        with self._lock:
+            cumulative, histogram = 0, {}
+            for bound, count in zip(WAIT_TIME_BUCKETS + ("+Inf",), self._wait_counts):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+
+            return {"depth": len(self._tickets),
+                    "matched_total": self.matched_total,
+                    "expired_total": self.expired_total,
+                    "cancelled_total": self.cancelled_total,
+                    "wait_seconds_sum": self._wait_sum,
+                    "wait_seconds_count": cumulative,
+                    "wait_seconds_buckets": histogram}
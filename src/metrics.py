@@ -0,0 +1,236 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    A monotonically increasing count per combination of label values.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+                for label_values, value in values]
+
+
+class Gauge:
+    """
+    A value that goes up and down. A gauge created with `function` reads its value when metrics are collected.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._function = function
+        self._lock = Lock()
+        self._value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def value(self) -> float:
+        return self._function() if self._function else self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {self.value()}"]
+
+
+class Histogram:
+    """
+    Observations counted in fixed buckets per combination of label values, with their count and sum.
+
+    An observation is a binary search and a few additions under a lock, cheap enough to time every request.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = Lock()
+        # Per label values: the count of every bucket (the last one is +Inf), then the sum of the observations
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][position] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        """
+        Observe the duration of the `with` block, in seconds.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, *label_values)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(label_values, list(counts), total[0]) for label_values, (counts, total) in self._values.items()]
+
+        lines = []
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}")
+        return lines
+
+
+class Registry:
+    """
+    The metrics of the process, rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, function))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.histogram("rps_http_request_seconds", "Duration of HTTP requests.",
+                                          ("endpoint", "method", "status"))
+socket_events = registry.counter("rps_socketio_events_total", "Socket.IO events received.", ("event",))
+socket_event_seconds = registry.histogram("rps_socketio_event_seconds", "Duration of Socket.IO event handlers.",
+                                          ("event",))
+function_seconds = registry.histogram("rps_function_seconds", "Duration of instrumented hot-path functions.",
+                                      ("function",))
+connected_sockets = registry.gauge("rps_connected_sockets", "Socket.IO clients connected to this process.")
+db_commands = registry.counter("rps_db_commands_total", "MongoDB commands by command name and outcome.",
+                               ("command", "outcome"))
+db_command_seconds = registry.histogram("rps_db_command_seconds", "Duration of MongoDB commands.", ("command",))
+
+
+def timed(function_name: str) -> Callable:
+    """
+    Decorate a function to observe its duration in `rps_function_seconds`.
+
+    Args:
+        function_name (str): The value of the "function" label.
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with function_seconds.time(function_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timer(function_name: str):
+    """
+    Context manager observing the duration of its block in `rps_function_seconds`.
+
+    Args:
+        function_name (str): The value of the "function" label.
+    """
+    return function_seconds.time(function_name)
+
+
+def socket_event(event: str) -> Callable:
+    """
+    Decorate a Socket.IO event handler to count its events and observe its duration.
+
+    Args:
+        event (str): The name of the event.
+
+    Returns:
+        Callable: The decorator, to apply below `socketio.on`.
+    """
+    def decorator(handler: Callable) -> Callable:
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            socket_events.inc(event)
+            with socket_event_seconds.time(event):
+                return handler(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Count MongoDB commands and observe their duration, registered with the client through `event_listeners`.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        db_commands.inc(event.command_name, "success")
+        db_command_seconds.observe(event.duration_micros / 1e6, event.command_name)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        db_commands.inc(event.command_name, "failure")
+        db_command_seconds.observe(event.duration_micros / 1e6, event.command_name)
@@ -0,0 +1,382 @@
+from hashlib import blake2b
+from threading import Lock
+from time import time
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional
+import os
+import secrets
+
+import numpy as np
+
+from src.game_state import MOVES, OUTCOMES
+
+# Folder of the move log segments, the move log is disabled unless it is set
+MOVE_LOG_DIR = os.environ.get("MOVE_LOG_DIR", "")
+# Rounds per segment file before the log rotates to a new one, 1M rounds are 40 MB
+MOVE_LOG_SEGMENT_RECORDS = int(os.environ.get("MOVE_LOG_SEGMENT_RECORDS", 1_000_000))
+# Seconds between two writes of the buffered rounds, a full buffer is written right away
+MOVE_LOG_FLUSH_INTERVAL = float(os.environ.get("MOVE_LOG_FLUSH_INTERVAL", 1.0))
+MOVE_LOG_BUFFER_RECORDS = 4096
+
+# Every segment starts with a header of the magic, the format version and the record size
+MOVE_LOG_MAGIC = b"RPSMOVES"
+MOVE_LOG_VERSION = 1
+HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4")])
+
+# One fixed-width record per round: the time it was resolved, the room code, a key of both usernames, the round
+# of the series, and the moves and outcome as indexes in MOVES and OUTCOMES. Records are padded to 40 bytes.
+MOVE_RECORD = np.dtype({
+    "names": ["time", "room", "player1", "player2", "round", "move1", "move2", "outcome"],
+    "formats": ["<f8", "S8", "<u8", "<u8", "<u2", "u1", "u1", "u1"],
+    "offsets": [0, 8, 16, 24, 32, 34, 35, 36],
+    "itemsize": 40,
+})
+
+
+def player_key(username: str) -> int:
+    """
+    Get the 64-bit key a username is logged as. Records stay fixed-width whatever the length of the usernames, and
+    the rounds of a player are found by comparing keys.
+    """
+    return int.from_bytes(blake2b(username.encode(), digest_size=8).digest(), "little")
+
+
+def segment_name(index: int) -> str:
+    """
+    Get the file name of the `index`-th segment of a log. Names sort by creation time, then by index, and the random
+    suffix keeps the segments of several server processes writing to the same folder apart.
+    """
+    return f"moves-{int(time() * 1000):013d}-{index:06d}-{secrets.token_hex(4)}.bin"
+
+
+class MoveLog:
+    """
+    Append-only log of every resolved round, in fixed-width binary records.
+
+    `append` only fills the next record of an in-memory buffer, which is written to the current segment file when
+    it is full and every `flush_interval` seconds by `run`. Segments are never modified once written, and the log
+    moves to a new one every `segment_records` rounds, so old segments can be archived or deleted as whole files.
+    """
+
+    def __init__(self, directory: str = MOVE_LOG_DIR, segment_records: int = MOVE_LOG_SEGMENT_RECORDS,
+                 flush_interval: float = MOVE_LOG_FLUSH_INTERVAL,
+                 buffer_records: int = MOVE_LOG_BUFFER_RECORDS) -> None:
+        self.directory = directory
+        self.segment_records = segment_records
+        self.flush_interval = flush_interval
+        self._lock = Lock()
+        self._write_lock = Lock()
+        self._buffer = np.zeros(buffer_records, MOVE_RECORD)
+        self._buffered = 0
+        # Full buffers waiting to be written, in order
+        self._full: List[np.ndarray] = []
+        self._file: Optional[BinaryIO] = None
+        self._segment_size = 0
+        self.records_total = 0
+        self.segments_total = 0
+        self.dropped_total = 0
+
+    def append(self, room_id: str, room_players: Dict[str, str], round_choices: Dict[str, str],
+               series_round: int) -> None:
+        """
+        Log a resolved round.
+
+        Args:
+            room_id (str): The room code of the game.
+            room_players (Dict[str, str]): The usernames of "player1" and "player2".
+            round_choices (Dict[str, str]): The moves of "player1" and "player2".
+            series_round (int): The number of the round in its series, starting at 1.
+
+        Returns:
+            None
+        """
+        move1, move2 = MOVES.index(round_choices["player1"]), MOVES.index(round_choices["player2"])
+        record = (time(), room_id.encode(), player_key(room_players["player1"]), player_key(room_players["player2"]),
+                  series_round, move1, move2, (move1 - move2) % 3)
+
+        with self._lock:
+            self._buffer[self._buffered] = record
+            self._buffered += 1
+            full = self._buffered == len(self._buffer)
+            if full:
+                # Swap the buffer before releasing the lock, so the next round never lands past its end
+                self._full.append(self._buffer)
+                self._buffer = np.zeros(len(self._buffer), MOVE_RECORD)
+                self._buffered = 0
+
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write the buffered rounds to the current segment. Rounds that can't be written, e.g. on a full disk, are
+        dropped and counted, the game never waits or fails on the move log.
+
+        Returns:
+            int: The number of rounds written.
+        """
+        # The buffers are taken with the write lock held, so they are written in the order they were filled
+        with self._write_lock:
+            with self._lock:
+                batches, self._full = self._full, []
+                if self._buffered:
+                    batches.append(self._buffer[:self._buffered].copy())
+                    self._buffered = 0
+
+            written = 0
+            for records in batches:
+                try:
+                    self._write(records)
+                except OSError as error:
+                    print(f"{error}. Could not write {len(records)} rounds to the move log, they are dropped")
+                    with self._lock:
+                        self.dropped_total += len(records)
+                    continue
+                written += len(records)
+
+        return written
+
+    def extend(self, records: np.ndarray) -> None:
+        """
+        Write an array of MOVE_RECORD records to the log, rotating segments as they fill up.
+
+        Args:
+            records (np.ndarray): The records, in chronological order.
+
+        Returns:
+            None
+
+        Raises:
+            OSError: If the records can't be written. The next write starts a new segment, so a partly written
+                record never shifts the records after it.
+        """
+        with self._write_lock:
+            self._write(records)
+
+    def _write(self, records: np.ndarray) -> None:
+        """
+        Write records to the log, see `extend`. Must be called with the write lock held.
+        """
+        written = 0
+        while written < len(records):
+            if self._file is None or self._segment_size == self.segment_records:
+                self._rotate()
+
+            count = min(len(records) - written, self.segment_records - self._segment_size)
+            try:
+                self._file.write(records[written:written + count].tobytes())
+                self._file.flush()
+            except OSError:
+                self._abandon_segment()
+                raise
+            self._segment_size += count
+            self.records_total += count
+            written += count
+
+    def _abandon_segment(self) -> None:
+        """
+        Stop writing to the current segment after a failed write. Must be called with the write lock held.
+        """
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        self._file = None
+
+    def _rotate(self) -> None:
+        """
+        Close the current segment and start a new one. Must be called with the write lock held.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._file = open(os.path.join(self.directory, segment_name(self.segments_total)), "xb")
+        try:
+            self._file.write(np.array((MOVE_LOG_MAGIC, MOVE_LOG_VERSION, MOVE_RECORD.itemsize), HEADER).tobytes())
+        except OSError:
+            self._abandon_segment()
+            raise
+        self._segment_size = 0
+        self.segments_total += 1
+
+    def close(self) -> None:
+        """
+        Write the buffered rounds and close the current segment. The next round starts a new segment.
+        """
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the move log counters.
+
+        Returns:
+            Dict[str, int]: Rounds written, buffered and dropped on write errors, and segments created by this
+            process.
+        """
+        return {"records_total": self.records_total,
+                "buffered": self._buffered + sum(len(batch) for batch in self._full),
+                "dropped_total": self.dropped_total,
+                "segments_total": self.segments_total}
+
+    def run(self, sleep: Callable[[float], Any]) -> None:
+        """
+        Flush the buffer forever. Meant to be started as a background task.
+
+        Args:
+            sleep (Callable[[float], Any]): The sleep function of the server, e.g. `socketio.sleep`.
+
+        Returns:
+            None
+        """
+        while True:
+            sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as error:  # pylint: disable=broad-except
+                print(f"{error}. Move log flush failed")
+
+
+def open_segment(path: str) -> np.ndarray:
+    """
+    Memory-map the records of a segment, read-only. Nothing is read until the records are used, and a trailing
+    record still being written is left out.
+
+    Args:
+        path (str): The path of the segment file.
+
+    Returns:
+        np.ndarray: A memory-mapped array of MOVE_RECORD records.
+
+    Raises:
+        ValueError: If the file isn't a segment of this format.
+    """
+    header = np.fromfile(path, HEADER, count=1)
+    if (len(header) == 0 or header["magic"][0] != MOVE_LOG_MAGIC or header["version"][0] != MOVE_LOG_VERSION
+            or header["record_size"][0] != MOVE_RECORD.itemsize):
+        raise ValueError(f"{path} is not a version {MOVE_LOG_VERSION} move log segment")
+
+    count = (os.path.getsize(path) - HEADER.itemsize) // MOVE_RECORD.itemsize
+    if count == 0:
+        # mmap can't map an empty range
+        return np.zeros(0, MOVE_RECORD)
+
+    return np.memmap(path, MOVE_RECORD, mode="r", offset=HEADER.itemsize, shape=(count,))
+
+
+class MoveLogReader:
+    """
+    Analytics over the move log segments of a folder.
+
+    Every segment is memory-mapped and scanned with vectorized NumPy operations one after the other, so the
+    memory used is bounded by one segment whatever the size of the log, and the pages of the segments are shared
+    with the OS page cache instead of being copied.
+    """
+
+    def __init__(self, directory: str = MOVE_LOG_DIR) -> None:
+        self.directory = directory
+
+    def segment_paths(self) -> List[str]:
+        """
+        Get the paths of the segments, oldest first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        return [os.path.join(self.directory, name) for name in sorted(os.listdir(self.directory))
+                if name.startswith("moves-") and name.endswith(".bin")]
+
+    def segments(self) -> Iterator[np.ndarray]:
+        """
+        Iterate over the memory-mapped records of every segment, oldest first.
+        """
+        for path in self.segment_paths():
+            yield open_segment(path)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Count the rounds, the moves of each seat and the outcomes of the whole log.
+
+        Returns:
+            Dict[str, Any]: The number of "rounds", the "moves" of "player1" and "player2" and the "outcomes", each
+            as a dictionary of counts.
+        """
+        rounds = 0
+        moves = np.zeros((2, len(MOVES)), dtype=np.int64)
+        outcomes = np.zeros(len(OUTCOMES), dtype=np.int64)
+
+        for records in self.segments():
+            rounds += len(records)
+            moves[0] += np.bincount(records["move1"], minlength=len(MOVES))[:len(MOVES)]
+            moves[1] += np.bincount(records["move2"], minlength=len(MOVES))[:len(MOVES)]
+            outcomes += np.bincount(records["outcome"], minlength=len(OUTCOMES))[:len(OUTCOMES)]
+
+        return {"rounds": rounds,
+                "moves": {seat: dict(zip(MOVES, counts.tolist())) for seat, counts in zip(("player1", "player2"),
+                                                                                            moves)},
+                "outcomes": dict(zip(OUTCOMES, outcomes.tolist()))}
+
+    def player_tendencies(self, username: str) -> Dict[str, Any]:
+        """
+        Count the moves and results of a player, and which move they play after each of their moves.
+
+        Args:
+            username (str): The username of the player.
+
+        Returns:
+            Dict[str, Any]: The number of "rounds", the counts of "moves", the "wins", "ties" and "losses", and
+            "after", the counts of the next move for every move of the player.
+        """
+        key = np.uint64(player_key(username))
+        moves = np.zeros(len(MOVES), dtype=np.int64)
+        results = np.zeros(3, dtype=np.int64)
+        transitions = np.zeros(len(MOVES) ** 2, dtype=np.int64)
+        previous = None
+
+        for records in self.segments():
+            first, second = records["player1"] == key, records["player2"] == key
+            seated = first | second
+            if not seated.any():
+                continue
+
+            played = records[seated]
+            is_first = first[seated]
+            own = np.where(is_first, played["move1"], played["move2"]).astype(np.int64)
+            # Outcome as seen from the player: 0 tie, 1 win, 2 loss
+            outcome = played["outcome"].astype(np.int64)
+            outcome = np.where(is_first | (outcome == 0), outcome, 3 - outcome)
+
+            moves += np.bincount(own, minlength=len(MOVES))[:len(MOVES)]
+            results += np.bincount(outcome, minlength=3)[:3]
+
+            sequence = own if previous is None else np.concatenate(([previous], own))
+            transitions += np.bincount(sequence[:-1] * len(MOVES) + sequence[1:],
+                                       minlength=len(MOVES) ** 2)[:len(MOVES) ** 2]
+            previous = own[-1]
+
+        return {"rounds": int(moves.sum()),
+                "moves": dict(zip(MOVES, moves.tolist())),
+                "wins": int(results[1]), "ties": int(results[0]), "losses": int(results[2]),
+                "after": {move: dict(zip(MOVES, row.tolist()))
+                          for move, row in zip(MOVES, transitions.reshape(len(MOVES), len(MOVES)))}}
+
+    def replay(self, room_id: str) -> np.ndarray:
+        """
+        Get every logged round of a room, in the order they were played.
+
+        Args:
+            room_id (str): The room code.
+
+        Returns:
+            np.ndarray: The MOVE_RECORD records of the room, copied out of the segments.
+        """
+        # Codes are logged on 8 bytes, as the longest code ever allocated
+        room = room_id.encode()[:MOVE_RECORD["room"].itemsize]
+        rounds = [records[records["room"] == room] for records in self.segments()]
+        rounds = np.concatenate(rounds) if rounds else np.zeros(0, MOVE_RECORD)
+        # Segments of several server processes overlap in time
+        return rounds[np.argsort(rounds["time"], kind="stable")]
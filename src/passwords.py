@@ -0,0 +1,91 @@
+from threading import BoundedSemaphore, Lock
+from typing import Any, Callable
+import os
+
+import bcrypt
+
+from src.async_mode import native_executor
+
+# bcrypt cost factor, load tests can use a cheap one (bcrypt accepts 4 to 31)
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+
+# Threads hashing passwords and how many more requests may wait for one before new ones are rejected
+PASSWORD_POOL_SIZE = int(os.environ.get("PASSWORD_POOL_SIZE", os.cpu_count() or 2))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get("PASSWORD_QUEUE_LIMIT", 32))
+
+
+class PasswordPoolSaturated(Exception):
+    """
+    Raised when every password worker is busy and the wait queue is full.
+    """
+
+
+class PasswordPool:
+    """
+    Bounded pool hashing and verifying passwords off the request threads.
+
+    At most `size` bcrypt calls run at once on OS threads, which bcrypt does without holding the GIL and, with
+    eventlet or gevent, without blocking the event loop. At most `queue_limit` more wait for a worker. Anything
+    beyond that fails fast with `PasswordPoolSaturated` instead of queueing without bound.
+    """
+
+    def __init__(self, size: int = PASSWORD_POOL_SIZE, queue_limit: int = PASSWORD_QUEUE_LIMIT,
+                 rounds: int = BCRYPT_ROUNDS) -> None:
+        self.size = size
+        self.queue_limit = queue_limit
+        self.rounds = rounds
+        self._executor = native_executor(size, thread_name_prefix="bcrypt")
+        self._slots = BoundedSemaphore(size + queue_limit)
+        self._in_flight = 0
+        self._counter_lock = Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of password operations running or waiting for a worker.
+        """
+        return self._in_flight
+
+    def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run `func(*args)` on the pool and wait for its result.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolSaturated(f"{self.size + self.queue_limit} password operations already in flight")
+
+        with self._counter_lock:
+            self._in_flight += 1
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            with self._counter_lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def hash_password(self, password: str) -> bytes:
+        """
+        Hash a password with a new salt.
+
+        Args:
+            password (str): The plain text password.
+
+        Returns:
+            bytes: The bcrypt hash, which embeds its salt and cost factor.
+        """
+        return self._run(lambda: bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds)))
+
+    def check_password(self, password: str, hashed_password: bytes) -> bool:
+        """
+        Check a password against its bcrypt hash.
+
+        Args:
+            password (str): The plain text password.
+            hashed_password (bytes): The stored bcrypt hash.
+
+        Returns:
+            bool: True if the password matches.
+        """
+        return self._run(bcrypt.checkpw, password.encode(), hashed_password)
+
+
+password_pool = PasswordPool()
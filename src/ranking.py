@@ -0,0 +1,187 @@
+from threading import Lock
+from time import monotonic
+from typing import Dict, Optional
+import os
+
+from src.database import users
+
+# Seconds before the in-memory rank index is rebuilt from the database, so it also picks up writes of other workers
+RANK_REFRESH_SECONDS = float(os.environ.get("RANK_REFRESH_SECONDS", 300))
+
+
+class RankIndex:
+    """
+    Order-statistic index over the win counts of all users.
+
+    A Fenwick tree counts users per number of wins, so the rank of a user and the update after a win both cost
+    O(log W), W being the highest win count, instead of sorting the whole user collection.
+
+    Ties: users with the same number of wins share the same rank, which is one plus the number of users with
+    strictly more wins (e.g. 1, 2, 2, 4).
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self._tree = [0] * (capacity + 1)
+        self._total = 0
+
+    @property
+    def total(self) -> int:
+        """
+        Number of users in the index.
+        """
+        return self._total
+
+    @classmethod
+    def from_counts(cls, counts: Dict[int, int]) -> "RankIndex":
+        """
+        Build an index from a mapping of win count to number of users with that win count.
+
+        Args:
+            counts (Dict[int, int]): Number of users per win count.
+
+        Returns:
+            RankIndex: The populated index.
+        """
+        index = cls(capacity=max(1024, max(counts, default=0) + 1))
+        for wins, count in counts.items():
+            index.add(wins, count)
+        return index
+
+    def _grow(self, wins: int) -> None:
+        """
+        Grow the tree so it can hold `wins`, keeping its counts.
+        """
+        counts = {value: self._count_at(value) for value in range(len(self._tree) - 1)}
+        capacity = len(self._tree) - 1
+        while capacity <= wins:
+            capacity *= 2
+        self._tree = [0] * (capacity + 1)
+        self._total = 0
+        for value, count in counts.items():
+            if count:
+                self.add(value, count)
+
+    def _prefix(self, wins: int) -> int:
+        """
+        Number of users with at most `wins` wins.
+        """
+        position = min(wins, len(self._tree) - 2) + 1
+        result = 0
+        while position > 0:
+            result += self._tree[position]
+            position -= position & -position
+        return result
+
+    def _count_at(self, wins: int) -> int:
+        """
+        Number of users with exactly `wins` wins.
+        """
+        return self._prefix(wins) - (self._prefix(wins - 1) if wins > 0 else 0)
+
+    def add(self, wins: int, count: int = 1) -> None:
+        """
+        Add `count` users with `wins` wins. A negative count removes users.
+
+        Args:
+            wins (int): The win count of the users.
+            count (int): How many users to add.
+
+        Returns:
+            None
+        """
+        if wins >= len(self._tree) - 1:
+            self._grow(wins)
+
+        position = wins + 1
+        while position < len(self._tree):
+            self._tree[position] += count
+            position += position & -position
+        self._total += count
+
+    def record_win(self, old_wins: int) -> None:
+        """
+        Move a user from `old_wins` to `old_wins + 1` wins.
+
+        Args:
+            old_wins (int): The win count of the user before the win.
+
+        Returns:
+            None
+        """
+        self.add(old_wins, -1)
+        self.add(old_wins + 1)
+
+    def rank(self, wins: int) -> int:
+        """
+        Get the rank of a user with `wins` wins.
+
+        Args:
+            wins (int): The win count of the user.
+
+        Returns:
+            int: One plus the number of users with strictly more wins.
+        """
+        return self._total - self._prefix(wins) + 1
+
+
+_lock = Lock()
+_rank_index: Optional[RankIndex] = None
+_loaded_at = 0.0
+
+
+def _get_rank_index() -> RankIndex:
+    """
+    Get the process rank index, (re)building it from a win count aggregation when missing or stale.
+
+    Only one document per distinct win count leaves the database, never the user documents themselves.
+    """
+    global _rank_index, _loaded_at  # pylint: disable=global-statement
+
+    if _rank_index is None or monotonic() - _loaded_at > RANK_REFRESH_SECONDS:
+        counts = {group["_id"]: group["count"]
+                  for group in users.aggregate([{"$group": {"_id": "$wins", "count": {"$sum": 1}}}])}
+        _rank_index = RankIndex.from_counts(counts)
+        _loaded_at = monotonic()
+
+    return _rank_index
+
+
+def get_user_rank(wins: int) -> int:
+    """
+    Get the leaderboard rank of a user with the given number of wins. Users with equal wins share a rank.
+
+    Args:
+        wins (int): The number of wins of the user.
+
+    Returns:
+        int: The rank of the user, starting at 1.
+    """
+    with _lock:
+        return _get_rank_index().rank(wins)
+
+
+def record_new_user() -> None:
+    """
+    Add a newly created user, with no wins yet, to the rank index.
+
+    Returns:
+        None
+    """
+    with _lock:
+        if _rank_index is not None:
+            _rank_index.add(0)
+
+
+def record_win(old_wins: int) -> None:
+    """
+    Update the rank index after a user with `old_wins` wins won a game.
+
+    Args:
+        old_wins (int): The win count of the user before the win.
+
+    Returns:
+        None
+    """
+    with _lock:
+        if _rank_index is not None:
+            _rank_index.record_win(old_wins)
@@ -0,0 +1,138 @@
+from typing import Dict, Iterable, List, Union
+import os
+
+import numpy as np
+
+from src.database import users
+
+# Elo ratings: every user starts at RATING_INITIAL, and a game moves both ratings by at most RATING_K points
+RATING_INITIAL = float(os.environ.get("RATING_INITIAL", 1500))
+RATING_K = float(os.environ.get("RATING_K", 32))
+# Rating difference at which the stronger player is expected to score 10 times more than the weaker one
+RATING_SCALE = 400.0
+
+# Score of player 1 for every outcome of a game
+SCORES = {"player1": 1.0, "TIE": 0.5, "player2": 0.0}
+
+# Rating leaderboard order, served by the (rating, username) index
+RATING_PROJECTION = {"_id": 0, "username": 1, "rating": 1, "wins": 1}
+RATING_SORT = [("rating", -1), ("username", 1)]
+
+Rating = Union[float, np.ndarray]
+
+
+def expected_score(rating: Rating, opponent_rating: Rating) -> Rating:
+    """
+    Get the expected score of a player against an opponent, between 0 (sure loss) and 1 (sure win).
+
+    Works on single ratings and on whole NumPy arrays of ratings alike.
+    """
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / RATING_SCALE))
+
+
+def rating_change(rating1: Rating, rating2: Rating, score1: Rating, k: float = RATING_K) -> Rating:
+    """
+    Get the rating change of player 1 after a game. Player 2's rating changes by the opposite amount.
+
+    Args:
+        rating1 (Rating): The rating of player 1 before the game.
+        rating2 (Rating): The rating of player 2 before the game.
+        score1 (Rating): The score of player 1: 1 for a win, 0.5 for a tie and 0 for a loss.
+        k (float): The maximum change of a rating in one game.
+
+    Returns:
+        Rating: The points player 1 gains, negative if it loses points.
+    """
+    return k * (score1 - expected_score(rating1, rating2))
+
+
+def get_ratings(usernames: Iterable[str]) -> Dict[str, float]:
+    """
+    Read the ratings of some users in one query. Users rated before ratings existed get RATING_INITIAL.
+
+    Args:
+        usernames (Iterable[str]): The usernames of the users.
+
+    Returns:
+        Dict[str, float]: The rating of every username.
+    """
+    usernames = list(usernames)
+    ratings = dict.fromkeys(usernames, RATING_INITIAL)
+
+    for user in users.find({"username": {"$in": usernames}}, {"_id": 0, "username": 1, "rating": 1}):
+        ratings[user["username"]] = user.get("rating", RATING_INITIAL)
+
+    return ratings
+
+
+def backfill_ratings() -> int:
+    """
+    Give RATING_INITIAL to the users created before ratings existed, e.g. the bots. Results add to the rating with
+    `$inc`, which would otherwise start a missing rating from 0. Run at startup.
+
+    Returns:
+        int: The number of users updated.
+    """
+    return users.update_many({"rating": {"$exists": False}}, {"$set": {"rating": RATING_INITIAL}}).modified_count
+
+
+def recompute_ratings(player1: np.ndarray, player2: np.ndarray, scores1: np.ndarray, periods: np.ndarray,
+                      n_players: int, k: float = RATING_K) -> np.ndarray:
+    """
+    Compute the ratings of every player from a whole game history, one rating period at a time.
+
+    As in Glicko and official Elo lists, the games of a period are all rated from the ratings at the start of the
+    period, and a player's change is the sum of its changes in the period. A period is then a handful of
+    vectorized operations whatever its number of games, and millions of games take seconds. With one game per
+    period, this is the game by game update of the server.
+
+    Args:
+        player1 (np.ndarray): The index of the first player of every game, in chronological order.
+        player2 (np.ndarray): The index of the second player of every game.
+        scores1 (np.ndarray): The score of the first player of every game, see `SCORES`.
+        periods (np.ndarray): The non-decreasing rating period of every game.
+        n_players (int): The number of players, indexes run from 0 to n_players - 1.
+        k (float): The maximum change of a rating in one game.
+
+    Returns:
+        np.ndarray: The final rating of every player.
+    """
+    ratings = np.full(n_players, RATING_INITIAL)
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(periods)) + 1, [len(periods)]))
+
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        first, second = player1[start:end], player2[start:end]
+        changes = rating_change(ratings[first], ratings[second], scores1[start:end], k)
+        ratings += np.bincount(first, changes, n_players) - np.bincount(second, changes, n_players)
+
+    return ratings
+
+
+def get_rating_page(page: int, page_size: int) -> List[Dict]:
+    """
+    Get one page of the leaderboard ordered by rating, with the rank of every entry. Users with the same rating
+    share a rank.
+
+    Args:
+        page (int): The page number, starting at 1.
+        page_size (int): Number of entries per page.
+
+    Returns:
+        List[Dict]: The entries of the page with their "rank", "username", "rating" and "wins".
+    """
+    offset = (max(page, 1) - 1) * page_size
+    entries = list(users.find({"rating": {"$exists": True}}, RATING_PROJECTION)
+                   .sort(RATING_SORT).skip(offset).limit(page_size))
+
+    if not entries:
+        return entries
+
+    # One range count on the rating index ranks the first entry, the rest of the page follows from it
+    rank = users.count_documents({"rating": {"$gt": entries[0]["rating"]}}) + 1
+    previous = entries[0]["rating"]
+    for position, entry in enumerate(entries):
+        if entry["rating"] != previous:
+            rank, previous = offset + position + 1, entry["rating"]
+        entry["rank"] = rank
+
+    return entries
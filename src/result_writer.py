@@ -0,0 +1,214 @@
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import os
+import uuid
+
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+
+# Buffer game results and write them in batches instead of one write per result
+RESULT_WRITE_BEHIND = os.environ.get("RESULT_WRITE_BEHIND", "0") == "1"
+RESULT_FLUSH_INTERVAL = float(os.environ.get("RESULT_FLUSH_INTERVAL", 0.5))
+# Ids of the last batches applied to a user, kept on the user so that a retried batch is never applied twice
+RESULT_BATCH_HISTORY = 8
+
+
+def build_result_update(wins: int, played: int, rating: float = 0.0,
+                        batch_id: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Build the atomic update applying game results to a user document.
+
+    Args:
+        wins (int): Number of won games to add.
+        played (int): Number of played games to add.
+        rating (float): Rating points to add, negative to remove points.
+        batch_id (Optional[str]): The write-behind batch of the results, recorded on the user.
+
+    Returns:
+        Dict[str, Dict]: An `$inc` update document.
+    """
+    update = {"wins": wins, "played": played}
+    if rating:
+        update["rating"] = rating
+
+    if batch_id is None:
+        return {"$inc": update}
+
+    return {"$inc": update,
+            "$push": {"result_batches": {"$each": [batch_id], "$slice": -RESULT_BATCH_HISTORY}}}
+
+
+class ResultWriter:
+    """
+    Write-behind buffer for game results.
+
+    Win and played counts and rating changes are coalesced per username in memory and match documents are queued,
+    and every `flush_interval` seconds they are written as one unordered `bulk_write` of `$inc` updates and one
+    unordered `insert_many`, so the code resolving a game never waits on the database.
+
+    Every batch of updates gets an id, pushed to the users it updates and excluded by the filter of its updates. A
+    batch that failed, or timed out after the server applied it, is retried with the same id, so no user gets the
+    same results twice.
+    """
+
+    def __init__(self, collection: Collection, matches_collection: Optional[Collection] = None,
+                 flush_interval: float = RESULT_FLUSH_INTERVAL,
+                 on_flush: Optional[Callable[[Dict[str, Dict[str, float]]], Any]] = None) -> None:
+        self.collection = collection
+        self.matches_collection = matches_collection
+        self.flush_interval = flush_interval
+        # Called with the results of every user updated by a flush, once they are in the database
+        self.on_flush = on_flush
+        self._lock = Lock()
+        self._pending: Dict[str, Dict[str, float]] = {}
+        self._pending_matches: List[Dict[str, Any]] = []
+        # Updates of failed batches, retried with their batch id
+        self._failed: List[Tuple[str, Dict[str, Dict[str, float]]]] = []
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of users and matches waiting to be written.
+        """
+        return len(self._pending) + len(self._pending_matches) + sum(len(results) for _, results in self._failed)
+
+    def add(self, username: str, wins: int, played: int, rating: float = 0.0) -> None:
+        """
+        Buffer a game result of a user.
+
+        Args:
+            username (str): The username of the player.
+            wins (int): Number of won games to add.
+            played (int): Number of played games to add.
+            rating (float): Rating points to add.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            pending = self._pending.setdefault(username, {"wins": 0, "played": 0, "rating": 0.0})
+            pending["wins"] += wins
+            pending["played"] += played
+            pending["rating"] += rating
+
+    def add_match(self, match: Dict[str, Any]) -> None:
+        """
+        Buffer a match document.
+
+        Args:
+            match (Dict[str, Any]): The match document to insert.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._pending_matches.append(match)
+
+    def _merge_matches(self, matches: List[Dict[str, Any]]) -> None:
+        """
+        Put matches that could not be written back in front of the buffer.
+        """
+        with self._lock:
+            self._pending_matches[:0] = matches
+
+    def _write_batch(self, batch_id: str, results: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+        """
+        Write one batch of results, and keep the updates that failed for a retry with the same batch id.
+
+        Returns:
+            Dict[str, Dict[str, float]]: The results written.
+        """
+        usernames = list(results)
+        operations = [UpdateOne({"username": username, "result_batches": {"$ne": batch_id}},
+                                build_result_update(result["wins"], result["played"], result["rating"], batch_id))
+                      for username, result in results.items()]
+
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as error:
+            failed = {usernames[write_error["index"]] for write_error in error.details["writeErrors"]}
+            print(f"{error}. Could not write {len(failed)} game results, retrying on next flush")
+            with self._lock:
+                self._failed.append((batch_id, {username: results[username] for username in failed}))
+            return {username: result for username, result in results.items() if username not in failed}
+        except Exception as error:  # pylint: disable=broad-except
+            # The server may have applied some updates before the error, the batch id skips them on the retry
+            print(f"{error}. Could not write {len(operations)} game results, retrying on next flush")
+            with self._lock:
+                self._failed.append((batch_id, results))
+            return {}
+
+        return results
+
+    def flush(self) -> int:
+        """
+        Write every buffered result in one batch, after the failed batches.
+
+        Returns:
+            int: The number of users updated and matches inserted.
+        """
+        with self._lock:
+            batches, self._failed = self._failed, []
+            if self._pending:
+                batches.append((uuid.uuid4().hex, self._pending))
+                self._pending = {}
+            matches, self._pending_matches = self._pending_matches, []
+
+        if not batches and not matches:
+            return 0
+
+        written: Dict[str, Dict[str, float]] = {}
+        for batch_id, results in batches:
+            for username, result in self._write_batch(batch_id, results).items():
+                if username in written:
+                    result = {key: value + written[username][key] for key, value in result.items()}
+                written[username] = result
+
+        if written and self.on_flush is not None:
+            try:
+                self.on_flush(written)
+            except Exception as error:  # pylint: disable=broad-except
+                print(f"{error}. Could not process {len(written)} written game results")
+
+        updated = len(written)
+
+        if self._failed:
+            # Matches wait for the results of their players
+            self._merge_matches(matches)
+            return updated
+
+        try:
+            if matches:
+                self.matches_collection.insert_many(matches, ordered=False)
+        except BulkWriteError as error:
+            # Matches already inserted by an earlier, partially failed flush are duplicates and are dropped
+            failed = [matches[write_error["index"]] for write_error in error.details["writeErrors"]
+                      if write_error["code"] != 11000]
+            if failed:
+                print(f"{error}. Could not write {len(failed)} matches, retrying on next flush")
+                self._merge_matches(failed)
+            return updated + len(matches) - len(failed)
+        except Exception as error:  # pylint: disable=broad-except
+            print(f"{error}. Could not write {len(matches)} matches, retrying on next flush")
+            self._merge_matches(matches)
+            return updated
+
+        return updated + len(matches)
+
+    def run(self, sleep: Callable[[float], Any]) -> None:
+        """
+        Flush the buffer forever. Meant to be started as a background task.
+
+        Args:
+            sleep (Callable[[float], Any]): The sleep function of the server, e.g. `socketio.sleep`.
+
+        Returns:
+            None
+        """
+        while True:
+            sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as error:  # pylint: disable=broad-except
+                print(f"{error}. Game results flush failed")
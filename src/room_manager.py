@@ -0,0 +1,169 @@
+from random import choices
+from string import ascii_uppercase
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+import os
+
+from src.game_state import SERIES_BEST_OF, SeriesScore
+
+# Rooms without any activity for this many seconds are closed by the background sweep
+ROOM_IDLE_TIMEOUT = float(os.environ.get("ROOM_IDLE_TIMEOUT", 1800))
+ROOM_SWEEP_INTERVAL = float(os.environ.get("ROOM_SWEEP_INTERVAL", 60))
+
+# Called with the code, the players and the series in progress of every evicted room
+EvictCallback = Callable[[str, Dict[str, Optional[str]], SeriesScore], Any]
+
+ROOM_CODE_MIN_LENGTH = 4
+# Codes get one letter longer once live rooms would take more than this share of the codes of the current length
+ROOM_CODE_MAX_OCCUPANCY = 0.01
+# Consecutive collisions before a single allocation falls back to a longer code
+ROOM_CODE_MAX_COLLISIONS = 8
+
+
+def _generate_room_code(string_length: int) -> str:
+    """
+    Generate a random string of uppercase letters with the given length.
+
+    Args:
+        string_length (int): The length of the random string to generate.
+
+    Returns:
+        str: A random string of uppercase letters.
+    """
+    return ''.join(choices(ascii_uppercase, k=string_length))
+
+
+class RoomManager:
+    """
+    Lifecycle of the rooms of a room registry: collision-free code allocation, activity tracking and eviction of
+    idle rooms.
+
+    Codes are kept sparse: their length grows with the number of live rooms so that a random code collides with
+    less than `ROOM_CODE_MAX_OCCUPANCY` probability, and every allocation is checked by the registry's atomic
+    create, so a live room is never overwritten.
+    """
+
+    def __init__(self, registry, idle_timeout: float = ROOM_IDLE_TIMEOUT,
+                 sweep_interval: float = ROOM_SWEEP_INTERVAL) -> None:
+        self.registry = registry
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._lock = Lock()
+        self.allocated_total = 0
+        self.collisions_total = 0
+        self.evicted_total = 0
+        self.sweeps_total = 0
+
+    def code_length(self, live_rooms: int) -> int:
+        """
+        Get the room code length keeping `live_rooms` below the maximum occupancy of the code space.
+
+        Args:
+            live_rooms (int): The number of live rooms.
+
+        Returns:
+            int: The code length to allocate new rooms with.
+        """
+        length = ROOM_CODE_MIN_LENGTH
+        while live_rooms >= ROOM_CODE_MAX_OCCUPANCY * len(ascii_uppercase) ** length:
+            length += 1
+        return length
+
+    def open_room(self, player1: str, player2: Optional[str] = None, best_of: int = SERIES_BEST_OF) -> str:
+        """
+        Create a room with a new, unused code.
+
+        Args:
+            player1 (str): The username of the room creator.
+            player2 (Optional[str]): The username of the second player, None to wait for someone to join.
+            best_of (int): The number of rounds of the series played in the room, one of SERIES_LENGTHS.
+
+        Returns:
+            str: The code of the new room.
+        """
+        length = self.code_length(len(self.registry))
+        collisions = 0
+
+        code = _generate_room_code(length)
+        while not self.registry.create(code, player1, player2, best_of):
+            collisions += 1
+            if collisions % ROOM_CODE_MAX_COLLISIONS == 0:
+                length += 1
+            code = _generate_room_code(length)
+
+        with self._lock:
+            self.allocated_total += 1
+            self.collisions_total += collisions
+
+        return code
+
+    def touch(self, code: str) -> None:
+        """
+        Record activity in a room.
+
+        Args:
+            code (str): The room code.
+
+        Returns:
+            None
+        """
+        self.registry.touch(code)
+
+    def sweep(self, on_evict: Optional[EvictCallback] = None) -> List[str]:
+        """
+        Evict every idle room.
+
+        Args:
+            on_evict (Optional[EvictCallback]): Called with the code, the players and the series in progress of
+                every evicted room.
+
+        Returns:
+            List[str]: The codes of the evicted rooms.
+        """
+        evicted = self.registry.evict_idle(self.idle_timeout)
+
+        with self._lock:
+            self.evicted_total += len(evicted)
+            self.sweeps_total += 1
+
+        if on_evict is not None:
+            for code, (room_players, series) in evicted.items():
+                on_evict(code, room_players, series)
+
+        return list(evicted)
+
+    def run(self, sleep: Callable[[float], Any], on_evict: Optional[EvictCallback] = None) -> None:
+        """
+        Sweep idle rooms forever. Meant to be started as a background task.
+
+        Args:
+            sleep (Callable[[float], Any]): The sleep function of the server, e.g. `socketio.sleep`.
+            on_evict (Optional[EvictCallback]): Called with the code, the players and the series in progress of
+                every evicted room.
+
+        Returns:
+            None
+        """
+        while True:
+            sleep(self.sweep_interval)
+            try:
+                self.sweep(on_evict)
+            except Exception as error:  # pylint: disable=broad-except
+                print(f"{error}. Idle room sweep failed")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the room counters.
+
+        Returns:
+            Dict[str, int]: Live rooms, current code length and the allocation, collision and eviction totals.
+        """
+        live_rooms = len(self.registry)
+
+        with self._lock:
+            return {"live_rooms": live_rooms,
+                    "code_length": self.code_length(live_rooms),
+                    "allocated_total": self.allocated_total,
+                    "collisions_total": self.collisions_total,
+                    "evicted_total": self.evicted_total,
+                    "sweeps_total": self.sweeps_total}
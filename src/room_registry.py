@@ -0,0 +1,315 @@
+from datetime import datetime, timedelta
+from threading import Lock
+from time import time
+from typing import Dict, Optional, Tuple
+import os
+
+from pymongo import ReturnDocument
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+from src.database import rooms as rooms_collection
+from src.game_state import MOVES, SEATS, SERIES_BEST_OF, RoomState, SeriesScore
+
+# "memory" keeps rooms in this process, "mongo" shares them between every worker using the same database
+ROOM_REGISTRY = os.environ.get("ROOM_REGISTRY", "memory")
+
+RoundResult = Tuple[int, Dict[str, str], SeriesScore]
+# Players and series in progress of a removed room
+ClosedRoom = Tuple[Dict[str, Optional[str]], SeriesScore]
+
+# Fields of a room document needed to rebuild a ClosedRoom
+CLOSED_ROOM_PROJECTION = {"player1": 1, "player2": 1, "best_of": 1, "score": 1, "rounds": 1}
+
+
+class InMemoryRoomRegistry:
+    """
+    Rooms of this process only, for development and single worker deployments.
+
+    Seats live in a plain dict next to the `RoomState` of every room.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._players: Dict[str, Dict[str, Optional[str]]] = {}
+        self._states: Dict[str, RoomState] = {}
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._players
+
+    def __len__(self) -> int:
+        return len(self._players)
+
+    def create(self, code: str, player1: str, player2: Optional[str] = None, best_of: int = SERIES_BEST_OF) -> bool:
+        """
+        Create a room unless the code is already taken.
+
+        Args:
+            code (str): The room code.
+            player1 (str): The username of the room creator.
+            player2 (Optional[str]): The username of the second player, None to wait for someone to join.
+            best_of (int): The number of rounds of the series played in the room, one of SERIES_LENGTHS.
+
+        Returns:
+            bool: True if the room was created, False if the code is in use.
+        """
+        state = RoomState(best_of)
+
+        with self._lock:
+            if code in self._players:
+                return False
+
+            self._players[code] = {"player1": player1, "player2": player2}
+            self._states[code] = state
+            return True
+
+    def get(self, code: str) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Get the players of a room.
+
+        Args:
+            code (str): The room code.
+
+        Returns:
+            Optional[Dict[str, Optional[str]]]: The usernames of "player1" and "player2", None if the room doesn't
+            exist.
+        """
+        room_players = self._players.get(code)
+        return dict(room_players) if room_players is not None else None
+
+    def join(self, code: str, username: str) -> bool:
+        """
+        Take the free second seat of a room.
+
+        Args:
+            code (str): The room code.
+            username (str): The username of the joining player.
+
+        Returns:
+            bool: True if the player got the seat, False if the room doesn't exist or is full.
+        """
+        with self._lock:
+            room_players = self._players.get(code)
+            if room_players is None or room_players["player2"] is not None:
+                return False
+
+            room_players["player2"] = username
+            self._states[code].touch()
+            return True
+
+    def remove(self, code: str) -> Optional[ClosedRoom]:
+        """
+        Remove a room if it exists.
+
+        Args:
+            code (str): The room code.
+
+        Returns:
+            Optional[ClosedRoom]: The players and the series in progress of the room, None if it didn't exist.
+        """
+        with self._lock:
+            room_players = self._players.pop(code, None)
+            state = self._states.pop(code, None)
+
+        if state is None:
+            return None
+
+        return room_players, state.series.copy()
+
+    def touch(self, code: str) -> None:
+        """
+        Mark a room as active now, postponing its eviction.
+
+        Args:
+            code (str): The room code.
+
+        Returns:
+            None
+        """
+        state = self._states.get(code)
+        if state is not None:
+            state.touch()
+
+    def evict_idle(self, idle_seconds: float) -> Dict[str, ClosedRoom]:
+        """
+        Remove every room without activity for more than `idle_seconds`.
+
+        Args:
+            idle_seconds (float): Maximum idle time of a room in seconds.
+
+        Returns:
+            Dict[str, ClosedRoom]: The players and the series in progress of every removed room, by code.
+        """
+        cutoff = time() - idle_seconds
+
+        with self._lock:
+            evicted = [code for code, state in self._states.items() if state.updated_at < cutoff]
+            return {code: (self._players.pop(code), self._states.pop(code).series.copy()) for code in evicted}
+
+    def register_choice(self, code: str, seat: str, move: str) -> Optional[RoundResult]:
+        """
+        Register a move and resolve the round if both seats have played.
+
+        Args:
+            code (str): The room code.
+            seat (str): Either "player1" or "player2".
+            move (str): One of "rock", "paper" or "scissor".
+
+        Returns:
+            Optional[RoundResult]: The resolved round number, both choices and the series including this round if
+            this move completed the round, None if the other seat still has to play or the room doesn't exist.
+        """
+        state = self._states.get(code)
+        if state is None:
+            return None
+
+        return state.register_choice(seat, move)
+
+
+def _closed_room(room: Dict) -> ClosedRoom:
+    return ({"player1": room["player1"], "player2": room["player2"]},
+            SeriesScore(room.get("best_of", 1), room.get("score"), room.get("rounds")))
+
+
+class MongoRoomRegistry:
+    """
+    Rooms shared by every worker through a Mongo collection, one document per room keyed by its code.
+
+    Every operation is a single atomic document update, and a round is resolved by a conditional update on the
+    round number and both choices, so exactly one worker resolves it even if both moves land at the same time.
+    """
+
+    def __init__(self, collection: Collection) -> None:
+        self.collection = collection
+
+    def __contains__(self, code: str) -> bool:
+        return self.collection.find_one({"_id": code}, {"_id": 1}) is not None
+
+    def __len__(self) -> int:
+        return self.collection.estimated_document_count()
+
+    def create(self, code: str, player1: str, player2: Optional[str] = None, best_of: int = SERIES_BEST_OF) -> bool:
+        """
+        Create a room unless the code is already taken. See `InMemoryRoomRegistry.create`.
+        """
+        series = SeriesScore(best_of)
+        now = datetime.utcnow()
+        try:
+            self.collection.insert_one({"_id": code,
+                                        "player1": player1,
+                                        "player2": player2,
+                                        "choices": {"player1": None, "player2": None},
+                                        "round": 1,
+                                        "best_of": series.best_of,
+                                        "score": series.score,
+                                        "rounds": series.rounds,
+                                        "created_at": now,
+                                        "updated_at": now})
+        except DuplicateKeyError:
+            return False
+
+        return True
+
+    def get(self, code: str) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Get the players of a room. See `InMemoryRoomRegistry.get`.
+        """
+        return self.collection.find_one({"_id": code}, {"_id": 0, "player1": 1, "player2": 1})
+
+    def join(self, code: str, username: str) -> bool:
+        """
+        Take the free second seat of a room. See `InMemoryRoomRegistry.join`.
+        """
+        result = self.collection.update_one({"_id": code, "player2": None},
+                                            {"$set": {"player2": username, "updated_at": datetime.utcnow()}})
+        return result.modified_count == 1
+
+    def remove(self, code: str) -> Optional[ClosedRoom]:
+        """
+        Remove a room if it exists. See `InMemoryRoomRegistry.remove`.
+        """
+        room = self.collection.find_one_and_delete({"_id": code}, projection=CLOSED_ROOM_PROJECTION)
+        return _closed_room(room) if room is not None else None
+
+    def touch(self, code: str) -> None:
+        """
+        Mark a room as active now. See `InMemoryRoomRegistry.touch`.
+        """
+        self.collection.update_one({"_id": code}, {"$set": {"updated_at": datetime.utcnow()}})
+
+    def evict_idle(self, idle_seconds: float) -> Dict[str, ClosedRoom]:
+        """
+        Remove every room without activity for more than `idle_seconds`. See `InMemoryRoomRegistry.evict_idle`.
+        """
+        idle = {"$lt": datetime.utcnow() - timedelta(seconds=idle_seconds)}
+        evicted = {}
+
+        # Every worker sweeps, so each room is claimed by its own delete and only the worker that removed it closes it
+        for candidate in self.collection.find({"updated_at": idle}, {"_id": 1}):
+            room = self.collection.find_one_and_delete({"_id": candidate["_id"], "updated_at": idle},
+                                                       projection=CLOSED_ROOM_PROJECTION)
+            if room is not None:
+                evicted[room["_id"]] = _closed_room(room)
+
+        return evicted
+
+    def register_choice(self, code: str, seat: str, move: str) -> Optional[RoundResult]:
+        """
+        Register a move and resolve the round if both seats have played. See `InMemoryRoomRegistry.register_choice`.
+        """
+        if seat not in SEATS:
+            raise ValueError(f"Invalid seat {seat!r}")
+        if move not in MOVES:
+            raise ValueError(f"Invalid move {move!r}")
+
+        room = self.collection.find_one_and_update({"_id": code},
+                                                   {"$set": {f"choices.{seat}": move, "updated_at": datetime.utcnow()}},
+                                                   projection={"choices": 1, "round": 1, "best_of": 1, "score": 1,
+                                                               "rounds": 1},
+                                                   return_document=ReturnDocument.AFTER)
+        if room is None:
+            return None
+
+        choices = room["choices"]
+        if choices["player1"] is None or choices["player2"] is None:
+            return None
+
+        choices = {"player1": choices["player1"], "player2": choices["player2"]}
+        series = SeriesScore(room.get("best_of", 1), room.get("score"), room.get("rounds"))
+        series.record(choices)
+        # The next series starts right after a finished one
+        next_series = SeriesScore(series.best_of) if series.finished else series
+
+        # Only the worker whose update still sees this exact round resolves it, and so scores it
+        resolved = self.collection.find_one_and_update({"_id": code,
+                                                        "round": room["round"],
+                                                        "choices.player1": choices["player1"],
+                                                        "choices.player2": choices["player2"]},
+                                                       {"$set": {"choices": {"player1": None, "player2": None},
+                                                                 "score": next_series.score,
+                                                                 "rounds": next_series.rounds},
+                                                        "$inc": {"round": 1}},
+                                                       projection={"_id": 1})
+        if resolved is None:
+            return None
+
+        return room["round"], choices, series
+
+
+def create_room_registry(backend: str = ROOM_REGISTRY):
+    """
+    Create the room registry selected by the ROOM_REGISTRY setting.
+
+    Args:
+        backend (str): "memory" or "mongo".
+
+    Returns:
+        Union[InMemoryRoomRegistry, MongoRoomRegistry]: The room registry.
+    """
+    if backend == "memory":
+        return InMemoryRoomRegistry()
+
+    if backend == "mongo":
+        return MongoRoomRegistry(rooms_collection)
+
+    raise ValueError(f"Unknown room registry {backend!r}, expected 'memory' or 'mongo'")
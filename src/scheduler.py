@@ -0,0 +1,84 @@
+from threading import Condition
+from time import monotonic
+from typing import Any, Callable, List, Tuple
+import heapq
+import itertools
+
+
+class DelayedCallScheduler:
+    """
+    Run callables after a delay from a single background task.
+
+    Pending calls live in a heap ordered by due time, so thousands of delayed calls cost one background
+    task instead of one sleeping thread each. The task is started lazily through `start_background_task`
+    (e.g. `socketio.start_background_task`) on the first scheduled call.
+    """
+
+    def __init__(self, start_background_task: Callable[..., Any]) -> None:
+        self._start_background_task = start_background_task
+        self._condition = Condition()
+        self._heap: List[Tuple[float, int, Callable[..., Any], tuple]] = []
+        self._counter = itertools.count()
+        self._started = False
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of calls waiting to be run.
+        """
+        return len(self._heap)
+
+    def call_later(self, delay: float, func: Callable[..., Any], *args: Any) -> None:
+        """
+        Schedule `func(*args)` to run after `delay` seconds.
+
+        Args:
+            delay (float): Seconds to wait before running the call.
+            func (Callable): The callable to run.
+            *args: Positional arguments passed to `func`.
+
+        Returns:
+            None
+        """
+        with self._condition:
+            heapq.heappush(self._heap, (monotonic() + delay, next(self._counter), func, args))
+
+            if not self._started:
+                self._started = True
+                self._start_background_task(self._run)
+
+            self._condition.notify()
+
+    def _pop_due(self) -> List[Tuple[Callable[..., Any], tuple]]:
+        """
+        Block until at least one call is due and pop every due call.
+        """
+        with self._condition:
+            while True:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                timeout = self._heap[0][0] - monotonic()
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    continue
+
+                due = []
+                now = monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, func, args = heapq.heappop(self._heap)
+                    due.append((func, args))
+
+                return due
+
+    def _run(self) -> None:
+        """
+        Background loop running due calls outside of the lock.
+        """
+        while True:
+            for func, args in self._pop_due():
+                try:
+                    func(*args)
+                except Exception as error:  # pylint: disable=broad-except
+                    print(f"{error}. Scheduled call {func.__name__} failed")
@@ -0,0 +1,54 @@
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from src.game_state import SEATS
+
+
+class SeatIndex:
+    """
+    Room and seat of every player socket connected to this process.
+
+    A socket is seated when it starts a game, from the session user's place in the room, so moves only carry the
+    move itself and a client can never play for another seat or room.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._seats: Dict[str, Tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._seats)
+
+    def sit(self, sid: str, room_id: str, seat: str) -> None:
+        """
+        Seat a socket, replacing any seat it had before.
+
+        Args:
+            sid (str): The Socket.IO session id of the player.
+            room_id (str): The room id of the game.
+            seat (str): Either "player1" or "player2".
+
+        Returns:
+            None
+        """
+        if seat not in SEATS:
+            raise ValueError(f"Invalid seat {seat!r}")
+
+        with self._lock:
+            self._seats[sid] = (room_id, seat)
+
+    def get(self, sid: str) -> Optional[Tuple[str, str]]:
+        """
+        Get the room id and seat of a socket, None if it isn't seated.
+        """
+        return self._seats.get(sid)
+
+    def leave(self, sid: str) -> Optional[Tuple[str, str]]:
+        """
+        Remove the seat of a socket, e.g. when it disconnects.
+
+        Returns:
+            Optional[Tuple[str, str]]: The room id and seat it had, None if it wasn't seated.
+        """
+        with self._lock:
+            return self._seats.pop(sid, None)
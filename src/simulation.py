@@ -0,0 +1,348 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from itertools import combinations
+from time import perf_counter
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.maria_brain import OpponentModels
+
+# Points of a game won or drawn in the standings, a lost game is worth nothing
+POINTS_WIN = 3
+POINTS_DRAW = 1
+
+# Fixed strategies generate every move of a match at once: (rng, games, rounds) -> (games, rounds) moves
+MoveGenerator = Callable[[np.random.Generator, int, int], np.ndarray]
+
+# Reactive strategies play a function of the last round: (own last moves, opponent's last moves) -> moves
+Reaction = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def resolve_rounds(moves1: np.ndarray, moves2: np.ndarray) -> np.ndarray:
+    """
+    Resolve a batch of rounds at once, the vectorized counterpart of `src.game_state.resolve_round`.
+
+    Args:
+        moves1 (np.ndarray): Moves of player 1, encoded by their index in MOVES.
+        moves2 (np.ndarray): Moves of player 2, with the same shape.
+
+    Returns:
+        np.ndarray: The outcome of every round as an index in OUTCOMES: 0 for a tie, 1 if player 1 won, 2 if
+        player 2 won.
+    """
+    return (moves1 - moves2) % 3
+
+
+class FixedStrategy(ABC):
+    """
+    A bot strategy ignoring its opponent, so every move of a match is generated in one call.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    @abstractmethod
+    def generate(self, rng: np.random.Generator, games: int, rounds: int) -> np.ndarray:
+        """
+        Generate every move of `games` games of `rounds` rounds.
+        """
+
+
+class AdaptiveStrategy(ABC):
+    """
+    A bot strategy playing round by round from what it observed, still vectorized across games.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    @abstractmethod
+    def start(self, games: int) -> object:
+        """
+        Create the state of `games` parallel games.
+        """
+
+    @abstractmethod
+    def choose(self, state: object, rng: np.random.Generator) -> np.ndarray:
+        """
+        Choose the next move of every game.
+        """
+
+    @abstractmethod
+    def observe(self, state: object, own_moves: np.ndarray, opponent_moves: np.ndarray) -> None:
+        """
+        Update the state of every game with the moves of the last round.
+        """
+
+
+# A bot strategy of the simulator, playing many games in parallel
+Strategy = Union[FixedStrategy, AdaptiveStrategy]
+
+
+class GeneratedStrategy(FixedStrategy):
+    def __init__(self, name: str, generator: MoveGenerator) -> None:
+        super().__init__(name)
+        self._generator = generator
+
+    def generate(self, rng: np.random.Generator, games: int, rounds: int) -> np.ndarray:
+        return self._generator(rng, games, rounds)
+
+
+class ReactiveStrategy(AdaptiveStrategy):
+    """
+    An adaptive strategy answering the last round with `reaction`, and playing at random in the first round.
+    """
+
+    def __init__(self, name: str, reaction: Reaction) -> None:
+        super().__init__(name)
+        self._reaction = reaction
+
+    def start(self, games: int) -> Dict:
+        return {"games": games, "own": None, "opponent": None}
+
+    def choose(self, state: Dict, rng: np.random.Generator) -> np.ndarray:
+        if state["own"] is None:
+            return rng.integers(0, 3, size=state["games"], dtype=np.int8)
+        return self._reaction(state["own"], state["opponent"])
+
+    def observe(self, state: Dict, own_moves: np.ndarray, opponent_moves: np.ndarray) -> None:
+        state["own"] = own_moves
+        state["opponent"] = opponent_moves
+
+
+class MariaStrategy(AdaptiveStrategy):
+    """
+    Maria's engine, with a fresh opponent model for every game.
+    """
+
+    def __init__(self) -> None:
+        super().__init__("maria")
+
+    def start(self, games: int) -> OpponentModels:
+        return OpponentModels(games)
+
+    def choose(self, state: OpponentModels, rng: np.random.Generator) -> np.ndarray:
+        return state.choose(rng).astype(np.int8)
+
+    def observe(self, state: OpponentModels, own_moves: np.ndarray, opponent_moves: np.ndarray) -> None:
+        state.observe(opponent_moves.astype(np.int64), own_moves.astype(np.int64))
+
+
+def _biased(rng: np.random.Generator, games: int, rounds: int) -> np.ndarray:
+    # Rock half of the time, paper 30% and scissor 20%
+    draws = rng.random((games, rounds), dtype=np.float32)
+    return (draws >= 0.5).astype(np.int8) + (draws >= 0.8)
+
+
+def _cycle(rng: np.random.Generator, games: int, rounds: int) -> np.ndarray:
+    # Rock, paper, scissor, from a random starting move in every game
+    offsets = rng.integers(0, 3, size=(games, 1), dtype=np.int8)
+    return (np.arange(rounds, dtype=np.int8) % 3 + offsets) % 3
+
+
+STRATEGIES: Dict[str, Strategy] = {strategy.name: strategy for strategy in (
+    GeneratedStrategy("random", lambda rng, games, rounds: rng.integers(0, 3, size=(games, rounds), dtype=np.int8)),
+    GeneratedStrategy("rock", lambda rng, games, rounds: np.zeros((games, rounds), dtype=np.int8)),
+    GeneratedStrategy("cycle", _cycle),
+    GeneratedStrategy("biased", _biased),
+    ReactiveStrategy("beat_last", lambda own, opponent: (opponent + 1) % 3),
+    ReactiveStrategy("repeat_last", lambda own, opponent: own),
+    ReactiveStrategy("copy_last", lambda own, opponent: opponent),
+    MariaStrategy(),
+)}
+
+
+@dataclass
+class Standing:
+    """
+    Aggregated results of a strategy over a tournament.
+    """
+    name: str
+    points: int = 0
+    games_won: int = 0
+    games_drawn: int = 0
+    games_lost: int = 0
+    rounds_won: int = 0
+    rounds_lost: int = 0
+    rounds_tied: int = 0
+
+    @property
+    def games_played(self) -> int:
+        return self.games_won + self.games_drawn + self.games_lost
+
+    def record(self, own_wins: np.ndarray, opponent_wins: np.ndarray, rounds: int) -> None:
+        """
+        Add the results of a match, given the rounds won by each side in every game.
+        """
+        won = int(np.count_nonzero(own_wins > opponent_wins))
+        lost = int(np.count_nonzero(own_wins < opponent_wins))
+        drawn = len(own_wins) - won - lost
+
+        self.games_won += won
+        self.games_drawn += drawn
+        self.games_lost += lost
+        self.points += won * POINTS_WIN + drawn * POINTS_DRAW
+
+        rounds_won = int(own_wins.sum())
+        rounds_lost = int(opponent_wins.sum())
+        self.rounds_won += rounds_won
+        self.rounds_lost += rounds_lost
+        self.rounds_tied += len(own_wins) * rounds - rounds_won - rounds_lost
+
+
+@dataclass
+class TournamentResult:
+    standings: List[Standing]
+    rounds_played: int
+    seconds: float
+
+    @property
+    def rounds_per_second(self) -> float:
+        return self.rounds_played / self.seconds if self.seconds else float("inf")
+
+
+def play_match(strategy1: Strategy, strategy2: Strategy, games: int, rounds: int,
+               rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Play `games` games of `rounds` rounds between two strategies.
+
+    Matches between fixed strategies are resolved as one (games, rounds) block. With an adaptive strategy, the
+    rounds are played one after the other, every round resolving all the games at once.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The number of rounds won by each strategy in every game.
+    """
+    adaptive1, adaptive2 = isinstance(strategy1, AdaptiveStrategy), isinstance(strategy2, AdaptiveStrategy)
+
+    if not adaptive1 and not adaptive2:
+        outcomes = resolve_rounds(strategy1.generate(rng, games, rounds), strategy2.generate(rng, games, rounds))
+        return np.count_nonzero(outcomes == 1, axis=1), np.count_nonzero(outcomes == 2, axis=1)
+
+    fixed1 = None if adaptive1 else strategy1.generate(rng, games, rounds)
+    fixed2 = None if adaptive2 else strategy2.generate(rng, games, rounds)
+    state1 = strategy1.start(games) if adaptive1 else None
+    state2 = strategy2.start(games) if adaptive2 else None
+    wins1 = np.zeros(games, dtype=np.int64)
+    wins2 = np.zeros(games, dtype=np.int64)
+
+    for round_number in range(rounds):
+        moves1 = strategy1.choose(state1, rng) if fixed1 is None else fixed1[:, round_number]
+        moves2 = strategy2.choose(state2, rng) if fixed2 is None else fixed2[:, round_number]
+
+        outcomes = resolve_rounds(moves1, moves2)
+        wins1 += outcomes == 1
+        wins2 += outcomes == 2
+
+        if state1 is not None:
+            strategy1.observe(state1, moves1, moves2)
+        if state2 is not None:
+            strategy2.observe(state2, moves2, moves1)
+
+    return wins1, wins2
+
+
+def _resolve_strategies(names: Sequence[str]) -> List[Strategy]:
+    unknown = [name for name in names if name not in STRATEGIES]
+    if unknown:
+        raise ValueError(f"Unknown strategies {unknown}, expected some of {list(STRATEGIES)}")
+    return [STRATEGIES[name] for name in names]
+
+
+def _sorted_standings(standings: Dict[str, Standing]) -> List[Standing]:
+    return sorted(standings.values(),
+                  key=lambda standing: (standing.points, standing.rounds_won - standing.rounds_lost),
+                  reverse=True)
+
+
+def round_robin(names: Sequence[str], games: int = 1000, rounds: int = 100, seed: int = 0) -> TournamentResult:
+    """
+    Play a match of `games` games of `rounds` rounds between every pair of strategies.
+
+    Args:
+        names (Sequence[str]): Names of strategies of `STRATEGIES`.
+        games (int): Number of games of every match.
+        rounds (int): Number of rounds of every game.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        TournamentResult: The standings, sorted by points then by round difference, and the simulation speed.
+    """
+    strategies = _resolve_strategies(names)
+    rng = np.random.default_rng(seed)
+    standings = {strategy.name: Standing(strategy.name) for strategy in strategies}
+    played = 0
+
+    start = perf_counter()
+    for strategy1, strategy2 in combinations(strategies, 2):
+        wins1, wins2 = play_match(strategy1, strategy2, games, rounds, rng)
+        standings[strategy1.name].record(wins1, wins2, rounds)
+        standings[strategy2.name].record(wins2, wins1, rounds)
+        played += games * rounds
+
+    return TournamentResult(_sorted_standings(standings), played, perf_counter() - start)
+
+
+def swiss(names: Sequence[str], tournament_rounds: int = 5, games: int = 1000, rounds: int = 100,
+          seed: int = 0) -> TournamentResult:
+    """
+    Play a Swiss tournament: every tournament round pairs strategies with close points that have not met yet.
+
+    With an odd number of strategies, the lowest ranked strategy without a bye sits out the tournament round and
+    is credited with `games` won games.
+
+    Args:
+        names (Sequence[str]): Names of strategies of `STRATEGIES`.
+        tournament_rounds (int): Number of tournament rounds.
+        games (int): Number of games of every match.
+        rounds (int): Number of rounds of every game.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        TournamentResult: The standings, sorted by points then by round difference, and the simulation speed.
+    """
+    strategies = {strategy.name: strategy for strategy in _resolve_strategies(names)}
+    rng = np.random.default_rng(seed)
+    standings = {name: Standing(name) for name in strategies}
+    met = {name: set() for name in strategies}
+    had_bye = set()
+    played = 0
+
+    start = perf_counter()
+    for _ in range(tournament_rounds):
+        ranked = [standing.name for standing in _sorted_standings(standings)]
+
+        if len(ranked) % 2:
+            bye = next((name for name in reversed(ranked) if name not in had_bye), ranked[-1])
+            had_bye.add(bye)
+            ranked.remove(bye)
+            standings[bye].games_won += games
+            standings[bye].points += games * POINTS_WIN
+
+        while ranked:
+            name1 = ranked.pop(0)
+            # The closest ranked opponent not met yet, or the closest one if all have been met
+            name2 = next((name for name in ranked if name not in met[name1]), ranked[0])
+            ranked.remove(name2)
+            met[name1].add(name2)
+            met[name2].add(name1)
+
+            wins1, wins2 = play_match(strategies[name1], strategies[name2], games, rounds, rng)
+            standings[name1].record(wins1, wins2, rounds)
+            standings[name2].record(wins2, wins1, rounds)
+            played += games * rounds
+
+    return TournamentResult(_sorted_standings(standings), played, perf_counter() - start)
+
+
+def format_standings(result: TournamentResult) -> str:
+    """
+    Format standings as a text table, followed by the simulation speed.
+    """
+    lines = [f"{'#':>3} {'strategy':<12} {'points':>8} {'won':>7} {'drawn':>7} {'lost':>7} {'round diff':>11}"]
+    for position, standing in enumerate(result.standings, start=1):
+        lines.append(f"{position:>3} {standing.name:<12} {standing.points:>8} {standing.games_won:>7} "
+                     f"{standing.games_drawn:>7} {standing.games_lost:>7} "
+                     f"{standing.rounds_won - standing.rounds_lost:>+11}")
+    lines.append(f"{result.rounds_played:,} rounds in {result.seconds:.2f}s ({result.rounds_per_second:,.0f} rounds/s)")
+    return "\n".join(lines)
@@ -0,0 +1,171 @@
+from threading import Lock
+from time import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import os
+
+# Seconds between two deliveries to the spectators of a room, events of that interval are sent as one batch
+SPECTATOR_FLUSH_INTERVAL = float(os.environ.get("SPECTATOR_FLUSH_INTERVAL", 0.25))
+
+# Event a batch is delivered as, with the events in the order they were published
+SPECTATOR_EVENT = "spectator_events"
+
+
+def spectator_channel(room_id: str) -> str:
+    """
+    Get the Socket.IO room the spectators of a game room join. Players stay in the game room itself, so they never
+    wait for the spectators.
+    """
+    return f"{room_id}/spectators"
+
+
+class SpectatorFeed:
+    """
+    Delivery of the events of game rooms to their spectators.
+
+    The game handlers only `publish` to the feed, which appends the event to the pending batch of its room and
+    returns. `flush` then sends every pending batch as a single emit to the spectator channel, from a background
+    task, so the cost of reaching thousands of spectators is paid once per room and interval and never on the
+    players' move path.
+
+    Events of rooms without spectators in this process are dropped, unless the feed is `shared`: with
+    SOCKETIO_MESSAGE_QUEUE, the spectators may be connected to another server process, which the message queue
+    delivers the batch to. The spectator counts are those of this process.
+
+    Every event carries a "seq" number, the microseconds of its publication, strictly increasing within a process.
+    `watch` returns the current one with the snapshot a new spectator starts from, and the spectator drops the
+    events up to it, which are already part of the snapshot. Across processes, the numbers are as comparable as the
+    clocks of their hosts.
+    """
+
+    def __init__(self, emit: Callable[..., Any], flush_interval: float = SPECTATOR_FLUSH_INTERVAL,
+                 shared: bool = False) -> None:
+        self.flush_interval = flush_interval
+        self.shared = shared
+        self._emit = emit
+        self._lock = Lock()
+        self._sequence = 0
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._watching: Dict[str, str] = {}
+        self._viewers: Dict[str, int] = {}
+        self.published_total = 0
+        self.batches_total = 0
+
+    def watch(self, sid: str, room_id: str) -> Tuple[int, int]:
+        """
+        Register a socket as a spectator of a room, instead of the room it was watching before. The snapshot of the
+        room sent to the spectator must be read after this call, so that it includes every event up to the returned
+        sequence number.
+
+        Args:
+            sid (str): The Socket.IO session id of the spectator.
+            room_id (str): The room id of the game.
+
+        Returns:
+            Tuple[int, int]: The number of spectators of the room and the "seq" of the last event published.
+        """
+        with self._lock:
+            self._unwatch(sid)
+            self._watching[sid] = room_id
+            self._viewers[room_id] = self._viewers.get(room_id, 0) + 1
+            return self._viewers[room_id], self._sequence
+
+    def unwatch(self, sid: str) -> Optional[str]:
+        """
+        Unregister a spectator, e.g. when its socket disconnects.
+
+        Args:
+            sid (str): The Socket.IO session id of the spectator.
+
+        Returns:
+            Optional[str]: The room id it was watching, None if it was not a spectator.
+        """
+        with self._lock:
+            return self._unwatch(sid)
+
+    def _unwatch(self, sid: str) -> Optional[str]:
+        room_id = self._watching.pop(sid, None)
+        if room_id is not None:
+            self._viewers[room_id] -= 1
+            if not self._viewers[room_id]:
+                del self._viewers[room_id]
+        return room_id
+
+    def viewers(self, room_id: str) -> int:
+        """
+        Get the number of spectators of a room.
+        """
+        return self._viewers.get(room_id, 0)
+
+    def publish(self, room_id: str, event: str, data: Dict[str, Any]) -> None:
+        """
+        Queue an event for the spectators of a room. O(1) whatever the number of spectators.
+
+        Args:
+            room_id (str): The room id of the game.
+            event (str): The name of the event, e.g. "result".
+            data (Dict[str, Any]): The payload of the event.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if not self.shared and room_id not in self._viewers:
+                return
+            self._sequence = max(self._sequence + 1, int(time() * 1e6))
+            self._pending.setdefault(room_id, []).append({"event": event, "data": data, "seq": self._sequence})
+            self.published_total += 1
+
+    def flush(self) -> int:
+        """
+        Send the pending events of every room to its spectators, one emit per room.
+
+        Returns:
+            int: The number of batches sent.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for room_id, events in pending.items():
+            self._emit(SPECTATOR_EVENT, {"player_room_id": room_id, "events": events}, room=spectator_channel(room_id))
+
+        with self._lock:
+            self.batches_total += len(pending)
+
+        return len(pending)
+
+    def run(self, sleep: Callable[[float], Any]) -> None:
+        """
+        Flush the pending events forever. Meant to be started as a background task.
+
+        Args:
+            sleep (Callable[[float], Any]): The sleep function of the server, e.g. `socketio.sleep`.
+
+        Returns:
+            None
+        """
+        while True:
+            sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as error:  # pylint: disable=broad-except
+                print(f"{error}. Spectator flush failed")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the spectator counters.
+
+        Returns:
+            Dict[str, int]: Spectators, watched rooms, and the published event and sent batch totals.
+        """
+        with self._lock:
+            return {"spectators": len(self._watching),
+                    "watched_rooms": len(self._viewers),
+                    "published_total": self.published_total,
+                    "batches_total": self.batches_total}
+
+    def most_watched(self, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        Get the rooms with the most spectators, most watched first.
+        """
+        with self._lock:
+            return sorted(self._viewers.items(), key=lambda item: item[1], reverse=True)[:limit]
@@ -0,0 +1,257 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from math import ceil, log
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, Hashable, Optional, Tuple
+import os
+
+from src.database import users
+
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))
+# Usernames and emails the Bloom filter is sized for, beyond that its false positive rate slowly rises
+USER_BLOOM_CAPACITY = int(os.environ.get("USER_BLOOM_CAPACITY", 1000000))
+USER_BLOOM_ERROR_RATE = 0.01
+
+# Only the public fields of a profile are cached
+PROFILE_PROJECTION = {"username": 1, "wins": 1, "played": 1, "rating": 1}
+LOOKUP_FIELDS = ("username", "email")
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded mapping evicting its least recently used entry, whose entries also expire `ttl` seconds after being set.
+    """
+
+    def __init__(self, size: int, ttl: float) -> None:
+        self.size = size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Get a fresh entry, or `_MISSING`.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+
+        if monotonic() > entry[0]:
+            del self._entries[key]
+            return _MISSING
+
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+
+class BloomFilter:
+    """
+    Set membership with false positives but no false negatives, in about 10 bits per item at a 1% error rate.
+    Items can't be removed.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = USER_BLOOM_ERROR_RATE) -> None:
+        self.n_bits = max(8, ceil(-capacity * log(error_rate) / log(2) ** 2))
+        self.n_hashes = max(1, round(self.n_bits / capacity * log(2)))
+        self._bits = bytearray((self.n_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from the two halves of a single digest
+        digest = blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.n_bits for index in range(self.n_hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class UserCache:
+    """
+    Read-through cache of username and email existence and of public profiles.
+
+    Existence checks and profiles live in one LRU of `size` entries expiring after `ttl` seconds, invalidated
+    explicitly by signups, renames and game results. Once `load` has filled the Bloom filter with every username
+    and email, a value it doesn't contain is known to be available without a lookup, which answers most signup
+    checks. Another worker's signup isn't in this process's filter or cache, but the unique indexes of the users
+    collection still reject a duplicate on insert.
+    """
+
+    def __init__(self, collection=users, size: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL,
+                 bloom_capacity: int = USER_BLOOM_CAPACITY) -> None:
+        self.collection = collection
+        self.bloom_capacity = bloom_capacity
+        self._lock = Lock()
+        self._cache = LRUCache(size, ttl)
+        self._bloom: Optional[BloomFilter] = None
+        self.hits = 0
+        self.misses = 0
+        self.bloom_hits = 0
+
+    def load(self) -> int:
+        """
+        Fill the Bloom filter with the username and email of every user. Until then, every check is a lookup.
+
+        Returns:
+            int: The number of users loaded.
+        """
+        bloom = BloomFilter(2 * self.bloom_capacity)
+        loaded = 0
+        for user in self.collection.find({}, {"_id": 0, "username": 1, "email": 1}):
+            for field in LOOKUP_FIELDS:
+                if field in user:
+                    bloom.add(f"{field}:{user[field]}")
+            loaded += 1
+
+        with self._lock:
+            self._bloom = bloom
+        return loaded
+
+    def exists(self, field: str, value: str) -> bool:
+        """
+        Check whether a user with the given username or email exists.
+
+        Args:
+            field (str): "username" or "email".
+            value (str): The value to look up.
+
+        Returns:
+            bool: True if a user has this value.
+        """
+        if field not in LOOKUP_FIELDS:
+            raise ValueError(f"Invalid lookup field {field!r}")
+
+        key = (field, value)
+        with self._lock:
+            if self._bloom is not None and f"{field}:{value}" not in self._bloom:
+                self.bloom_hits += 1
+                return False
+
+            cached = self._cache.get(key)
+            if cached is not _MISSING:
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        found = self.collection.find_one({field: value}, {"_id": 1}) is not None
+
+        with self._lock:
+            self._cache.set(key, found)
+        return found
+
+    def profile(self, username: str) -> Optional[Dict]:
+        """
+        Get the public profile fields of a user.
+
+        Args:
+            username (str): The username of the user.
+
+        Returns:
+            Optional[Dict]: The "username", "wins", "played" and "rating" of the user, None if there is no such user.
+        """
+        key = ("profile", username)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not _MISSING:
+                self.hits += 1
+                return dict(cached) if cached is not None else None
+            self.misses += 1
+
+        user = self.collection.find_one({"username": username}, PROFILE_PROJECTION)
+
+        with self._lock:
+            self._cache.set(key, user)
+            if user is not None:
+                self._cache.set(("username", username), True)
+        return dict(user) if user is not None else None
+
+    def add_user(self, username: str, email: str) -> None:
+        """
+        Record a newly created user.
+
+        Args:
+            username (str): The username of the new user.
+            email (str): The email of the new user.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(f"username:{username}")
+                self._bloom.add(f"email:{email}")
+            self._cache.set(("username", username), True)
+            self._cache.set(("email", email), True)
+            self._cache.pop(("profile", username))
+
+    def rename(self, username: str, new_username: str) -> None:
+        """
+        Record a username change. The old name stays in the Bloom filter, which only costs a lookup when it's checked.
+
+        Args:
+            username (str): The previous username.
+            new_username (str): The new username.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(f"username:{new_username}")
+            self._cache.set(("username", username), False)
+            self._cache.set(("username", new_username), True)
+            self._cache.pop(("profile", username))
+            self._cache.pop(("profile", new_username))
+
+    def invalidate_profile(self, username: str) -> None:
+        """
+        Drop the cached profile of a user, e.g. after a game changed its wins.
+
+        Args:
+            username (str): The username of the user.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._cache.pop(("profile", username))
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the cache counters.
+
+        Returns:
+            Dict[str, float]: Cache hits and misses, checks answered by the Bloom filter, the hit ratio counting
+            both, and the number of cached entries.
+        """
+        with self._lock:
+            answered = self.hits + self.bloom_hits
+            requests = answered + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "bloom_hits": self.bloom_hits,
+                    "hit_ratio": answered / requests if requests else 0.0,
+                    "cached_entries": len(self._cache),
+                    "bloom_loaded": self._bloom is not None}
+
+
+user_cache = UserCache()
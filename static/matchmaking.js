@@ -0,0 +1,46 @@
+/**
+ * Matchmaking: wait in the queue for a random online opponent and enter the game room once matched.
+ */
+document.addEventListener('DOMContentLoaded', () => {
+
+    const findButton = document.querySelector('#find_opponent_btn');
+    const cancelButton = document.querySelector('#cancel_matchmaking_btn');
+    const status = document.querySelector('#matchmaking_status');
+
+    let socket = null;
+
+    /**
+     * Enter the matchmaking queue.
+     */
+    findButton.onclick = () => {
+      socket = io.connect(`${location.protocol}//${document.domain}:${location.port}`, { transports: ['websocket'] });
+
+      socket.on('matchmaking_waiting', data => {
+        status.innerHTML = `Looking for an opponent... (${data.depth} waiting)`;
+      });
+
+      socket.on('match_found', data => {
+        status.innerHTML = 'Opponent found!';
+        window.location.href = `/matched-game/?room=${data.player_room_id}`;
+      });
+
+      socket.emit('enter_matchmaking');
+
+      findButton.style.display = 'none';
+      cancelButton.style.display = 'inline-block';
+      status.innerHTML = 'Looking for an opponent...';
+    }
+
+    /**
+     * Leave the matchmaking queue.
+     */
+    cancelButton.onclick = () => {
+      socket.emit('leave_matchmaking');
+      socket.disconnect();
+      socket = null;
+
+      findButton.style.display = 'inline-block';
+      cancelButton.style.display = 'none';
+      status.innerHTML = '';
+    }
+});
@@ -9,6 +9,10 @@ document.addEventListener('DOMContentLoaded', () => {
     // Connect to websocket
     const socket = io.connect(`${location.protocol}//${document.domain}:${location.port}`, { transports: ['websocket'] });
   
+    // Moves and outcomes travel as their index in these lists, as in src/game_state.py
+    const MOVES = ['rock', 'paper', 'scissor'];
+    const OUTCOMES = ['TIE', 'player1', 'player2'];
+
     let playerRoomId = false;
     let player1 = false;
     let player2 = false;
@@ -32,6 +36,14 @@ document.addEventListener('DOMContentLoaded', () => {
       player2 = data.player2;
     });
   
+    /**
+     * Update the second player when someone joins the room.
+     */
+    socket.on('player_joined', data => {
+      player2 = data.player;
+      document.querySelector('.name2').textContent = player2;
+    });
+  
     /**
      * Show game event from server.
      */
@@ -39,25 +51,15 @@ document.addEventListener('DOMContentLoaded', () => {
       window.alert('Game Started!');
   
       document.querySelector('.game').style.visibility = 'visible';
-      document.querySelector('#message').innerHTML = `Game Started! ${player1} VS ${player2}`;
-      document.querySelector('.name2').innerHTML = player2;
+      document.querySelector('#message').textContent = `Game Started! ${player1} VS ${player2}`;
+      document.querySelector('.name2').textContent = player2;
     });
   
     /**
      * Update the waiting message.
      */
-    socket.on('wait', data => {
-      document.querySelector('#bottom_message').innerHTML = `${data.person_waiting} is waiting...`;
-    });
-  
-    /**
-     * Update the opponent's choice when received from the server.
-     */
-    socket.on('update_opponent_choice', data => {
-      const opponent = (username === player2) ? 'player1' : 'player2';
-      const opponentChoice = data.choices[opponent];
-  
-      setChoiceImage(opponent, opponentChoice);
+    socket.on('wait', seat => {
+      document.querySelector('#bottom_message').textContent = `${seat} is waiting...`;
     });
   
     /**
@@ -67,8 +69,7 @@ document.addEventListener('DOMContentLoaded', () => {
      * @param {string} choice - Choice of the player ('rock', 'paper', or 'scissor').
      */
     function setChoiceImage(player, choice) {
-      const imagePath = `static/images/${choice}.png`;
-      document.querySelector(`#${player}_choice`).src = imagePath;
+      document.querySelector(`#${player}_choice`).src = MOVE_IMAGES[choice];
     }
 
     /**
@@ -94,41 +95,58 @@ document.addEventListener('DOMContentLoaded', () => {
     
   
     /**
-   * Handle the result of the game received from the server.
+   * Handle the result of a round received from the server, as [outcome, move of player1, move of player2,
+   * series score of player1, series score of player2].
    */
-    socket.on('result', data => {
+    socket.on('round', ([outcome, move1, move2, score1, score2]) => {
+        const result = OUTCOMES[outcome];
+        const opponent = (username === player2) ? 'player1' : 'player2';
+        setChoiceImage(opponent, MOVES[opponent === 'player1' ? move1 : move2]);
+
         let message = '';
 
-        if (data.result === 'TIE') {
+        if (result === 'TIE') {
         message = "It's a tie!";
         } else {
-            if (data['result'] === 'player1'){
-                const winner = document.getElementsByClassName("name1")[0].innerHTML
+            if (result === 'player1'){
+                const winner = document.getElementsByClassName("name1")[0].textContent
                 message = winner + " won!"
-                document.getElementById("bottom_message").innerHTML = message;
-                document.getElementById("player1_score").innerHTML = parseInt(document.getElementById("player1_score").innerHTML) + 1
+                document.getElementById("bottom_message").textContent = message;
             }else{
-                const winner = document.getElementsByClassName("name2")[0].innerHTML
+                const winner = document.getElementsByClassName("name2")[0].textContent
                 message = winner + " won!"
-                document.getElementById("bottom_message").innerHTML = message;
-                document.getElementById("player2_score").innerHTML = parseInt(document.getElementById("player2_score").innerHTML) + 1
-
+                document.getElementById("bottom_message").textContent = message;
             }
         }
 
-        document.querySelector('#bottom_message').innerHTML = message;
+        // The server keeps the score of the series
+        document.getElementById("player1_score").textContent = score1;
+        document.getElementById("player2_score").textContent = score2;
+
+        document.querySelector('#bottom_message').textContent = message;
         // window.alert(message);
 
         setTimeout(() => {
         setChoiceImage('player1', 'logo');
         setChoiceImage('player2', 'logo');
         document.querySelector('.controls').style.visibility = 'visible';
-        document.querySelector('#bottom_message').innerHTML = "Select your new move";
+        document.querySelector('#bottom_message').textContent = "Select your new move";
         }, 3000);
 
     });
 
-  
+    /**
+     * Announce the end of a series, as [winner, score of player1, score of player2]. The next round starts a new one.
+     */
+    socket.on('series', ([outcome, score1, score2]) => {
+      const result = OUTCOMES[outcome];
+      const winner = (result === 'player1') ? player1 : player2;
+
+      document.querySelector('#message').textContent = (result === 'TIE')
+        ? `The series ended in a tie, ${score1}-${score2}. Play again for a new series!`
+        : `${winner} won the series ${Math.max(score1, score2)}-${Math.min(score1, score2)}! Play again for a new series!`;
+    });
+
     /**
      * Handle leave room button click event.
      */
@@ -145,11 +163,27 @@ document.addEventListener('DOMContentLoaded', () => {
      * Clear the game when the room is closed.
      */
     socket.on('clear_game_event', data => {
-      document.querySelector('#player1_score').innerHTML = '0';
-      document.querySelector('#player2_score').innerHTML = '0';
-      document.querySelector('#message').innerHTML = 'The game room has closed.';
-      document.querySelector('#game_room_id').innerHTML = '';
-      document.querySelector('#bottom_message').innerHTML = '';
+      clearGame();
+      window.alert(`${data.player} left the room.`);
+    });
+
+    /**
+     * Clear the game when the server closed the room after a long time without activity.
+     */
+    socket.on('room_expired', data => {
+      clearGame();
+      window.alert('The room was closed after being idle for too long.');
+    });
+
+    /**
+     * Reset the game page once the room is closed.
+     */
+    function clearGame() {
+      document.querySelector('#player1_score').textContent = '0';
+      document.querySelector('#player2_score').textContent = '0';
+      document.querySelector('#message').textContent = 'The game room has closed.';
+      document.querySelector('#game_room_id').textContent = '';
+      document.querySelector('#bottom_message').textContent = '';
       document.querySelector('.game').style.visibility = 'hidden';
       document.querySelector('.controls').style.visibility = 'hidden';
       document.querySelector('.go_to_lobby').style.visibility = 'visible';
@@ -157,9 +191,7 @@ document.addEventListener('DOMContentLoaded', () => {
       playerRoomId = false;
       player1 = false;
       player2 = false;
-  
-      window.alert(`${data.player} left the room.`);
-    });
+    }
   
     /**
      * Handle the click event for rock choice.
@@ -194,15 +226,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
       document.querySelector('.controls').style.visibility = 'hidden';
   
-      const payload = {
-        player_number: playerNumber,
-        player1,
-        player2,
-        choice,
-        player_room_id: playerRoomId
-      };
-  
-      socket.emit('register_player_choice', payload);
+      // The server knows the room and seat of this socket, only the move is sent
+      socket.emit('move', MOVES.indexOf(choice));
     }
 });
     
\ No newline at end of file
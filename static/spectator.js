@@ -0,0 +1,125 @@
+/**
+ * Spectator view of a game: the events of the room arrive in batches on the spectator channel.
+ */
+document.addEventListener('DOMContentLoaded', () => {
+
+    // Connect to websocket
+    const socket = io.connect(`${location.protocol}//${document.domain}:${location.port}`, { transports: ['websocket'] });
+
+    let player1 = false;
+    let player2 = false;
+
+    // Number of the last event included in the initial state, null until it arrives
+    let since = null;
+    // Events received before the initial state
+    let early = [];
+
+    // Join the spectator channel of the room
+    socket.emit('watch_game', { player_room_id: game_room_id });
+
+    /**
+     * Apply a batch of events, in the order they happened. Events up to the initial state are already part of it.
+     */
+    socket.on('spectator_events', data => {
+      data.events.forEach(event => {
+        if (event.event === 'watching') {
+          since = event.seq;
+          apply(event);
+          early.filter(earlier => earlier.seq > since).forEach(apply);
+          early = [];
+        } else if (since === null) {
+          early.push(event);
+        } else if (event.seq > since) {
+          apply(event);
+        }
+      });
+    });
+
+    function apply({ event, data }) {
+      const handler = handlers[event];
+      if (handler) {
+        handler(data);
+      }
+    }
+
+    const handlers = {
+      /**
+       * Initial state of the room, sent when the spectator joins.
+       */
+      watching: data => {
+        setPlayers(data.player1, data.player2);
+        document.querySelector('#spectators').textContent = `${data.spectators} watching`;
+        if (player1 && player2) {
+          showGame();
+        }
+      },
+
+      player_joined: data => {
+        setPlayers(player1, data.player);
+      },
+
+      show_game: data => {
+        setPlayers(data.player1, data.player2);
+        showGame();
+      },
+
+      result: data => {
+        setChoiceImage('player1', data.choices.player1);
+        setChoiceImage('player2', data.choices.player2);
+
+        document.querySelector('#player1_score').textContent = data.score[0];
+        document.querySelector('#player2_score').textContent = data.score[1];
+
+        if (data.result === 'TIE') {
+          document.querySelector('#bottom_message').textContent = "It's a tie!";
+        } else {
+          const winner = (data.result === 'player1') ? player1 : player2;
+          document.querySelector('#bottom_message').textContent = `${winner} won!`;
+        }
+      },
+
+      series: data => {
+        const winner = (data.result === 'player1') ? player1 : player2;
+        document.querySelector('#message').textContent = (data.result === 'TIE')
+          ? `The series ended in a tie, ${data.score[0]}-${data.score[1]}`
+          : `${winner} won the series ${data.score[0]}-${data.score[1]}`;
+      },
+
+      clear_game: data => {
+        closeGame(`${data.player} left the room.`);
+      },
+
+      room_expired: data => {
+        closeGame('The room was closed after being idle for too long.');
+      }
+    };
+
+    function setPlayers(first, second) {
+      player1 = first;
+      player2 = second;
+      document.querySelector('.name1').textContent = player1 || '';
+      document.querySelector('.name2').textContent = player2 || '';
+    }
+
+    function showGame() {
+      document.querySelector('.game').style.visibility = 'visible';
+      document.querySelector('#message').textContent = `You are watching ${player1} VS ${player2}`;
+    }
+
+    /**
+     * Set the image for a player's choice.
+     *
+     * @param {string} player - Player identifier ('player1' or 'player2').
+     * @param {string} choice - Choice of the player ('rock', 'paper', or 'scissor').
+     */
+    function setChoiceImage(player, choice) {
+      document.querySelector(`#${player}_choice`).src = MOVE_IMAGES[choice];
+    }
+
+    function closeGame(message) {
+      document.querySelector('#message').textContent = 'The game room has closed.';
+      document.querySelector('#bottom_message').textContent = message;
+      document.querySelector('.go_to_lobby').style.visibility = 'visible';
+      socket.emit('stop_watching');
+    }
+});